@@ -1,17 +1,126 @@
 import streamlit as st
 import pandas as pd
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.units import inch
+import numpy as np
 import io
-import zipfile
-from datetime import datetime
+import os
+import time
+import hashlib
+import tempfile
+import threading
+import importlib
+import sqlite3
+from contextlib import contextmanager
+from collections import OrderedDict
+from collections.abc import Mapping
+import csv
+import itertools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import re
-import requests
-import PyPDF2
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pandas.api.types import union_categoricals
+
+import form8949_workers
+from pipeline_metrics import PipelineRun, count_event, log_pipeline_run, pipeline_stage
+
+# The PDF, template download and archive code lives in modules imported on first
+# use, so sessions that never build a PDF don't load reportlab, PyPDF2 or requests
+LAZY_MODULE_ATTRIBUTES = {
+    'Form8949Template': 'form8949_pdf',
+    'Form8949Document': 'form8949_pdf',
+    'create_form_with_pdf_overlay': 'form8949_pdf',
+    'draw_form_8949_overlay': 'form8949_pdf',
+    'create_form_8949_page_custom': 'form8949_pdf',
+    'FormTemplateStore': 'form8949_templates',
+    'create_zip_file': 'form8949_archive',
+    'write_zip_file': 'form8949_archive'
+}
+
+def __getattr__(name):
+    """Resolve app.<name> for code moved to a lazily loaded module, importing it now"""
+    module = LAZY_MODULE_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module), name)
+
+# Columns a Bitwave actions export must have to be processed
+BITWAVE_REQUIRED_COLUMNS = ['action', 'asset', 'timestamp', 'lotId', ' proceeds ', ' costBasisRelieved ']
+
+# Actions that open a tax lot: purchases, and income such as staking rewards or airdrops
+BITWAVE_ACQUISITION_ACTIONS = ['buy', 'income']
+
+# Every column the extraction reads, with the compact dtype used for chunked ingestion
+BITWAVE_INGEST_DTYPES = {
+    'action': 'category',
+    'asset': 'category',
+    'timestamp': str,
+    'lotId': str,
+    ' proceeds ': str,
+    ' costBasisRelieved ': str,
+    ' shortTermGainLoss ': str,
+    ' longTermGainLoss ': str,
+    ' costBasisAcquired ': str
+}
+
+# Uploads larger than this are streamed in chunks of BITWAVE_CHUNK_ROWS rows
+CHUNKED_INGEST_THRESHOLD_BYTES = 100 * 1024 * 1024
+BITWAVE_CHUNK_ROWS = 250_000
+
+# Money columns shorter than this are parsed cell by cell, which beats the column-wide string operations
+CURRENCY_COLUMN_MIN_VECTOR_ROWS = 1_000
+
+# Memory budget for parsed uploads and extracted transactions kept between reruns
+UPLOAD_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Schema metadata key recording what a Parquet file written by the app holds
+PARQUET_KIND_KEY = b'form8949.kind'
+
+# Form 8949 types offered for the checkbox on each part
+FORM_8949_TYPES = [
+    "Part I - Short-term (Box B) - Basis NOT reported", 
+    "Part I - Short-term (Box A) - Basis reported",
+    "Part I - Short-term (Box C) - Various situations",
+    "Part II - Long-term (Box B) - Basis NOT reported",
+    "Part II - Long-term (Box A) - Basis reported",
+    "Part II - Long-term (Box C) - Various situations"
+]
+
+# Columns of the CSV for tax software, and the rows formatted per write
+TAX_SOFTWARE_CSV_HEADER = ["Description", "Date Acquired", "Date Sold", "Sales Price", "Cost Basis", "Gain/Loss", "Adjustment Code", "Adjustment Amount"]
+CSV_WRITE_BATCH_ROWS = 10_000
+
+# Form 8949 has room for 14 transactions per page
+TRANSACTIONS_PER_PAGE = 14
+
+# IRS Form 8949 URLs by year
+IRS_FORM_8949_URLS = {
+    2025: "https://www.irs.gov/pub/irs-pdf/f8949.pdf",
+    2024: "https://www.irs.gov/pub/irs-pdf/f8949.pdf",
+    2023: "https://www.irs.gov/pub/irs-prior/f8949--2023.pdf",
+    2022: "https://www.irs.gov/pub/irs-prior/f8949--2022.pdf",
+    2021: "https://www.irs.gov/pub/irs-prior/f8949--2021.pdf",
+    2020: "https://www.irs.gov/pub/irs-prior/f8949--2020.pdf",
+    2019: "https://www.irs.gov/pub/irs-prior/f8949--2019.pdf",
+    2018: "https://www.irs.gov/pub/irs-prior/f8949--2018.pdf"
+}
+
+# Official form templates are downloaded once into FORM8949_TEMPLATE_CACHE (by default
+# ~/.cache/form8949_templates, see form8949_templates.default_cache_dir). Air-gapped
+# deployments can pre-seed FORM8949_TEMPLATE_DIR with the IRS PDFs and set
+# FORM8949_OFFLINE=1 so the network is never used.
+FORM_TEMPLATE_CACHE_DIR = os.environ.get('FORM8949_TEMPLATE_CACHE')
+FORM_TEMPLATE_SEED_DIR = os.environ.get('FORM8949_TEMPLATE_DIR')
+FORM_TEMPLATE_OFFLINE = os.environ.get('FORM8949_OFFLINE', '').lower() in ('1', 'true', 'yes')
+
+# Every year's template is fetched in the background when the app starts, and a year's
+# template parsed in the background once PDF output is chosen for it (set
+# FORM8949_TEMPLATE_WARMUP=0 to fetch and parse on first use instead)
+TEMPLATE_WARMUP = os.environ.get('FORM8949_TEMPLATE_WARMUP', '1').lower() not in ('0', 'false', 'no')
+TEMPLATE_WARMUP_WORKERS = 4
+
+# Incremental processing keeps each client's actions in a SQLite file here (off when unset)
+ACTION_STORE_DIR = os.environ.get('FORM8949_STORE_DIR')
 
 def main():
     st.set_page_config(
@@ -20,6 +129,20 @@ def main():
         layout="wide"
     )
     
+    if TEMPLATE_WARMUP:
+        get_template_warmup()
+    
+    with PipelineRun(mode='app') as run:
+        render_app(run)
+    
+    # Only runs that processed an upload are worth a record
+    if 'file_bytes' in run.context:
+        log_pipeline_run(run)
+        if st.session_state.get('show_diagnostics'):
+            show_pipeline_diagnostics(run)
+
+def render_app(run):
+    """Draw the converter page, recording its stages into run"""
     # Custom CSS for Bitwave styling and centering
     st.markdown("""
     <style>
@@ -335,14 +458,7 @@ def main():
     st.sidebar.markdown("**Form 8949 Type:**")
     form_type = st.sidebar.selectbox(
         "",
-        [
-            "Part I - Short-term (Box B) - Basis NOT reported", 
-            "Part I - Short-term (Box A) - Basis reported",
-            "Part I - Short-term (Box C) - Various situations",
-            "Part II - Long-term (Box B) - Basis NOT reported",
-            "Part II - Long-term (Box A) - Basis reported",
-            "Part II - Long-term (Box C) - Various situations"
-        ],
+        FORM_8949_TYPES,
         index=0
     )
     
@@ -352,6 +468,24 @@ def main():
     taxpayer_name = st.sidebar.text_input("Full Name", placeholder="Enter your full name")
     taxpayer_ssn = st.sidebar.text_input("Social Security Number", placeholder="XXX-XX-XXXX")
     
+    # Incremental processing against the client's local action store
+    client_id = None
+    if ACTION_STORE_DIR:
+        st.sidebar.markdown("---")
+        st.sidebar.markdown("**Incremental Processing:**")
+        client_id = st.sidebar.text_input(
+            "Client ID",
+            placeholder="Leave blank to process each upload from scratch",
+            help="Uploads with the same client ID share a local store, so a new cumulative export only processes the rows not seen before"
+        )
+    
+    st.sidebar.markdown("---")
+    st.sidebar.checkbox(
+        "🩺 Show diagnostics",
+        key="show_diagnostics",
+        help="Show how long each processing stage took, its memory use and cache statistics"
+    )
+    
     # Step 1: Tax Year Selection (Centered)
     st.markdown('<div class="step-container">', unsafe_allow_html=True)
     st.markdown('<div style="text-align: center;"><h2 class="step-header">🗓️ Step 1: Select Tax Year</h2></div>', unsafe_allow_html=True)
@@ -390,8 +524,8 @@ def main():
         
         uploaded_file = st.file_uploader(
             "",
-            type=["csv"],
-            help="Upload the CSV export from your Bitwave actions report"
+            type=["csv", "parquet"],
+            help="Upload the CSV export from your Bitwave actions report, or actions saved from this app as Parquet"
         )
     
     st.markdown('</div>', unsafe_allow_html=True)
@@ -401,14 +535,19 @@ def main():
         st.markdown('<div class="step-container">', unsafe_allow_html=True)
         
         try:
-            # Read the Bitwave actions file
-            df_raw = pd.read_csv(uploaded_file)
+            # Read the Bitwave actions file (cached across reruns by content hash)
+            run.context.update(tax_year=tax_year, file_bytes=uploaded_file.size)
+            with pipeline_stage('read_upload'):
+                upload = load_bitwave_upload(uploaded_file)
+            run.context.update(format=upload['format'], chunked=upload['chunked'])
             
-            st.success(f"✅ Bitwave actions file uploaded! Found {len(df_raw)} total actions.")
+            if upload['chunked']:
+                st.success(f"✅ Bitwave actions file uploaded! Processing {uploaded_file.size / (1024 * 1024):,.0f} MB in chunks.")
+            else:
+                st.success(f"✅ Bitwave actions file uploaded! Found {len(upload['df'])} total actions.")
             
             # Validate it's a Bitwave file
-            required_columns = ['action', 'asset', 'timestamp', 'lotId', ' proceeds ', ' costBasisRelieved ']
-            missing_columns = [col for col in required_columns if col not in df_raw.columns]
+            missing_columns = [col for col in BITWAVE_REQUIRED_COLUMNS if col not in upload['columns']]
             
             if missing_columns:
                 st.error(f"❌ This doesn't appear to be a valid Bitwave actions report.")
@@ -417,7 +556,42 @@ def main():
                 transactions = None
             else:
                 # Extract transactions using Bitwave-specific logic
-                transactions = extract_bitwave_transactions(df_raw, tax_year)
+                store = get_action_store(client_id) if client_id and client_id.strip() else None
+                if store is not None and upload['format'] != 'csv':
+                    st.info("ℹ️ Incremental processing needs the Bitwave CSV export; this Parquet upload is processed on its own.")
+                    store = None
+                extraction = load_bitwave_transactions(uploaded_file, upload, tax_year, store)
+                transactions = extraction['transactions']
+                run.context.update(transactions=len(transactions), incremental=store is not None)
+                transaction_totals = extraction['totals']
+                parse_issues = extraction['parse_issues']
+                
+                ingest = extraction.get('ingest')
+                if ingest is not None:
+                    if ingest['new_rows']:
+                        changed_years = ", ".join(str(year) for year in ingest['affected_years']) or "none"
+                        st.info(f"📚 Added {ingest['new_rows']:,} new actions to this client's store ({ingest['rows'] - ingest['new_rows']:,} already seen). Tax years updated: {changed_years}.")
+                    else:
+                        st.info(f"📚 All {ingest['rows']:,} actions were already in this client's store; using stored results.")
+                    if ingest['missing_rows']:
+                        st.warning(f"⚠️ {ingest['missing_rows']:,} stored actions are not in this export. If the history was edited in Bitwave, use a new client ID to rebuild from this export.")
+                
+                if parse_issues:
+                    st.warning(f"⚠️ {len(parse_issues)} amount(s) could not be read and were treated as $0.00. Please review them in your Bitwave export.")
+                    with st.expander("View unreadable amounts", expanded=False):
+                        st.dataframe(pd.DataFrame(parse_issues[:1000]), use_container_width=True)
+                
+                unmatched_lots = extraction['unmatched_lots']
+                if len(unmatched_lots) > 0:
+                    st.warning(f"⚠️ {unmatched_lots.sum()} sale(s) have no matching acquisition in this export. Their date acquired is shown as the sale date and the holding period comes from Bitwave's gain/loss columns.")
+                    with st.expander("View unmatched lots", expanded=False):
+                        st.dataframe(unmatched_lots.head(1000).reset_index(), use_container_width=True)
+                
+                duplicate_lot_ids = extraction['duplicate_lot_ids']
+                if len(duplicate_lot_ids) > 0:
+                    st.info(f"ℹ️ {len(duplicate_lot_ids)} lot ID(s) were acquired more than once; the latest acquisition date is used for each.")
+                    with st.expander("View repeated lot IDs", expanded=False):
+                        st.dataframe(pd.DataFrame({'Lot ID': duplicate_lot_ids[:1000]}), use_container_width=True)
                 
                 if transactions:
                     st.success(f"🎯 Extracted {len(transactions)} sell transactions for {tax_year}!")
@@ -425,40 +599,31 @@ def main():
                     # Show extracted transactions summary
                     st.markdown(f'<h3 style="text-align: center; color: var(--bitwave-dark);">{tax_year} Crypto Sales Summary</h3>', unsafe_allow_html=True)
                     
-                    # Create summary by asset
-                    asset_summary = {}
-                    for txn in transactions:
-                        asset = txn['asset']
-                        if asset not in asset_summary:
-                            asset_summary[asset] = {
-                                'count': 0,
-                                'proceeds': 0,
-                                'cost_basis': 0,
-                                'gain_loss': 0
-                            }
-                        asset_summary[asset]['count'] += 1
-                        asset_summary[asset]['proceeds'] += txn['proceeds']
-                        asset_summary[asset]['cost_basis'] += txn['cost_basis']
-                        asset_summary[asset]['gain_loss'] += txn['gain_loss']
-                    
-                    # Display asset summary
-                    summary_data = []
-                    for asset, data in asset_summary.items():
-                        summary_data.append({
-                            'Asset': asset,
-                            'Transactions': data['count'],
-                            'Total Proceeds': f"${data['proceeds']:,.2f}",
-                            'Total Cost Basis': f"${data['cost_basis']:,.2f}",
-                            'Net Gain/Loss': f"${data['gain_loss']:,.2f}"
-                        })
-                    
-                    summary_df = pd.DataFrame(summary_data)
+                    # Display the summary by asset, computed with the extraction
+                    asset_summary = extraction['asset_summary']
+                    summary_df = pd.DataFrame({
+                        'Asset': asset_summary.index,
+                        'Transactions': asset_summary['count'].to_numpy(),
+                        'Short-Term': asset_summary['short_term_count'].to_numpy(),
+                        'Long-Term': asset_summary['long_term_count'].to_numpy(),
+                        **{
+                            label: [f"${value:,.2f}" for value in asset_summary[column].tolist()]
+                            for label, column in (
+                                ('Total Proceeds', 'proceeds'),
+                                ('Total Cost Basis', 'cost_basis'),
+                                ('Net Gain/Loss', 'gain_loss'),
+                                ('Short-Term Gain/Loss', 'short_term_gain_loss'),
+                                ('Long-Term Gain/Loss', 'long_term_gain_loss')
+                            )
+                        }
+                    })
                     st.dataframe(summary_df, use_container_width=True)
                     
                     # Show overall totals in centered metrics
-                    total_proceeds = sum(t['proceeds'] for t in transactions)
-                    total_basis = sum(t['cost_basis'] for t in transactions)
-                    total_gain_loss = sum(t['gain_loss'] for t in transactions)
+                    overall_totals = transaction_totals['all'].totals()
+                    total_proceeds = overall_totals['proceeds']
+                    total_basis = overall_totals['cost_basis']
+                    total_gain_loss = overall_totals['gain_loss']
                     
                     col_a, col_b, col_c = st.columns(3)
                     with col_a:
@@ -468,26 +633,10 @@ def main():
                     with col_c:
                         st.metric("Net Gain/Loss", f"${total_gain_loss:,.2f}")
                     
-                    # Show detailed transactions in expander
+                    # Show detailed transactions in expander, a page at a time
                     with st.expander(f"📋 View All {len(transactions)} Transactions", expanded=False):
-                        display_transactions = []
-                        for i, txn in enumerate(transactions[:100]):
-                            display_transactions.append({
-                                '#': i + 1,
-                                'Asset': txn['asset'],
-                                'Sell Date': txn['date_sold'].strftime('%m/%d/%Y'),
-                                'Buy Date': txn['date_acquired'].strftime('%m/%d/%Y') if txn['date_acquired'] else 'Unknown',
-                                'Proceeds': f"${txn['proceeds']:.2f}",
-                                'Cost Basis': f"${txn['cost_basis']:.2f}",
-                                'Gain/Loss': f"${txn['gain_loss']:.2f}",
-                                'Term': 'Short' if txn['is_short_term'] else 'Long'
-                            })
-                        
-                        txn_df = pd.DataFrame(display_transactions)
-                        st.dataframe(txn_df, use_container_width=True)
-                        
-                        if len(transactions) > 100:
-                            st.info(f"Showing first 100 transactions. Total: {len(transactions)}")
+                        with pipeline_stage('transaction_browser'):
+                            show_transaction_browser(extraction['browser'], asset_summary.index)
                 
                 else:
                     st.error(f"❌ No sell transactions found for {tax_year}. Please check your selected year.")
@@ -519,14 +668,43 @@ def main():
                     "",
                     [
                         "📊 CSV file for tax software (TurboTax, TaxAct, etc.)",
-                        "📄 Complete Form 8949 PDF for IRS filing"
+                        "📄 Complete Form 8949 PDF for IRS filing",
+                        "🗃️ Parquet files for data analysis (Arrow)"
                     ],
                     help="Choose based on how you plan to file your taxes"
                 )
                 
+                if "PDF" in output_format:
+                    pdf_layout = st.radio(
+                        "PDF layout",
+                        [
+                            "📑 One combined PDF with every page",
+                            "📦 A separate PDF for each page (ZIP)"
+                        ],
+                        help="The combined PDF is smaller and easier to print or e-file"
+                    )
+                    
+                    if TEMPLATE_WARMUP:
+                        # A PDF is now likely, so load the form and the PDF libraries while the user decides
+                        template_state = get_template_warmup().prepare(tax_year).status(tax_year)
+                        if template_state == 'ready':
+                            st.caption(f"✅ The official IRS Form 8949 for {tax_year} is ready.")
+                        elif template_state in ('unavailable', 'failed'):
+                            st.caption(f"⚠️ The official IRS Form 8949 for {tax_year} could not be loaded; a custom form with the same columns will be used.")
+                        elif template_state == 'parsing':
+                            st.caption(f"⏳ The official IRS Form 8949 for {tax_year} is being prepared; generating now will wait for it.")
+                        else:
+                            st.caption(f"⏳ The official IRS Form 8949 for {tax_year} is still downloading; generating now will wait for it.")
+                    
+                    render_in_parallel = st.checkbox(
+                        "⚡ Render pages in parallel",
+                        value=False,
+                        help="Spread page rendering across all CPU cores. Worth it for hundreds of pages; the PDF is identical either way."
+                    )
+                
                 # Show term breakdown
-                short_term_count = sum(1 for t in transactions if t['is_short_term'])
-                long_term_count = len(transactions) - short_term_count
+                short_term_count = transaction_totals['short_term'].count
+                long_term_count = transaction_totals['long_term'].count
                 
                 if short_term_count > 0 and long_term_count > 0:
                     st.warning(f"⚠️ You have both short-term ({short_term_count}) and long-term ({long_term_count}) transactions. You may need separate Form 8949s for each.")
@@ -535,8 +713,13 @@ def main():
                 if st.button("🚀 Generate Files", type="primary"):
                     try:
                         if "CSV" in output_format:
-                            # Generate CSV for tax software
-                            csv_data = generate_tax_software_csv(transactions, tax_year)
+                            # Generate CSV for tax software, encoded as it is written
+                            csv_data = io.BytesIO()
+                            csv_text = io.TextIOWrapper(csv_data, encoding='utf-8', newline='', write_through=True)
+                            with pipeline_stage('tax_software_csv'):
+                                write_tax_software_csv(transactions, csv_text)
+                            csv_text.detach()
+                            csv_data.seek(0)
                             
                             filename = f"form_8949_{tax_year}_bitwave_transactions.csv"
                             st.download_button(
@@ -548,6 +731,39 @@ def main():
                             )
                             
                             st.success("✅ CSV file ready! This can be imported into most tax software.")
+                            
+                            csv_totals = transaction_totals['all'].totals()
+                            st.caption(f"The CSV's {len(transactions)} rows total ${csv_totals['proceeds']:,.2f} in proceeds, ${csv_totals['cost_basis']:,.2f} in cost basis and ${csv_totals['gain_loss']:,.2f} in gain/loss. Check these against your tax software after importing.")
+                        
+                        elif "Parquet" in output_format:
+                            # Typed columns, so analytics jobs and re-uploads skip CSV parsing
+                            transactions_buffer = io.BytesIO()
+                            with pipeline_stage('parquet_export'):
+                                transactions.to_parquet(transactions_buffer)
+                            st.download_button(
+                                label="📥 Download Form 8949 Transactions (Parquet)",
+                                data=transactions_buffer.getvalue(),
+                                file_name=f"form_8949_{tax_year}_bitwave_transactions.parquet",
+                                mime="application/vnd.apache.parquet",
+                                help=f"The {tax_year} sales as extracted for Form 8949"
+                            )
+                            
+                            actions_buffer = io.BytesIO()
+                            with pipeline_stage('parquet_export'):
+                                if upload['df'] is not None:
+                                    action_count = write_actions_parquet(upload['df'], actions_buffer)
+                                else:
+                                    uploaded_file.seek(0)
+                                    action_count = write_actions_parquet(uploaded_file, actions_buffer)
+                            st.download_button(
+                                label="📥 Download Normalized Actions (Parquet)",
+                                data=actions_buffer.getvalue(),
+                                file_name="bitwave_actions_normalized.parquet",
+                                mime="application/vnd.apache.parquet",
+                                help="Every action in the upload with typed columns. Upload it here again to skip CSV parsing."
+                            )
+                            
+                            st.success(f"✅ Parquet files ready: {len(transactions)} transactions and {action_count} actions.")
                         
                         else:
                             # Generate PDF Form 8949
@@ -555,57 +771,70 @@ def main():
                                 st.error("⚠️ Please fill in your taxpayer information in the sidebar to generate a PDF.")
                             else:
                                 # Split by term type if needed
-                                short_term_txns = [t for t in transactions if t['is_short_term']]
-                                long_term_txns = [t for t in transactions if not t['is_short_term']]
-                                
-                                pdf_files = []
-                                
-                                # Generate short-term PDF if applicable
-                                if short_term_txns:
-                                    short_form_type = form_type.replace("Part II", "Part I").replace("Long-term", "Short-term")
-                                    short_pdfs = generate_form_8949_pdf(
-                                        short_term_txns, 
-                                        short_form_type, 
-                                        taxpayer_name, 
-                                        taxpayer_ssn, 
-                                        tax_year,
-                                        "Short-term"
-                                    )
-                                    pdf_files.extend(short_pdfs)
-                                
-                                # Generate long-term PDF if applicable
-                                if long_term_txns:
-                                    long_form_type = form_type.replace("Part I", "Part II").replace("Short-term", "Long-term")
-                                    long_pdfs = generate_form_8949_pdf(
-                                        long_term_txns, 
-                                        long_form_type, 
-                                        taxpayer_name, 
-                                        taxpayer_ssn, 
-                                        tax_year,
-                                        "Long-term"
-                                    )
-                                    pdf_files.extend(long_pdfs)
+                                form_parts = split_form_8949_parts(transactions, transaction_totals, form_type)
+                                pdf_workers = os.cpu_count() if render_in_parallel else None
                                 
-                                if len(pdf_files) == 1:
-                                    # Single PDF
+                                if "combined" in pdf_layout:
+                                    # Every short-term and long-term page in one document
+                                    pdf_sections = [(part_txns, part_form_type, part_totals) for _, part_txns, part_form_type, part_totals in form_parts]
+                                    
+                                    pdf_buffer = io.BytesIO()
+                                    with pipeline_stage('pdf'):
+                                        page_count = generate_form_8949_document(pdf_buffer, pdf_sections, taxpayer_name, taxpayer_ssn, tax_year, workers=pdf_workers)
+                                    
                                     st.download_button(
                                         label="📥 Download Form 8949 PDF",
-                                        data=pdf_files[0]['content'],
-                                        file_name=pdf_files[0]['filename'],
+                                        data=pdf_buffer.getvalue(),
+                                        file_name=f"Form_8949_{tax_year}_{taxpayer_name.replace(' ', '_')}.pdf",
                                         mime="application/pdf",
                                         help="Print this PDF and mail to the IRS with your tax return"
                                     )
+                                    
+                                    st.success(f"✅ Generated a {page_count}-page Form 8949 PDF!")
+                                
                                 else:
-                                    # Multiple PDFs in ZIP
-                                    zip_data = create_zip_file(pdf_files)
-                                    st.download_button(
-                                        label="📦 Download All Form 8949 PDFs (ZIP)",
-                                        data=zip_data,
-                                        file_name=f"form_8949_{tax_year}_complete.zip",
-                                        mime="application/zip"
+                                    pdf_count = sum(part_totals.page_count for _, _, _, part_totals in form_parts)
+                                    
+                                    # Generate a short-term and/or long-term set of pages, one at a time
+                                    pdf_files = (
+                                        pdf_file
+                                        for term_type, part_txns, part_form_type, part_totals in form_parts
+                                        for pdf_file in iter_form_8949_pdfs(
+                                            part_txns, 
+                                            part_form_type, 
+                                            taxpayer_name, 
+                                            taxpayer_ssn, 
+                                            tax_year,
+                                            term_type,
+                                            workers=pdf_workers,
+                                            totals=part_totals
+                                        )
                                     )
-                                
-                                st.success(f"✅ Generated {len(pdf_files)} Form 8949 PDF(s)!")
+                                    
+                                    if pdf_count == 1:
+                                        # Single PDF
+                                        with pipeline_stage('pdf'):
+                                            pdf_file = next(pdf_files)
+                                        st.download_button(
+                                            label="📥 Download Form 8949 PDF",
+                                            data=pdf_file['content'],
+                                            file_name=pdf_file['filename'],
+                                            mime="application/pdf",
+                                            help="Print this PDF and mail to the IRS with your tax return"
+                                        )
+                                    else:
+                                        # Multiple PDFs in ZIP, packed as each page is rendered
+                                        import form8949_archive
+                                        with pipeline_stage('pdf'), form8949_archive.create_zip_file(pdf_files) as zip_file:
+                                            zip_data = zip_file.read()
+                                        st.download_button(
+                                            label="📦 Download All Form 8949 PDFs (ZIP)",
+                                            data=zip_data,
+                                            file_name=f"form_8949_{tax_year}_complete.zip",
+                                            mime="application/zip"
+                                        )
+                                    
+                                    st.success(f"✅ Generated {pdf_count} Form 8949 PDF(s)!")
                     
                     except Exception as e:
                         st.error(f"Error generating files: {str(e)}")
@@ -615,98 +844,1111 @@ def main():
         
         st.markdown('</div>', unsafe_allow_html=True)
 
-def extract_bitwave_transactions(df, target_year):
-    """Extract and process transactions from Bitwave actions report"""
+def show_transaction_browser(browser, assets):
+    """Show the transaction viewer: asset, term and sale date filters, sort order and one page of sales"""
+    date_sold = browser.transactions.column('date_sold')
+    first_day, last_day = date_sold.min().date(), date_sold.max().date()
+    
+    col_assets, col_term, col_dates = st.columns([2, 1, 2])
+    with col_assets:
+        selected_assets = st.multiselect("Assets", sorted(asset for asset in assets if isinstance(asset, str)), placeholder="All assets")
+    with col_term:
+        term = st.selectbox("Term", ["All", "Short-term", "Long-term"])
+    with col_dates:
+        date_range = st.date_input("Sell dates", (first_day, last_day), min_value=first_day, max_value=last_day)
+    
+    sort_labels = {
+        "Sell Date": 'date_sold', "Buy Date": 'date_acquired', "Asset": 'asset',
+        "Proceeds": 'proceeds', "Cost Basis": 'cost_basis', "Gain/Loss": 'gain_loss'
+    }
+    col_sort, col_order, col_size = st.columns(3)
+    with col_sort:
+        sort_by = st.selectbox("Sort by", list(sort_labels))
+    with col_order:
+        order = st.selectbox("Order", ["Ascending", "Descending"])
+    with col_size:
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=2)
+    
+    # A range still being picked has only its start date
+    start, end = (date_range[0], date_range[-1]) if len(date_range) else (None, None)
+    positions = browser.select(
+        sort_labels[sort_by], order == "Descending", selected_assets,
+        {"Short-term": 'short_term', "Long-term": 'long_term'}.get(term), start, end
+    )
+    
+    if len(positions) == 0:
+        st.info("No transactions match these filters.")
+        return
+    
+    page_count = -(-len(positions) // page_size)
+    page_number = st.number_input(f"Page (of {page_count:,})", min_value=1, max_value=page_count, value=1, step=1)
+    st.dataframe(browser.page(positions, page_number, page_size), use_container_width=True, hide_index=True)
+    
+    first_row = (page_number - 1) * page_size + 1
+    st.caption(f"Showing {first_row:,}-{min(first_row + page_size - 1, len(positions)):,} of {len(positions):,} matching transactions ({len(browser.transactions):,} in total)")
+
+def show_pipeline_diagnostics(run):
+    """Show a finished run's stage timings, memory and counters"""
+    record = run.record()
+    with st.expander("🩺 Diagnostics", expanded=True):
+        peak = f", peak memory +{record['peak_mb']:,.1f} MB" if record['peak_mb'] is not None else ""
+        st.caption(f"Run {record['run_id'][:8]} took {record['seconds']:.3f}s{peak}")
+        if record['stages']:
+            stages = pd.DataFrame(record['stages']).rename(columns={
+                'stage': 'Stage', 'calls': 'Calls', 'seconds': 'Seconds',
+                'self_seconds': 'Self Seconds', 'peak_mb': 'Peak MB'
+            })
+            st.dataframe(stages, use_container_width=True, hide_index=True)
+        if record['counters']:
+            st.dataframe(
+                pd.DataFrame(sorted(record['counters'].items()), columns=['Counter', 'Value']),
+                use_container_width=True, hide_index=True
+            )
+        st.json(record, expanded=False)
+
+class UploadCache:
+    """Size-bounded LRU cache shared by every session of the app
+    
+    Entries are evicted least recently used first once their estimated
+    sizes add up to more than max_bytes.
+    """
+    
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+    
+    def put(self, key, value, size):
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            # Anything bigger than the whole budget is simply not cached
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+@st.cache_resource
+def get_upload_cache():
+    """Return the process-wide upload cache, which survives Streamlit reruns"""
+    return UploadCache(UPLOAD_CACHE_MAX_BYTES)
+
+def upload_digest(uploaded_file):
+    """Content hash of an uploaded file, computed once per upload"""
+    # Streamlit gives every upload a file_id, so the hash is reused on reruns
+    file_id = getattr(uploaded_file, 'file_id', None)
+    session_key = f"upload_digest_{file_id}"
+    if file_id is not None and session_key in st.session_state:
+        return st.session_state[session_key]
+    
+    digest = hashlib.blake2b(uploaded_file.getvalue(), digest_size=20).hexdigest()
+    if file_id is not None:
+        st.session_state[session_key] = digest
+    return digest
+
+def load_bitwave_upload(uploaded_file):
+    """Read a Bitwave upload, or reuse the cached read of identical content
+    
+    Returns a dict with the parsed 'df' (None for uploads too large to load
+    whole, which are streamed instead), its 'columns', the 'chunked' flag and
+    the 'format': 'csv', or 'parquet' for actions saved by write_actions_parquet.
+    """
+    cache = get_upload_cache()
+    key = ('upload', upload_digest(uploaded_file))
+    upload = cache.get(key)
+    if upload is not None:
+        return upload
+    
+    if uploaded_file.name.lower().endswith('.parquet'):
+        # Already typed and compact, so read whole whatever its size
+        df = read_actions_parquet(uploaded_file)
+        upload = {'df': df, 'columns': list(df.columns), 'chunked': False, 'format': 'parquet'}
+        size = int(df.memory_usage(deep=True).sum())
+    elif uploaded_file.size > CHUNKED_INGEST_THRESHOLD_BYTES:
+        columns = pd.read_csv(uploaded_file, nrows=0).columns
+        uploaded_file.seek(0)
+        upload = {'df': None, 'columns': list(columns), 'chunked': True, 'format': 'csv'}
+        size = 0
+    else:
+        df = pd.read_csv(uploaded_file)
+        upload = {'df': df, 'columns': list(df.columns), 'chunked': False, 'format': 'csv'}
+        size = int(df.memory_usage(deep=True).sum())
+    
+    cache.put(key, upload, size)
+    return upload
+
+def load_bitwave_transactions(uploaded_file, upload, tax_year, store=None):
+    """Extract a tax year's transactions from an upload, reusing cached results
+    
+    Returns a dict with the year's 'transactions', their 'totals' (the
+    summarize_transactions result), the summarize_assets 'asset_summary', a
+    TransactionBrowser over them as 'browser', 'parse_issues',
+    'unmatched_lots' (sales per lot ID with no dated acquisition) and the
+    file's 'duplicate_lot_ids'.
+    Every year is extracted in the same pass and cached per file digest, so
+    switching years is a cache hit. Uploads too large to load whole are
+    spooled instead (see load_spooled_transactions), and with an
+    ActionStore the upload is processed incrementally (see
+    load_store_transactions).
+    """
+    if store is not None:
+        return load_store_transactions(uploaded_file, store, tax_year)
+    if upload['chunked']:
+        return load_spooled_transactions(uploaded_file, tax_year)
+    
+    cache = get_upload_cache()
+    key = ('transactions', upload_digest(uploaded_file))
+    extracted = cache.get(key)
+    
+    if extracted is None:
+        parse_issues = []
+        with pipeline_stage('extract'):
+            transactions_by_year, lot_index = extract_bitwave_transactions_by_year(upload['df'], parse_issues)
+        
+        issues_by_year = partition_issues_by_year(parse_issues)
+        extracted = {
+            'years': {
+                year: year_extraction(transactions, issues_by_year.get(year, []), lot_index.duplicate_lot_ids)
+                for year, transactions in transactions_by_year.items()
+            },
+            'duplicate_lot_ids': lot_index.duplicate_lot_ids
+        }
+        size = sum(year_extraction_nbytes(year) for year in extracted['years'].values())
+        cache.put(key, extracted, size)
+    else:
+        count_event('extraction_cache_hits')
+    
+    if tax_year not in extracted['years']:
+        return year_extraction(TransactionTable.from_records([]), [], extracted['duplicate_lot_ids'])
+    return extracted['years'][tax_year]
+
+def load_spooled_transactions(uploaded_file, tax_year):
+    """load_bitwave_transactions for an upload too large to load whole
+    
+    The upload's sells are spooled to disk in one chunked pass (SellSpool),
+    cached per file digest, and each tax year is read back and matched to
+    its lots when first asked for. Only the lot index and that year's sales
+    are held in memory, and switching years does not read the CSV again.
+    """
+    cache = get_upload_cache()
+    digest = upload_digest(uploaded_file)
+    spooled = cache.get(('spool', digest))
+    if spooled is None:
+        parse_issues = []
+        uploaded_file.seek(0)
+        with pipeline_stage('extract'):
+            spool = SellSpool(uploaded_file, issues=parse_issues)
+        # The spool's file is shared by every session reading the upload
+        spooled = {'spool': spool, 'issues_by_year': partition_issues_by_year(parse_issues), 'lock': threading.Lock()}
+        cache.put(('spool', digest), spooled, spool.lot_index.nbytes)
+    
+    key = ('transactions', digest, tax_year)
+    extracted = cache.get(key)
+    if extracted is None:
+        spool = spooled['spool']
+        with pipeline_stage('extract'), spooled['lock']:
+            transactions = TransactionTable.concat(list(spool.transactions(tax_year)))
+            extracted = year_extraction(transactions, spooled['issues_by_year'].get(tax_year, []), spool.lot_index.duplicate_lot_ids)
+        cache.put(key, extracted, year_extraction_nbytes(extracted))
+    else:
+        count_event('extraction_cache_hits')
+    
+    return extracted
+
+def load_store_transactions(uploaded_file, store, tax_year):
+    """load_bitwave_transactions backed by a client's ActionStore
+    
+    The upload is ingested once per file digest, adding only the rows the
+    store has not seen. Year results are cached by the year's store version,
+    so only the years an ingest changed are extracted again. The result also
+    carries the upload's 'ingest' summary (see ActionStore.ingest).
+    """
+    cache = get_upload_cache()
+    ingest_key = ('ingested', store.path, upload_digest(uploaded_file))
+    ingest = cache.get(ingest_key)
+    if ingest is None:
+        uploaded_file.seek(0)
+        with pipeline_stage('store_ingest'):
+            ingest = store.ingest(uploaded_file)
+        cache.put(ingest_key, ingest, 0)
+    
+    key = ('store_year', store.path, tax_year, store.year_version(tax_year))
+    extracted = cache.get(key)
+    if extracted is None:
+        parse_issues = []
+        with pipeline_stage('extract'):
+            lot_index = store.lot_index()
+            transactions = store.extract_year(tax_year, parse_issues, lot_index)
+            extracted = year_extraction(transactions, parse_issues, lot_index.duplicate_lot_ids)
+        cache.put(key, extracted, year_extraction_nbytes(extracted))
+    else:
+        count_event('extraction_cache_hits')
+    
+    return {**extracted, 'ingest': ingest}
+
+def year_extraction(transactions, parse_issues, duplicate_lot_ids):
+    """The per-year result dict returned by load_bitwave_transactions"""
+    return {
+        'transactions': transactions,
+        'totals': summarize_transactions(transactions),
+        'asset_summary': summarize_assets(transactions),
+        'browser': TransactionBrowser(transactions),
+        'parse_issues': parse_issues,
+        'unmatched_lots': count_unmatched_lots(transactions),
+        'duplicate_lot_ids': duplicate_lot_ids
+    }
+
+def year_extraction_nbytes(extracted):
+    """Size of a year_extraction result for the upload cache
+    
+    Counts the transactions, the asset summary and every sort order the
+    browser may compute later, since the cached entry grows by those as
+    the viewer is used.
+    """
+    return (
+        extracted['transactions'].nbytes
+        + int(extracted['asset_summary'].memory_usage(deep=True).sum())
+        + extracted['browser'].nbytes
+    )
+
+def count_unmatched_lots(transactions):
+    """Number of sales per lot ID that could not be joined to a dated acquisition"""
+    unmatched = np.flatnonzero(~transactions.column('lot_matched'))
+    lot_ids = pd.Series(transactions.column('lot_id').take(unmatched))
+    return lot_ids.value_counts(dropna=False).rename_axis('Lot ID').rename('Sales')
+
+class TransactionTable:
+    """Extracted sales stored column by column instead of one dict per sale
+    
+    Money and flags are numpy arrays, dates are pandas datetime arrays, and
+    asset and description are Categoricals, so each distinct value is stored
+    once. Tables slice (a slice shares the parent's memory), filter by term
+    and iterate as TransactionRow views with the same keys the per-sale
+    dicts used to have, plus lot_matched: whether the sale was joined to a
+    dated acquisition of its lot.
+    """
+    
+    COLUMNS = (
+        'asset', 'description', 'date_acquired', 'date_sold',
+        'proceeds', 'cost_basis', 'gain_loss', 'reported_gain_loss',
+        'short_term_gain_loss', 'long_term_gain_loss',
+        'is_short_term', 'is_long_term', 'lot_id', 'lot_matched'
+    )
+    
+    # Rows are converted to Python values this many at a time while iterating
+    ITER_BLOCK_ROWS = 4096
+    
+    def __init__(self, columns):
+        self._columns = {name: columns[name] for name in self.COLUMNS}
+        self._length = len(self._columns['proceeds'])
     
-    # Create lot mapping from buy transactions
-    lot_map = {}
-    buy_transactions = df[df['action'] == 'buy'].copy()
+    @classmethod
+    def from_records(cls, records):
+        """Build a table from per-sale dicts, filling in any missing keys"""
+        def values(name, default=None):
+            return [record.get(name, default) for record in records]
+        
+        return cls({
+            'asset': pd.Categorical(values('asset')),
+            'description': pd.Categorical(values('description')),
+            'date_acquired': pd.DatetimeIndex(values('date_acquired')).array,
+            'date_sold': pd.DatetimeIndex(values('date_sold')).array,
+            **{
+                name: np.array(values(name, 0.0), dtype=float)
+                for name in ('proceeds', 'cost_basis', 'gain_loss', 'reported_gain_loss', 'short_term_gain_loss', 'long_term_gain_loss')
+            },
+            'is_short_term': np.array(values('is_short_term', False), dtype=bool),
+            'is_long_term': np.array(values('is_long_term', False), dtype=bool),
+            'lot_id': pd.array(values('lot_id'), dtype=object),
+            'lot_matched': np.array(values('lot_matched', False), dtype=bool)
+        })
     
-    for _, row in buy_transactions.iterrows():
-        if pd.notna(row['lotId']):
-            lot_map[row['lotId']] = {
-                'buy_date': pd.to_datetime(row['timestamp']),
-                'asset': row['asset'],
-                'cost_basis_acquired': clean_currency_value(row.get(' costBasisAcquired ', 0))
-            }
+    def __len__(self):
+        return self._length
+    
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return TransactionTable({name: values[key] for name, values in self._columns.items()})
+        # A one-row block, so a row read by position has the same Python types as when iterated
+        index = range(self._length)[key]
+        return TransactionRow(TransactionBlock(self._columns, index, index + 1), 0)
+    
+    def __iter__(self):
+        for start in range(0, self._length, self.ITER_BLOCK_ROWS):
+            block = TransactionBlock(self._columns, start, min(start + self.ITER_BLOCK_ROWS, self._length))
+            for index in range(block.length):
+                yield TransactionRow(block, index)
+    
+    def column(self, name):
+        return self._columns[name]
+    
+    @classmethod
+    def concat(cls, tables):
+        """Join tables end to end into one new table"""
+        if not tables:
+            return cls.from_records([])
+        
+        columns = {}
+        for name in cls.COLUMNS:
+            parts = [table.column(name) for table in tables]
+            if isinstance(parts[0], np.ndarray):
+                columns[name] = np.concatenate(parts)
+            elif isinstance(parts[0], pd.Categorical):
+                columns[name] = union_categoricals(parts)
+            else:
+                columns[name] = pd.concat([pd.Series(part) for part in parts], ignore_index=True).array
+        return cls(columns)
+    
+    def filter(self, mask):
+        """Rows where the boolean mask is set, in order"""
+        return self.take(np.flatnonzero(mask))
+    
+    def take(self, positions):
+        """Rows at the given integer positions, in that order"""
+        positions = np.asarray(positions, dtype=np.intp)
+        return TransactionTable({name: values[positions] for name, values in self._columns.items()})
+    
+    def short_term(self):
+        return self.filter(self._columns['is_short_term'])
+    
+    def long_term(self):
+        return self.filter(~self._columns['is_short_term'])
+    
+    @property
+    def nbytes(self):
+        return sum(int(values.nbytes) for values in self._columns.values())
+    
+    def to_arrow(self):
+        """The table as Arrow: typed dates, money and flags, dictionary-encoded asset and description"""
+        table = pa.Table.from_pandas(pd.DataFrame({name: self._columns[name] for name in self.COLUMNS}), preserve_index=False)
+        return table.replace_schema_metadata({**table.schema.metadata, PARQUET_KIND_KEY: b'transactions'})
+    
+    @classmethod
+    def from_arrow(cls, table):
+        """Rebuild a table from to_arrow's output"""
+        frame = table.to_pandas()
+        return cls({
+            'asset': pd.Categorical(frame['asset']),
+            'description': pd.Categorical(frame['description']),
+            'date_acquired': frame['date_acquired'].array,
+            'date_sold': frame['date_sold'].array,
+            **{
+                name: frame[name].to_numpy(dtype=float)
+                for name in ('proceeds', 'cost_basis', 'gain_loss', 'reported_gain_loss', 'short_term_gain_loss', 'long_term_gain_loss')
+            },
+            **{name: frame[name].to_numpy(dtype=bool) for name in ('is_short_term', 'is_long_term', 'lot_matched')},
+            'lot_id': frame['lot_id'].array
+        })
+    
+    def to_parquet(self, dest):
+        """Write the table to a Parquet file or binary file object"""
+        pq.write_table(self.to_arrow(), dest)
+    
+    @classmethod
+    def read_parquet(cls, source):
+        """Read a table written by to_parquet"""
+        table = pq.read_table(source)
+        check_parquet_kind(table, 'transactions')
+        return cls.from_arrow(table)
+
+class TransactionBlock(dict):
+    """Rows start:stop of a table's columns, converted to Python lists on first use
+    
+    Iterating rows this way costs one bulk conversion per column actually
+    read, instead of one pandas lookup per cell.
+    """
+    
+    def __init__(self, columns, start, stop):
+        super().__init__()
+        self._source = columns
+        self._start = start
+        self.length = stop - start
+    
+    def __missing__(self, name):
+        values = self._source[name][self._start:self._start + self.length]
+        if isinstance(values, pd.Categorical):
+            categories = values.categories.tolist()
+            converted = [categories[code] if code >= 0 else np.nan for code in values.codes.tolist()]
+        elif isinstance(values, np.ndarray):
+            converted = values.tolist()
+        else:
+            converted = list(values.astype(object))
+        self[name] = converted
+        return converted
+
+class TransactionRow(Mapping):
+    """Read-only view of one row of a TransactionTable, keyed like a sale dict"""
+    
+    __slots__ = ('_columns', '_index')
+    
+    def __init__(self, columns, index):
+        self._columns = columns
+        self._index = index
+    
+    def __getitem__(self, key):
+        if key not in TransactionTable.COLUMNS:
+            raise KeyError(key)
+        return self._columns[key][self._index]
+    
+    def __iter__(self):
+        return iter(TransactionTable.COLUMNS)
+    
+    def __len__(self):
+        return len(TransactionTable.COLUMNS)
+
+def extract_bitwave_transactions(df, target_year, issues=None):
+    """Extract and process transactions from Bitwave actions report
+    
+    Money cells that cannot be parsed are treated as 0.0; pass a list as
+    issues to collect them as {'row', 'column', 'value'} dicts.
+    """
+    lot_index = LotIndex.from_actions(df)
+    sells = select_year_sells(df, target_year, issues)
+    return match_sells_to_lots(sells, lot_index)
+
+def extract_bitwave_transactions_chunked(source, target_year, chunksize=BITWAVE_CHUNK_ROWS, issues=None):
+    """Extract transactions from a Bitwave actions CSV without loading it whole
+    
+    Reads fixed-size chunks of only the columns the extraction uses, with
+    compact dtypes. Each chunk adds its acquisitions to the lot index and
+    its parsed sells for target_year to the sell stream, so peak memory
+    follows the number of lots and matching sells rather than the file size.
+    """
+    sells, lot_index = read_bitwave_sells_chunked(source, target_year, chunksize, issues)
+    if sells is None:
+        return TransactionTable.from_records([])
+    
+    return match_sells_to_lots(sells, lot_index)
+
+def extract_bitwave_transactions_by_year(df, issues=None):
+    """Extract the transactions of every tax year in one pass over the export
+    
+    Sells are parsed and matched to their lots once, then partitioned by the
+    year they were sold in. Returns ({tax_year: TransactionTable}, LotIndex).
+    Parse issues are collected with the 'tax_year' of their row; see
+    partition_issues_by_year.
+    """
+    lot_index = LotIndex.from_actions(df)
+    sells = select_year_sells(df, None, issues)
+    return partition_by_tax_year(match_sells_to_lots(sells, lot_index)), lot_index
+
+def extract_bitwave_transactions_by_year_chunked(source, chunksize=BITWAVE_CHUNK_ROWS, issues=None, tax_years=None):
+    """extract_bitwave_transactions_by_year for a CSV read in chunks
+    
+    The sells are spooled to disk (see SellSpool) rather than collected, and
+    each year is read back on its own, so only the lot index and the
+    returned years' sales are held in memory. Pass tax_years to extract only
+    those years.
+    """
+    with SellSpool(source, chunksize, issues) as spool:
+        years = spool.tax_years if tax_years is None else spool.tax_years.intersection(tax_years)
+        transactions_by_year = {
+            year: TransactionTable.concat(list(spool.transactions(year)))
+            for year in sorted(years)
+        }
+    return transactions_by_year, spool.lot_index
+
+def read_bitwave_sells_chunked(source, target_year, chunksize=BITWAVE_CHUNK_ROWS, issues=None):
+    """Stream a Bitwave CSV into (sells, lot_index); sells is None if it has no rows
+    
+    Each chunk's sells are filtered to target_year before they are kept.
+    """
+    lot_parts = []
+    sell_parts = []
+    
+    reader = pd.read_csv(
+        source,
+        usecols=lambda column: column in BITWAVE_INGEST_DTYPES,
+        dtype=BITWAVE_INGEST_DTYPES,
+        chunksize=chunksize
+    )
+    for chunk in reader:
+        lot_parts.append(LotIndex.from_actions(chunk))
+        sell_parts.append(select_year_sells(chunk, target_year, issues))
     
-    # Process sell transactions
-    sell_transactions = df[df['action'] == 'sell'].copy()
-    form8949_transactions = []
+    if not sell_parts:
+        return None, LotIndex()
     
-    for _, row in sell_transactions.iterrows():
+    # Later chunks win for a repeated lot, same as a single-pass read
+    return pd.concat(sell_parts), LotIndex.concat(lot_parts)
+
+def partition_by_tax_year(transactions):
+    """Split transactions into {tax_year: TransactionTable} by the year sold
+    
+    One stable sort groups the years, keeping each year's sales in their
+    original order; every partition is a slice of the sorted table.
+    """
+    years = np.asarray(transactions.column('date_sold').year)
+    if len(years) == 0:
+        return {}
+    order = np.argsort(years, kind='stable')
+    years = years[order]
+    ordered = transactions.take(order)
+    
+    boundaries = [0, *(np.flatnonzero(np.diff(years)) + 1).tolist(), len(years)]
+    return {
+        int(years[start]): ordered[start:end]
+        for start, end in zip(boundaries[:-1], boundaries[1:])
+    }
+
+def partition_issues_by_year(issues):
+    """Group parse issues from an all-years extraction into {tax_year: issues}"""
+    issues_by_year = {}
+    for issue in issues:
+        issues_by_year.setdefault(issue.pop('tax_year'), []).append(issue)
+    return issues_by_year
+
+class SellSpool:
+    """Every sell of a Bitwave CSV, parsed once and spooled to a temporary file
+    
+    The all-years counterpart of read_bitwave_sells_chunked: one chunked
+    pass over the CSV builds the lot index and writes each chunk's parsed
+    sells to an Arrow stream on disk instead of keeping them. transactions()
+    reads them back a chunk at a time, matched to their lots, so only the
+    lot index and one chunk of sales are in memory at once. Parse issues
+    carry their 'tax_year', as for extract_bitwave_transactions_by_year.
+    """
+    
+    def __init__(self, source, chunksize=BITWAVE_CHUNK_ROWS, issues=None):
+        self._file = tempfile.TemporaryFile()
+        self.tax_years = set()
+        self.count = 0
+        lot_parts = []
+        writer = None
+        
+        reader = pd.read_csv(
+            source,
+            usecols=lambda column: column in BITWAVE_INGEST_DTYPES,
+            dtype=BITWAVE_INGEST_DTYPES,
+            chunksize=chunksize
+        )
         try:
-            # Parse sell date
-            sell_date = pd.to_datetime(row['timestamp'])
-            
-            # Filter by target year
-            if sell_date.year != target_year:
-                continue
-            
-            # Get lot information
-            lot_id = row['lotId']
-            lot_info = lot_map.get(lot_id, {})
-            buy_date = lot_info.get('buy_date')
-            
-            # Extract monetary values
-            proceeds = clean_currency_value(row.get(' proceeds ', 0))
-            cost_basis = clean_currency_value(row.get(' costBasisRelieved ', 0))
-            
-            # Skip if no meaningful transaction
-            if proceeds <= 0 and cost_basis <= 0:
+            for chunk in reader:
+                lot_parts.append(LotIndex.from_actions(chunk))
+                sells = select_year_sells(chunk, None, issues)
+                if len(sells) == 0:
+                    continue
+                self.tax_years.update(sells['date_sold'].dt.year.unique().tolist())
+                self.count += len(sells)
+                
+                # Assets are spooled as plain strings, since each chunk has its own categories
+                table = pa.Table.from_pandas(sells.astype({'asset': str}), preserve_index=False).replace_schema_metadata()
+                if writer is None:
+                    schema = table.schema
+                    writer = pa.ipc.new_stream(self._file, schema)
+                writer.write_table(table.cast(schema))
+        finally:
+            if writer is not None:
+                writer.close()
+        
+        self._spooled = writer is not None
+        self.lot_index = LotIndex.concat(lot_parts)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        self._file.close()
+    
+    def transactions(self, tax_year=None, term=None):
+        """Yield the spooled sales as TransactionTable chunks, in export order
+        
+        Only sales of tax_year are kept if it is given, and only the
+        'short_term' or 'long_term' ones if term is.
+        """
+        if not self._spooled:
+            return
+        self._file.seek(0)
+        for batch in pa.ipc.open_stream(self._file):
+            sells = batch.to_pandas()
+            if tax_year is not None:
+                sells = sells[(sells['date_sold'].dt.year == tax_year).to_numpy()]
+            if len(sells) == 0:
                 continue
+            transactions = match_sells_to_lots(sells, self.lot_index)
+            if term == 'short_term':
+                transactions = transactions.short_term()
+            elif term == 'long_term':
+                transactions = transactions.long_term()
+            if len(transactions):
+                yield transactions
+
+class LotIndex:
+    """Acquisition date of every lotId in an export, for joining sells to their lots
+    
+    Built in one vectorized pass over the acquisition actions
+    (BITWAVE_ACQUISITION_ACTIONS) and joined to sells in bulk through a hash
+    lookup, so both are O(n) in the number of rows. A lot acquired more than
+    once keeps its last acquisition and is listed in duplicate_lot_ids.
+    """
+    
+    def __init__(self, lot_ids=(), acquired=None, duplicate_lot_ids=()):
+        lot_ids = pd.Index(lot_ids)
+        if acquired is None:
+            acquired = pd.DatetimeIndex([]).array
+        
+        repeats = lot_ids[lot_ids.duplicated(keep='first')]
+        for known in duplicate_lot_ids:
+            repeats = repeats.append(pd.Index(known))
+        self.duplicate_lot_ids = repeats.unique()
+        
+        latest = ~lot_ids.duplicated(keep='last')
+        self._lot_ids = lot_ids[latest]
+        self._acquired = acquired[latest]
+    
+    @classmethod
+    def from_actions(cls, df):
+        """Index the acquisitions in a Bitwave actions DataFrame"""
+        acquisitions = df.loc[df['action'].isin(BITWAVE_ACQUISITION_ACTIONS) & df['lotId'].notna(), ['lotId', 'timestamp']]
+        return cls(acquisitions['lotId'].array, parse_bitwave_timestamps(acquisitions['timestamp']).array)
+    
+    @classmethod
+    def concat(cls, indexes):
+        """Merge indexes built from consecutive parts of one export (later parts win)"""
+        if not indexes:
+            return cls()
+        
+        lot_ids = indexes[0]._lot_ids.append([index._lot_ids for index in indexes[1:]])
+        acquired = pd.concat([pd.Series(index._acquired) for index in indexes], ignore_index=True).array
+        return cls(lot_ids, acquired, [index.duplicate_lot_ids for index in indexes])
+    
+    def __len__(self):
+        return len(self._lot_ids)
+    
+    @property
+    def nbytes(self):
+        return int(self._lot_ids.memory_usage(deep=True)) + int(self._acquired.nbytes)
+    
+    def acquisition_dates(self, lot_ids):
+        """Acquisition date for each of lot_ids (a Series), NaT where the lot is unknown"""
+        positions = self._lot_ids.get_indexer(lot_ids)
+        return pd.Series(self._acquired.take(positions, allow_fill=True), index=lot_ids.index)
+
+class ActionStore:
+    """Persistent per-client store of Bitwave actions for incremental processing
+    
+    Bitwave exports are cumulative, so each new export repeats every earlier
+    row. The store keeps the raw actions in a local SQLite file, keyed by a
+    fingerprint of each row's contents (and its occurrence number among
+    identical rows), together with the lot index. Ingesting an export only
+    inserts rows not seen before and bumps the version of every tax year
+    whose sales those rows can change: years with new sells, and years with
+    sells of lots that gained an acquisition. Year results can then be
+    cached by (tax year, version) and only the affected years re-extracted.
+    """
+    
+    SCHEMA_VERSION = 1
+    
+    # Bitwave column -> store column
+    COLUMNS = {
+        'action': 'action',
+        'asset': 'asset',
+        'timestamp': 'timestamp',
+        'lotId': 'lot_id',
+        ' proceeds ': 'proceeds',
+        ' costBasisRelieved ': 'cost_basis_relieved',
+        ' shortTermGainLoss ': 'short_term_gain_loss',
+        ' longTermGainLoss ': 'long_term_gain_loss',
+        ' costBasisAcquired ': 'cost_basis_acquired'
+    }
+    
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            self._create_schema(conn)
+    
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _create_schema(self, conn):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+        version = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        if version is not None and version[0] != self.SCHEMA_VERSION:
+            raise ValueError(f"{self.path} uses store schema {version[0]}; expected {self.SCHEMA_VERSION}")
+        
+        columns = ", ".join(f"{column} TEXT" for column in self.COLUMNS.values())
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS actions (
+                fingerprint INTEGER PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                {columns},
+                sell_year INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS actions_sell_year ON actions (sell_year, seq);
+            CREATE INDEX IF NOT EXISTS actions_lot_id ON actions (lot_id);
+            CREATE TABLE IF NOT EXISTS lots (
+                lot_id TEXT PRIMARY KEY,
+                acquired TEXT,
+                seq INTEGER NOT NULL,
+                acquisitions INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS year_versions (
+                tax_year INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL
+            );
+        """)
+        conn.execute("INSERT OR IGNORE INTO meta VALUES ('schema_version', ?)", (self.SCHEMA_VERSION,))
+    
+    def ingest(self, source, chunksize=BITWAVE_CHUNK_ROWS):
+        """Add the rows of a Bitwave actions CSV that the store has not seen
+        
+        Returns a dict with the export's 'rows', the 'new_rows' inserted, the
+        'affected_years' whose results changed, and 'missing_rows': stored
+        rows absent from this export, which means it is not a superset of
+        what was ingested before (e.g. history was edited in Bitwave).
+        """
+        reader = pd.read_csv(
+            source,
+            usecols=lambda column: column in self.COLUMNS,
+            dtype=str,
+            chunksize=chunksize
+        )
+        rows = 0
+        new_rows = 0
+        affected_years = set()
+        occurrences = pd.Series(dtype='int64')
+        
+        with self._lock, self._connect() as conn:
+            stored = pd.Index(pd.read_sql_query("SELECT fingerprint FROM actions", conn)['fingerprint'])
+            seen = np.zeros(len(stored), dtype=bool)
+            next_seq = conn.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM actions").fetchone()[0]
+            conn.execute("CREATE TEMP TABLE touched_lots (lot_id TEXT PRIMARY KEY)")
             
-            # Parse gain/loss values for validation
-            short_term_gl = clean_currency_value(row.get(' shortTermGainLoss ', 0))
-            long_term_gl = clean_currency_value(row.get(' longTermGainLoss ', 0))
-            
-            # Calculate gain/loss
-            calculated_gain_loss = proceeds - cost_basis
-            reported_gain_loss = short_term_gl + long_term_gl
-            
-            # Determine if short-term or long-term
-            is_short_term = abs(short_term_gl) > 0.01
-            is_long_term = abs(long_term_gl) > 0.01
-            
-            # If buy date is available, calculate holding period
-            if buy_date and sell_date:
-                holding_days = (sell_date - buy_date).days
-                # Override with actual holding period if available
-                if holding_days <= 365:
-                    is_short_term = True
-                    is_long_term = False
-                else:
-                    is_short_term = False
-                    is_long_term = True
-            
-            # Create transaction record
-            transaction = {
-                'asset': row['asset'],
-                'description': f"{row['asset']} cryptocurrency",
-                'date_acquired': buy_date or sell_date,
-                'date_sold': sell_date,
-                'proceeds': proceeds,
-                'cost_basis': cost_basis,
-                'gain_loss': calculated_gain_loss,
-                'reported_gain_loss': reported_gain_loss,
-                'short_term_gain_loss': short_term_gl,
-                'long_term_gain_loss': long_term_gl,
-                'is_short_term': is_short_term,
-                'is_long_term': is_long_term,
-                'lot_id': lot_id
-            }
-            
-            form8949_transactions.append(transaction)
+            for chunk in reader:
+                chunk = chunk.reindex(columns=list(self.COLUMNS))
+                fingerprints, occurrences = self._fingerprints(chunk, occurrences)
+                positions = stored.get_indexer(fingerprints)
+                seen[positions[positions >= 0]] = True
+                new = chunk[positions < 0]
+                rows += len(chunk)
+                if len(new) == 0:
+                    continue
+                
+                seqs = np.arange(next_seq, next_seq + len(new))
+                next_seq += len(new)
+                is_sell = (new['action'] == 'sell').to_numpy()
+                sell_years = parse_bitwave_timestamps(new.loc[is_sell, 'timestamp']).dt.year
+                years = pd.Series(pd.NA, index=new.index, dtype='Int64')
+                years[is_sell] = sell_years
+                affected_years.update(int(year) for year in sell_years.dropna().unique())
+                
+                records = new.astype(object).where(new.notna(), None)
+                conn.executemany(
+                    f"INSERT INTO actions (fingerprint, seq, {', '.join(self.COLUMNS.values())}, sell_year) "
+                    f"VALUES ({', '.join('?' * (len(self.COLUMNS) + 3))})",
+                    zip(
+                        fingerprints[positions < 0].tolist(),
+                        seqs.tolist(),
+                        *(records[column].tolist() for column in self.COLUMNS),
+                        years.astype(object).where(years.notna(), None).tolist()
+                    )
+                )
+                
+                # Later rows win for a repeated lot, same as LotIndex
+                is_acquisition = (new['action'].isin(BITWAVE_ACQUISITION_ACTIONS) & new['lotId'].notna()).to_numpy()
+                acquisitions = list(zip(new.loc[is_acquisition, 'lotId'], records.loc[is_acquisition, 'timestamp'], seqs[is_acquisition].tolist()))
+                conn.executemany("""
+                    INSERT INTO lots (lot_id, acquired, seq, acquisitions) VALUES (?, ?, ?, 1)
+                    ON CONFLICT (lot_id) DO UPDATE SET
+                        acquired = CASE WHEN excluded.seq > lots.seq THEN excluded.acquired ELSE lots.acquired END,
+                        seq = MAX(lots.seq, excluded.seq),
+                        acquisitions = lots.acquisitions + 1
+                """, acquisitions)
+                conn.executemany("INSERT OR IGNORE INTO touched_lots VALUES (?)", ((lot_id,) for lot_id, _, _ in acquisitions))
+                new_rows += len(new)
             
-        except Exception as e:
-            # Skip problematic rows
-            continue
+            # Earlier sales of a lot that gained an acquisition may change term or date
+            affected_years.update(year for (year,) in conn.execute("""
+                SELECT DISTINCT sell_year FROM actions
+                WHERE sell_year IS NOT NULL AND lot_id IN (SELECT lot_id FROM touched_lots)
+            """))
+            conn.execute("DROP TABLE touched_lots")
+            conn.executemany("""
+                INSERT INTO year_versions (tax_year, version) VALUES (?, 1)
+                ON CONFLICT (tax_year) DO UPDATE SET version = version + 1
+            """, ((year,) for year in affected_years))
+        
+        return {
+            'rows': rows,
+            'new_rows': new_rows,
+            'affected_years': sorted(affected_years),
+            'missing_rows': int((~seen).sum())
+        }
+    
+    @staticmethod
+    def _fingerprints(chunk, occurrences):
+        """64-bit key per row: its contents plus how many identical rows came before it
+        
+        occurrences counts each row hash across earlier chunks; the updated
+        counts are returned alongside the keys.
+        """
+        row_hashes = pd.util.hash_pandas_object(chunk, index=False)
+        occurrence = row_hashes.groupby(row_hashes).cumcount() + row_hashes.map(occurrences).fillna(0).astype('int64').to_numpy()
+        keys = pd.util.hash_pandas_object(pd.DataFrame({'row': row_hashes.to_numpy(), 'occurrence': occurrence.to_numpy()}), index=False)
+        occurrences = occurrences.add(row_hashes.value_counts(), fill_value=0).astype('int64')
+        return pd.Index(keys.to_numpy().view(np.int64)), occurrences
+    
+    def tax_years(self):
+        """Tax years with at least one stored sell"""
+        with self._connect() as conn:
+            return [year for (year,) in conn.execute("SELECT DISTINCT sell_year FROM actions WHERE sell_year IS NOT NULL ORDER BY sell_year")]
+    
+    def year_version(self, tax_year):
+        """Counter bumped whenever an ingest changes tax_year's results (0 if never)"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT version FROM year_versions WHERE tax_year = ?", (tax_year,)).fetchone()
+        return row[0] if row else 0
+    
+    def lot_index(self):
+        """The LotIndex of every stored acquisition"""
+        with self._connect() as conn:
+            lots = pd.read_sql_query("SELECT lot_id, acquired, acquisitions FROM lots ORDER BY seq", conn)
+        return LotIndex(
+            lots['lot_id'].array,
+            parse_bitwave_timestamps(lots['acquired']).array,
+            [lots.loc[lots['acquisitions'] > 1, 'lot_id']]
+        )
     
-    return form8949_transactions
+    def extract_year(self, tax_year, issues=None, lot_index=None):
+        """extract_bitwave_transactions for tax_year, reading only that year's stored sells
+        
+        Issue rows are the store's sequence numbers, which match row
+        positions in the first export ingested.
+        """
+        with self._connect() as conn:
+            sells = pd.read_sql_query(
+                f"SELECT seq, {', '.join(self.COLUMNS.values())} FROM actions WHERE sell_year = ? ORDER BY seq",
+                conn,
+                params=(tax_year,),
+                index_col='seq'
+            )
+        sells.columns = list(self.COLUMNS)
+        sells.index.name = None
+        
+        if lot_index is None:
+            lot_index = self.lot_index()
+        return match_sells_to_lots(select_year_sells(sells, tax_year, issues), lot_index)
+
+    @staticmethod
+    def client_file_name(client_id):
+        """The store file name for a client ID
+        
+        IDs that only differ in characters unsafe for a file name ("Smith, J"
+        and "Smith_ J") must not share a store, so the readable name is
+        followed by a hash of the exact ID.
+        """
+        client_id = str(client_id).strip()
+        digest = hashlib.sha256(client_id.encode('utf-8')).hexdigest()[:16]
+        return f"{re.sub(r'[^A-Za-z0-9_.-]', '_', client_id)}-{digest}.sqlite"
+    
+    @classmethod
+    def for_client(cls, store_dir, client_id):
+        """Open (or create) a client's store file in store_dir"""
+        return cls(os.path.join(store_dir, cls.client_file_name(client_id)))
+
+def get_action_store(client_id):
+    """Return the process-wide ActionStore for a client, under ACTION_STORE_DIR"""
+    return open_action_store(ActionStore.client_file_name(client_id))
+
+@st.cache_resource
+def open_action_store(file_name):
+    """One ActionStore (and so one lock) per store file, however its client ID was typed"""
+    return ActionStore(os.path.join(ACTION_STORE_DIR, file_name))
+
+def select_year_sells(df, target_year, issues=None):
+    """Parse the meaningful sells disposed of in target_year into typed columns
+    
+    With target_year None, sells of every year are kept and each parse issue
+    also records the 'tax_year' of its row.
+    """
+    first_issue = len(issues) if issues is not None else 0
+    
+    # Process sell transactions for the target year only
+    sell_transactions = df[df['action'] == 'sell']
+    sell_dates = parse_bitwave_timestamps(sell_transactions['timestamp'])
+    unreadable_dates = int(sell_dates.isna().sum())
+    if target_year is None:
+        in_year = sell_dates.notna().to_numpy()
+    else:
+        in_year = (sell_dates.dt.year == target_year).to_numpy()
+    sell_transactions = sell_transactions[in_year]
+    sell_dates = sell_dates[in_year]
+    sell_years = sell_dates.dt.year
+    
+    # Extract monetary values
+    proceeds = bitwave_money_column(sell_transactions, ' proceeds ', issues)
+    cost_basis = bitwave_money_column(sell_transactions, ' costBasisRelieved ', issues)
+    
+    # Skip rows with no meaningful transaction
+    meaningful = ((proceeds > 0) | (cost_basis > 0)).to_numpy()
+    sell_transactions = sell_transactions[meaningful]
+    count_event('rows_read', len(df))
+    count_event('rows_skipped', unreadable_dates + int((~meaningful).sum()))
+    
+    # Parse gain/loss values for validation
+    sells = pd.DataFrame({
+        'asset': sell_transactions['asset'],
+        'lotId': sell_transactions['lotId'],
+        'date_sold': sell_dates[meaningful],
+        'proceeds': proceeds[meaningful],
+        'cost_basis': cost_basis[meaningful],
+        'short_term_gain_loss': bitwave_money_column(sell_transactions, ' shortTermGainLoss ', issues),
+        'long_term_gain_loss': bitwave_money_column(sell_transactions, ' longTermGainLoss ', issues)
+    })
+    
+    if target_year is None and issues is not None:
+        for issue in issues[first_issue:]:
+            issue['tax_year'] = int(sell_years[issue['row']])
+    
+    return sells
+
+def match_sells_to_lots(sells, lot_index):
+    """Join parsed sells to their lots and build the Form 8949 transaction records"""
+    
+    # Join each sell to its lot's acquisition date
+    lot_ids = sells['lotId']
+    sell_dates = sells['date_sold']
+    buy_dates = lot_index.acquisition_dates(lot_ids)
+    has_buy_date = buy_dates.notna().to_numpy()
+    
+    # Bitwave's own gain/loss columns decide the term unless the holding period is known
+    short_term_gl = sells['short_term_gain_loss']
+    long_term_gl = sells['long_term_gain_loss']
+    holding_days = (sell_dates - buy_dates).dt.days.to_numpy()
+    is_short_term = np.where(has_buy_date, holding_days <= 365, (short_term_gl.abs() > 0.01).to_numpy())
+    is_long_term = np.where(has_buy_date, holding_days > 365, (long_term_gl.abs() > 0.01).to_numpy())
+    
+    # Each distinct asset and its description are stored once and shared by code
+    assets = pd.Categorical(sells['asset'])
+    descriptions = pd.Categorical.from_codes(assets.codes, assets.categories.astype(str) + " cryptocurrency")
+    
+    return TransactionTable({
+        'asset': assets,
+        'description': descriptions,
+        'date_acquired': buy_dates.where(has_buy_date, sell_dates).array,
+        'date_sold': sell_dates.array,
+        'proceeds': sells['proceeds'].values,
+        'cost_basis': sells['cost_basis'].values,
+        'gain_loss': (sells['proceeds'] - sells['cost_basis']).values,
+        'reported_gain_loss': (short_term_gl + long_term_gl).values,
+        'short_term_gain_loss': short_term_gl.values,
+        'long_term_gain_loss': long_term_gl.values,
+        'is_short_term': is_short_term.astype(bool),
+        'is_long_term': is_long_term.astype(bool),
+        'lot_id': lot_ids.array,
+        'lot_matched': has_buy_date
+    })
+
+def parse_bitwave_timestamps(values):
+    """Parse a column of Bitwave timestamps to naive UTC, leaving unparseable values as NaT
+    
+    Zone-aware stamps are converted to UTC and naive ones are taken to be UTC
+    already, so columns parsed separately (the acquisitions and the sells,
+    or the chunks of one export) always compare, whatever zones they mix.
+    """
+    parsed = pd.to_datetime(values, errors='coerce', utc=True)
+    
+    # Values the column-wide parse could not infer fall back to parsing one by one
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed = parsed.astype(object)
+        parsed[retry] = values[retry].map(lambda value: pd.to_datetime(value, errors='coerce', utc=True))
+        parsed = pd.to_datetime(parsed, errors='coerce', utc=True)
+    
+    return parsed.dt.tz_convert(None)
+
+def bitwave_money_column(df, column, issues=None):
+    """Parse a Bitwave money column to floats, treating a missing column as zeros"""
+    if column not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    
+    amounts, failed = parse_currency_column(df[column])
+    
+    # Record cells that could not be parsed rather than silently zeroing them
+    if issues is not None and failed.any():
+        for row, value in df.loc[failed.to_numpy(), column].items():
+            issues.append({'row': row, 'column': column.strip(), 'value': value})
+    
+    return amounts
+
+# What is left of a readable amount once "$", commas, whitespace and parentheses are stripped
+CURRENCY_NUMBER_PATTERN = r'[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?'
+CURRENCY_NUMBER = re.compile(CURRENCY_NUMBER_PATTERN)
+CURRENCY_NOISE = re.compile(r'[,$\s]')
+
+def parse_currency_column(values):
+    """Parse a whole column of Bitwave currency values in one pass
+    
+    Follows the same rules as clean_currency_value: parentheses mean negative,
+    blanks and "-" mean 0.0, and "$", commas and whitespace are stripped.
+    Returns the parsed floats and a boolean mask of cells that failed to parse
+    (those are also reported as 0.0). Long columns are parsed with Arrow
+    string kernels; short ones cell by cell, which is faster below
+    CURRENCY_COLUMN_MIN_VECTOR_ROWS.
+    """
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.astype(float).fillna(0.0), pd.Series(False, index=values.index)
+    
+    if len(values) < CURRENCY_COLUMN_MIN_VECTOR_ROWS:
+        parsed = [parse_currency_value(value) for value in values.tolist()]
+        failed = pd.Series([amount is None for amount in parsed], index=values.index, dtype=bool)
+        amounts = pd.Series([0.0 if amount is None else amount for amount in parsed], index=values.index, dtype=float)
+        return amounts, failed
+    
+    text = pc.utf8_trim_whitespace(pa.array(values.astype('string'), type=pa.string()))
+    
+    # Handle parentheses for negative values
+    is_negative = pc.and_(pc.match_substring(text, '('), pc.match_substring(text, ')'))
+    
+    # Remove currency symbols, commas, and spaces
+    text = pc.replace_substring_regex(text, r'[,$\s]', '')
+    text = pc.if_else(is_negative, pc.replace_substring_regex(text, r'[()]', ''), text)
+    
+    # Only well-formed numbers are cast; blanks (null, '' or '-') are 0.0 and anything else fails
+    readable = pc.match_substring_regex(text, f'^{CURRENCY_NUMBER_PATTERN}$')
+    amounts = pc.cast(pc.if_else(readable, text, None), pa.float64())
+    amounts = pc.if_else(is_negative, pc.negate(amounts), amounts)
+    failed = pc.invert(pc.or_kleene(readable, pc.is_in(text, pa.array(['', '-']))))
+    
+    return (
+        pd.Series(pc.fill_null(amounts, 0.0).to_numpy(zero_copy_only=False), index=values.index),
+        pd.Series(pc.fill_null(failed, False).to_numpy(zero_copy_only=False), index=values.index)
+    )
 
 def clean_currency_value(value):
     """Clean and parse currency values from Bitwave format"""
-    if pd.isna(value) or value == '' or value == '-':
+    amount = parse_currency_value(value)
+    return 0.0 if amount is None else amount
+
+def parse_currency_value(value):
+    """Parse one Bitwave currency value, or return None if it cannot be read"""
+    if pd.isna(value):
         return 0.0
     
     # Convert to string and clean
@@ -719,66 +1961,173 @@ def clean_currency_value(value):
         str_val = str_val.replace('(', '').replace(')', '')
     
     # Remove currency symbols, commas, and spaces
-    str_val = re.sub(r'[,$\s]', '', str_val)
-    
-    try:
-        result = float(str_val)
-        return -result if is_negative else result
-    except:
+    str_val = CURRENCY_NOISE.sub('', str_val)
+    if str_val in ('', '-'):
         return 0.0
-
-def generate_tax_software_csv(transactions, tax_year):
-    """Generate CSV for tax software import"""
+    if not CURRENCY_NUMBER.fullmatch(str_val):
+        return None
     
-    csv_lines = []
-    csv_lines.append("Description,Date Acquired,Date Sold,Sales Price,Cost Basis,Gain/Loss,Adjustment Code,Adjustment Amount")
+    result = float(str_val)
+    return -result if is_negative else result
+
+def normalize_bitwave_actions(df, issues=None):
+    """Typed copy of a Bitwave actions DataFrame, for saving as Parquet
+    
+    Keeps the Bitwave column names, so the extraction reads it like a CSV
+    upload: action and asset become Categoricals, timestamps datetimes (NaT
+    where unparseable) and money columns floats. Unreadable amounts become
+    NaN and are collected in issues like bitwave_money_column does.
+    """
+    normalized = {}
+    for column in BITWAVE_INGEST_DTYPES:
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if column in ('action', 'asset'):
+            normalized[column] = values.astype('category')
+        elif column == 'timestamp':
+            normalized[column] = parse_bitwave_timestamps(values)
+        elif column == 'lotId':
+            normalized[column] = values.astype('string')
+        else:
+            amounts, failed = parse_currency_column(values)
+            if issues is not None and failed.any():
+                for row, value in values[failed.to_numpy()].items():
+                    issues.append({'row': row, 'column': column.strip(), 'value': value})
+            normalized[column] = amounts.mask(failed)
+    return pd.DataFrame(normalized, index=df.index)
+
+def write_actions_parquet(source, dest, chunksize=BITWAVE_CHUNK_ROWS, issues=None):
+    """Write the normalized actions of a Bitwave export to Parquet, one row group per chunk
+    
+    source is a DataFrame, or a CSV path or file that is streamed in chunks so
+    memory stays bounded. Returns the number of rows written.
+    """
+    if isinstance(source, pd.DataFrame):
+        chunks = (source.iloc[start:start + chunksize] for start in range(0, max(len(source), 1), chunksize))
+    else:
+        chunks = pd.read_csv(
+            source,
+            usecols=lambda column: column in BITWAVE_INGEST_DTYPES,
+            dtype=BITWAVE_INGEST_DTYPES,
+            chunksize=chunksize
+        )
     
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(normalize_bitwave_actions(chunk, issues), preserve_index=False)
+            if writer is None:
+                # Fix the dictionary index width so every chunk's categories fit the first chunk's schema
+                schema = pa.schema([
+                    field.with_type(pa.dictionary(pa.int32(), field.type.value_type)) if pa.types.is_dictionary(field.type) else field
+                    for field in table.schema
+                ]).with_metadata({**table.schema.metadata, PARQUET_KIND_KEY: b'actions'})
+                writer = pq.ParquetWriter(dest, schema)
+            writer.write_table(table.cast(schema))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def read_actions_parquet(source):
+    """Read actions written by write_actions_parquet back into a DataFrame"""
+    table = pq.read_table(source)
+    check_parquet_kind(table, 'actions')
+    return table.to_pandas()
+
+def check_parquet_kind(table, kind):
+    """Raise ValueError unless an Arrow table was written by this app as kind"""
+    written_as = (table.schema.metadata or {}).get(PARQUET_KIND_KEY, b'').decode()
+    if written_as != kind:
+        described = {'actions': "normalized Bitwave actions", 'transactions': "extracted Form 8949 transactions"}
+        found = described.get(written_as, "a file from another program")
+        raise ValueError(f"Expected a Parquet file of {described[kind]}, but this one holds {found}.")
+
 def generate_tax_software_csv(transactions, tax_year):
     """Generate CSV for tax software import"""
-    
-    csv_lines = []
-    csv_lines.append("Description,Date Acquired,Date Sold,Sales Price,Cost Basis,Gain/Loss,Adjustment Code,Adjustment Amount")
-    
-    for transaction in transactions:
-        # Format dates
-        date_acquired = transaction['date_acquired'].strftime('%m/%d/%Y') if transaction['date_acquired'] else '01/01/2020'
-        date_sold = transaction['date_sold'].strftime('%m/%d/%Y')
+    output = io.StringIO()
+    write_tax_software_csv(transactions, output)
+    return output.getvalue()
+
+def write_tax_software_csv(transactions, output, batch_rows=CSV_WRITE_BATCH_ROWS, header=True):
+    """Stream the tax software CSV for transactions to a text file object
+    
+    Open files with newline=''. Fields are quoted as needed by the csv
+    module, so descriptions with commas or quotes stay in their column, and
+    rows are formatted and written batch_rows at a time, so memory does not
+    grow with the number of transactions. Pass header=False to append more
+    rows to the same CSV. Returns the number of rows written.
+    """
+    writer = csv.writer(output, lineterminator='\n')
+    if header:
+        writer.writerow(TAX_SOFTWARE_CSV_HEADER)
+    
+    for start in range(0, len(transactions), batch_rows):
+        batch = transactions[start:start + batch_rows]
+        
+        # Format each column of the batch in one pass
+        descriptions = batch.column('description')
+        labels = np.append(descriptions.categories.astype(str).to_numpy(dtype=object), '')
+        date_acquired = format_csv_dates(batch.column('date_acquired'), missing='01/01/2020')
+        date_sold = format_csv_dates(batch.column('date_sold'))
+        money = [[f"{value:.2f}" for value in batch.column(name).tolist()] for name in ('proceeds', 'cost_basis', 'gain_loss')]
         
-        row = [
-            transaction['description'],
+        writer.writerows(zip(
+            labels[descriptions.codes],
             date_acquired,
             date_sold,
-            f"{transaction['proceeds']:.2f}",
-            f"{transaction['cost_basis']:.2f}",
-            f"{transaction['gain_loss']:.2f}",
-            "",
-            "0.00"
-        ]
-        csv_lines.append(",".join(row))
+            *money,
+            itertools.repeat(""),
+            itertools.repeat("0.00")
+        ))
     
-    return "\n".join(csv_lines)
+    return len(transactions)
 
-def generate_form_8949_pdf(transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, term_type=""):
-    """Generate completed Form 8949 PDF using official IRS template"""
-    pdf_files = []
-    
-    # Split transactions into pages (14 per page max)
-    transactions_per_page = 14
-    total_pages = (len(transactions) + transactions_per_page - 1) // transactions_per_page
+def format_csv_dates(values, missing=''):
+    """Format dates as MM/DD/YYYY, formatting each distinct day only once"""
+    dates = pd.DatetimeIndex(values)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    codes, days = pd.factorize(dates.to_numpy().astype('datetime64[D]'))
+    labels = np.append(pd.DatetimeIndex(days).strftime('%m/%d/%Y').to_numpy(dtype=object), missing)
+    return labels[codes]
+
+def split_form_8949_parts(transactions, totals, form_type):
+    """Split sales into the Form 8949 parts that have any, short-term first
+    
+    totals is the summarize_transactions result for transactions. Returns
+    (term_type, part_transactions, part_form_type, part_totals) tuples, with
+    form_type's box carried over to the matching part.
+    """
+    short_form_type = form_type.replace("Part II", "Part I").replace("Long-term", "Short-term")
+    long_form_type = form_type.replace("Part I", "Part II").replace("Short-term", "Long-term")
+    
+    parts = [
+        ("Short-term", transactions.short_term(), short_form_type, totals['short_term']),
+        ("Long-term", transactions.long_term(), long_form_type, totals['long_term'])
+    ]
+    return [part for part in parts if len(part[1]) > 0]
+
+def generate_form_8949_pdf(transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, term_type="", workers=None, totals=None):
+    """Generate completed Form 8949 PDF using official IRS template
     
-    for page_num in range(total_pages):
-        start_idx = page_num * transactions_per_page
-        end_idx = min(start_idx + transactions_per_page, len(transactions))
-        page_transactions = transactions[start_idx:end_idx]
-        
-        # Create PDF for this page
-        buffer = io.BytesIO()
-        success = create_form_8949_with_official_template(buffer, page_transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, page_num + 1, total_pages, transactions)
-        
-        if not success:
-            # Fallback to custom form if official template fails
-            create_form_8949_page_custom(buffer, page_transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, page_num + 1, total_pages, transactions)
-        
+    Pass the transactions' precomputed FormTotals as totals to avoid summing
+    them again, and workers > 1 to render the pages across that many processes.
+    """
+    return list(iter_form_8949_pdfs(transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, term_type, workers, totals))
+
+def iter_form_8949_pdfs(transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, term_type="", workers=None, totals=None):
+    """generate_form_8949_pdf as a generator, yielding each page's PDF once it is rendered"""
+    total_pages = -(-len(transactions) // TRANSACTIONS_PER_PAGE)
+    rendered = iter_form_8949_section(transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, workers=workers, totals=totals)
+    return name_form_8949_pdfs(rendered, taxpayer_name, tax_year, term_type, total_pages)
+
+def name_form_8949_pdfs(rendered, taxpayer_name, tax_year, term_type, total_pages):
+    """Pair each rendered (kind, pdf_bytes) page with its file name, as {'filename', 'content'} dicts"""
+    for page_num, (_, content) in enumerate(rendered):
         # Generate filename
         term_suffix = f"_{term_type}" if term_type else ""
         if total_pages == 1:
@@ -786,445 +2135,591 @@ def generate_form_8949_pdf(transactions, form_type, taxpayer_name, taxpayer_ssn,
         else:
             filename = f"Form_8949_{tax_year}{term_suffix}_{taxpayer_name.replace(' ', '_')}_Page_{page_num + 1}.pdf"
         
-        pdf_files.append({
+        yield {
             'filename': filename,
-            'content': buffer.getvalue()
-        })
-    
-    return pdf_files
+            'content': content
+        }
 
-def get_official_form_8949(tax_year):
-    """Fetch the official IRS Form 8949 for the specified tax year"""
-    
-    # IRS Form 8949 URLs by year
-    irs_urls = {
-        2025: "https://www.irs.gov/pub/irs-pdf/f8949.pdf",
-        2024: "https://www.irs.gov/pub/irs-pdf/f8949.pdf",
-        2023: "https://www.irs.gov/pub/irs-prior/f8949--2023.pdf", 
-        2022: "https://www.irs.gov/pub/irs-prior/f8949--2022.pdf",
-        2021: "https://www.irs.gov/pub/irs-prior/f8949--2021.pdf",
-        2020: "https://www.irs.gov/pub/irs-prior/f8949--2020.pdf",
-        2019: "https://www.irs.gov/pub/irs-prior/f8949--2019.pdf",
-        2018: "https://www.irs.gov/pub/irs-prior/f8949--2018.pdf"
-    }
-    
-    # Try to fetch the official form
-    url = irs_urls.get(tax_year, irs_urls[2024])  # Default to latest if year not found
-    
-    try:
-        response = requests.get(url, timeout=15)
-        if response.status_code == 200:
-            return response.content
+def generate_form_8949_document(output, sections, taxpayer_name, taxpayer_ssn, tax_year, workers=None):
+    """Write every Form 8949 page into one multi-page PDF through a single writer
+    
+    sections is a list of (transactions, form_type, totals) triples, e.g. the
+    short-term part followed by the long-term part, where totals is the
+    part's FormTotals (or None to sum the transactions here). The official template is
+    stored once for the whole document, so each page only adds its own
+    overlay. Each page is written to the output file object as soon as it
+    is rendered. Pass workers > 1 to draw the pages across that many
+    processes. Returns the number of pages.
+    """
+    import form8949_pdf
+    document = form8949_pdf.Form8949Document(output)
+    
+    for transactions, form_type, totals in sections:
+        layouts = form8949_pdf.Form8949Layouts(form_type, taxpayer_name, taxpayer_ssn, tax_year)
+        rendered = iter_form_8949_section(transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, overlays_only=True, workers=workers, totals=totals, layouts=layouts)
+        add_form_8949_pages(document, rendered, form_type, taxpayer_name, taxpayer_ssn, tax_year, layouts)
+    
+    document.finish()
+    return document.page_count
+
+def add_form_8949_pages(document, rendered, form_type, taxpayer_name, taxpayer_ssn, tax_year, layouts=None):
+    """Add one part's rendered (kind, pdf_bytes) pages to a Form8949Document
+    
+    Overlays are drawn over the part's official template page and the
+    static fields of its layout, which the document stores once. layouts
+    is the part's Form8949Layouts, if the pages were drawn with one.
+    """
+    import form8949_pdf
+    layers = {}
+    for kind, content in rendered:
+        if kind == 'overlay' and kind not in layers:
+            template = load_form_8949_template(tax_year, 0 if "Part I" in form_type else 1)
+            layers[kind] = form8949_pdf.form_8949_layers(form_type, taxpayer_name, taxpayer_ssn, tax_year, template, layouts)
+        elif kind == 'custom_overlay' and kind not in layers:
+            layers[kind] = form8949_pdf.form_8949_layers(form_type, taxpayer_name, taxpayer_ssn, tax_year, layouts=layouts)
+        document.add_page(content, layers.get(kind, ()))
+
+class FormTotals:
+    """Totals of columns (d), (e) and (h) for the sales on one form, computed once
+    
+    Alongside the totals for every sale it keeps a subtotal for each page of
+    TRANSACTIONS_PER_PAGE sales, in order, since line 2 of Form 8949 is
+    totalled per page.
+    """
+    
+    COLUMNS = ('proceeds', 'cost_basis', 'gain_loss')
+    
+    def __init__(self, proceeds, cost_basis, gain_loss):
+        amounts = np.column_stack([
+            np.asarray(proceeds, dtype=float),
+            np.asarray(cost_basis, dtype=float),
+            np.asarray(gain_loss, dtype=float)
+        ])
+        self.count = len(amounts)
+        self._totals = amounts.sum(axis=0)
+        if self.count:
+            self._pages = np.add.reduceat(amounts, np.arange(0, self.count, TRANSACTIONS_PER_PAGE), axis=0)
         else:
-            # Fallback: try the current year form
-            response = requests.get(irs_urls[2024], timeout=15)
-            if response.status_code == 200:
-                return response.content
-    except Exception as e:
-        print(f"Error fetching official form: {e}")
-        pass
-    
-    return None
+            self._pages = np.zeros((0, 3))
+    
+    @classmethod
+    def from_transactions(cls, transactions):
+        return cls(*(transactions.column(column) for column in cls.COLUMNS))
+    
+    @classmethod
+    def from_pages(cls, count, pages):
+        """Totals for count sales from their per-page subtotals, an array of one row per page"""
+        totals = cls([], [], [])
+        totals.count = count
+        totals._pages = pages
+        totals._totals = pages.sum(axis=0)
+        return totals
+    
+    @property
+    def page_count(self):
+        return len(self._pages)
+    
+    def totals(self):
+        """Totals over every sale, as a dict keyed like the transactions"""
+        return dict(zip(self.COLUMNS, self._totals.tolist()))
+    
+    def page(self, page_number):
+        """Subtotals for one page, numbered from 1"""
+        return dict(zip(self.COLUMNS, self._pages[page_number - 1].tolist()))
+
+def summarize_transactions(transactions):
+    """Build the FormTotals for all sales and for the short-term and long-term parts
+    
+    Returns a dict with 'all', 'short_term' and 'long_term' entries. The
+    parts keep the order of transactions, so their page subtotals line up
+    with the pages of each part's form.
+    """
+    is_short_term = transactions.column('is_short_term')
+    columns = [transactions.column(column) for column in FormTotals.COLUMNS]
+    return {
+        'all': FormTotals(*columns),
+        'short_term': FormTotals(*(values[is_short_term] for values in columns)),
+        'long_term': FormTotals(*(values[~is_short_term] for values in columns))
+    }
+
+def summarize_assets(transactions):
+    """Count, proceeds, cost basis and gain/loss per asset, for all sales and per term
+    
+    Every sale is assigned to an (asset, term) group once, and each column is
+    summed over those groups in one bincount. Returns a DataFrame indexed by
+    asset, in order of each asset's first sale, with 'count' and the
+    FormTotals.COLUMNS, and the same columns prefixed 'short_term_' and
+    'long_term_'.
+    """
+    assets = transactions.column('asset')
+    # Sales with no asset are grouped in one extra slot after the categories
+    slots = len(assets.categories) + 1
+    codes = np.where(assets.codes < 0, slots - 1, assets.codes).astype(np.intp)
+    groups = codes * 2 + ~transactions.column('is_short_term')
+    
+    by_term = {'count': np.bincount(groups, minlength=slots * 2).reshape(slots, 2)}
+    for column in FormTotals.COLUMNS:
+        by_term[column] = np.bincount(groups, weights=transactions.column(column), minlength=slots * 2).reshape(slots, 2)
+    
+    summary = {name: values.sum(axis=1) for name, values in by_term.items()}
+    for term, side in (('short_term', 0), ('long_term', 1)):
+        summary.update({f"{term}_{name}": values[:, side] for name, values in by_term.items()})
+    
+    labels = pd.Index([*assets.categories.tolist(), None], dtype=object, name='asset')
+    return pd.DataFrame(summary, index=labels).iloc[pd.unique(codes)]
 
-def create_form_8949_with_official_template(buffer, page_transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, page_number, total_pages, all_transactions):
-    """Create Form 8949 using official IRS template as base"""
+class TransactionBrowser:
+    """Sorted, filtered pages of a TransactionTable for the transaction viewer
+    
+    The order of the sales by each sort column is computed once, with a
+    stable argsort, and kept; filters are masks over that order. Showing a
+    page only slices its positions out of the ordered selection and formats
+    those rows, however many sales there are.
+    """
+    
+    SORT_COLUMNS = ('date_sold', 'date_acquired', 'asset', 'proceeds', 'cost_basis', 'gain_loss')
+    
+    def __init__(self, transactions):
+        self.transactions = transactions
+        self._orders = {}
+    
+    @property
+    def nbytes(self):
+        """Bytes the sort orders take once every sort column is used, whether or not they are yet"""
+        return len(self.transactions) * np.dtype(np.intp).itemsize * len(self.SORT_COLUMNS)
+    
+    def sort_order(self, column):
+        """Positions of every sale in ascending order of column, missing values last"""
+        order = self._orders.get(column)
+        if order is None:
+            values = self.transactions.column(column)
+            if isinstance(values, pd.Categorical):
+                # Rank the categories by name (a union of chunks leaves them
+                # unsorted); code -1, a missing value, takes the last rank
+                ranks = np.append(np.argsort(np.argsort(values.categories.to_numpy(dtype=object))), len(values.categories))
+                keys = ranks[values.codes]
+            elif isinstance(values, np.ndarray):
+                keys = values
+            else:
+                keys = np.where(pd.isna(values), np.iinfo(np.int64).max, values.asi8)
+            order = np.argsort(keys, kind='stable')
+            self._orders[column] = order
+        return order
     
-    try:
-        # Get official form
-        official_form_pdf = get_official_form_8949(tax_year)
+    def select(self, sort_by='date_sold', descending=False, assets=None, term=None, start=None, end=None):
+        """Positions of the sales that pass the filters, in display order
         
-        if not official_form_pdf:
-            return False
+        assets is a list of asset names to keep, term is 'short_term' or
+        'long_term', and start and end are the first and last sale dates
+        to keep. Filters left as None keep every sale.
+        """
+        transactions = self.transactions
+        mask = np.ones(len(transactions), dtype=bool)
+        if assets:
+            mask &= transactions.column('asset').isin(assets)
+        if term == 'short_term':
+            mask &= transactions.column('is_short_term')
+        elif term == 'long_term':
+            mask &= ~transactions.column('is_short_term')
+        date_sold = transactions.column('date_sold')
+        if start is not None:
+            mask &= np.asarray(date_sold >= pd.Timestamp(start, tz=date_sold.tz))
+        if end is not None:
+            mask &= np.asarray(date_sold < pd.Timestamp(end, tz=date_sold.tz) + pd.Timedelta(days=1))
         
-        # Use official form as base and overlay data
-        return create_form_with_pdf_overlay(buffer, page_transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, page_number, total_pages, all_transactions, official_form_pdf)
+        order = self.sort_order(sort_by)
+        if descending:
+            order = order[::-1]
+        return order[mask[order]]
+    
+    def page(self, positions, page_number, page_size):
+        """Format one page of selected positions (numbered from 1) as a display DataFrame"""
+        rows = positions[(page_number - 1) * page_size:page_number * page_size]
+        page = self.transactions.take(rows)
+        return pd.DataFrame({
+            '#': rows + 1,
+            'Asset': np.asarray(page.column('asset'), dtype=object),
+            'Sell Date': format_csv_dates(page.column('date_sold')),
+            'Buy Date': format_csv_dates(page.column('date_acquired'), missing='Unknown'),
+            **{
+                label: [f"${value:.2f}" for value in page.column(column).tolist()]
+                for label, column in (('Proceeds', 'proceeds'), ('Cost Basis', 'cost_basis'), ('Gain/Loss', 'gain_loss'))
+            },
+            'Term': np.where(page.column('is_short_term'), 'Short', 'Long')
+        })
+
+class TransactionSummary:
+    """summarize_transactions for sales that arrive in consecutive chunks
+    
+    Each part keeps only its page subtotals and the amounts of the page
+    still being filled, so the sales never need to be in memory together.
+    """
+    
+    PARTS = ('all', 'short_term', 'long_term')
+    
+    def __init__(self):
+        self._counts = dict.fromkeys(self.PARTS, 0)
+        self._pages = {part: [] for part in self.PARTS}
+        self._partial = {part: np.zeros((0, len(FormTotals.COLUMNS))) for part in self.PARTS}
+    
+    def add(self, transactions):
+        is_short_term = transactions.column('is_short_term')
+        amounts = np.column_stack([np.asarray(transactions.column(column), dtype=float) for column in FormTotals.COLUMNS])
+        for part, rows in (('all', amounts), ('short_term', amounts[is_short_term]), ('long_term', amounts[~is_short_term])):
+            self._counts[part] += len(rows)
+            rows = np.concatenate([self._partial[part], rows])
+            full = len(rows) - len(rows) % TRANSACTIONS_PER_PAGE
+            if full:
+                self._pages[part].append(np.add.reduceat(rows[:full], np.arange(0, full, TRANSACTIONS_PER_PAGE), axis=0))
+            self._partial[part] = rows[full:]
+    
+    def result(self):
+        """The summarize_transactions dict for every chunk added so far"""
+        summary = {}
+        for part in self.PARTS:
+            pages = [np.zeros((0, len(FormTotals.COLUMNS))), *self._pages[part]]
+            if len(self._partial[part]):
+                pages.append(self._partial[part].sum(axis=0, keepdims=True))
+            summary[part] = FormTotals.from_pages(self._counts[part], np.concatenate(pages))
+        return summary
+
+def paginate_transactions(chunks):
+    """Group consecutive TransactionTable chunks into Form 8949 pages
+    
+    Yields (page_number, page_transactions) pairs of TRANSACTIONS_PER_PAGE
+    sales as soon as each page fills, then the last partial page. Only the
+    unfilled page is carried from one chunk to the next.
+    """
+    page_number = 0
+    partial = None
+    for chunk in chunks:
+        if partial is not None:
+            needed = TRANSACTIONS_PER_PAGE - len(partial)
+            partial = TransactionTable.concat([partial, chunk[:needed]])
+            chunk = chunk[needed:]
+            if len(partial) < TRANSACTIONS_PER_PAGE:
+                continue
+            page_number += 1
+            yield page_number, partial
+            partial = None
         
-    except Exception as e:
-        print(f"Error creating form with official template: {e}")
-        return False
+        full = len(chunk) - len(chunk) % TRANSACTIONS_PER_PAGE
+        for start in range(0, full, TRANSACTIONS_PER_PAGE):
+            page_number += 1
+            yield page_number, chunk[start:start + TRANSACTIONS_PER_PAGE]
+        if full < len(chunk):
+            # A copy, so the rest of the chunk can be freed
+            partial = chunk.take(np.arange(full, len(chunk)))
+    
+    if partial is not None:
+        yield page_number + 1, partial
 
-def create_form_with_pdf_overlay(buffer, page_transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, page_number, total_pages, all_transactions, official_form_pdf):
-    """Overlay transaction data onto official IRS Form 8949 PDF with precise positioning"""
+def iter_streamed_form_8949_parts(spool, tax_year, totals, form_type):
+    """split_form_8949_parts for a SellSpool: each part's pages are paginated from the spool as they are read
+    
+    totals is the year's summary (TransactionSummary.result). Yields
+    (term_type, pages, part_form_type, part_totals) tuples, where pages is
+    a paginate_transactions generator.
+    """
+    short_form_type = form_type.replace("Part II", "Part I").replace("Long-term", "Short-term")
+    long_form_type = form_type.replace("Part I", "Part II").replace("Short-term", "Long-term")
+    
+    for term_type, term, part_form_type in (("Short-term", 'short_term', short_form_type), ("Long-term", 'long_term', long_form_type)):
+        if totals[term].count:
+            yield term_type, paginate_transactions(spool.transactions(tax_year, term)), part_form_type, totals[term]
+
+def iter_streamed_form_8949_pdfs(spool, tax_year, totals, form_type, taxpayer_name, taxpayer_ssn):
+    """iter_form_8949_pdfs over both parts of a SellSpool's tax year, rendering each page as soon as it fills"""
+    for term_type, pages, part_form_type, part_totals in iter_streamed_form_8949_parts(spool, tax_year, totals, form_type):
+        rendered = iter_form_8949_rendered_pages(pages, part_form_type, taxpayer_name, taxpayer_ssn, tax_year, part_totals.page_count, part_totals)
+        yield from name_form_8949_pdfs(rendered, taxpayer_name, tax_year, term_type, part_totals.page_count)
+
+def write_streamed_form_8949_document(output, spool, tax_year, totals, form_type, taxpayer_name, taxpayer_ssn):
+    """generate_form_8949_document for a SellSpool's tax year, rendering each page as soon as it fills
+    
+    Each page is written to output once drawn, so no sales or pages are
+    kept beyond the one being drawn. Returns the number of pages.
+    """
+    import form8949_pdf
+    document = form8949_pdf.Form8949Document(output)
+    
+    for _, pages, part_form_type, part_totals in iter_streamed_form_8949_parts(spool, tax_year, totals, form_type):
+        layouts = form8949_pdf.Form8949Layouts(part_form_type, taxpayer_name, taxpayer_ssn, tax_year)
+        rendered = iter_form_8949_rendered_pages(pages, part_form_type, taxpayer_name, taxpayer_ssn, tax_year, part_totals.page_count, part_totals, overlays_only=True, layouts=layouts)
+        add_form_8949_pages(document, rendered, part_form_type, taxpayer_name, taxpayer_ssn, tax_year, layouts)
+    
+    document.finish()
+    return document.page_count
+
+def render_form_8949_section(transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, overlays_only=False, workers=None, totals=None):
+    """Render every page of one Form 8949 part in page order
+    
+    Returns a (kind, pdf_bytes) pair per page as described in
+    render_form_8949_page_range. totals is the part's FormTotals, built
+    here if not given. With workers > 1 the pages are split into
+    contiguous runs across a process pool; each worker gets only its pages'
+    transactions plus the form totals, and the results are reassembled in
+    page order, identical to rendering serially.
+    """
+    return list(iter_form_8949_section(transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, overlays_only, workers, totals))
+
+def iter_form_8949_section(transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, overlays_only=False, workers=None, totals=None, layouts=None):
+    """render_form_8949_section as a generator, yielding pages in order as they are rendered
+    
+    layouts is the part's Form8949Layouts for pages drawn in this process;
+    worker processes build their own.
+    """
     
+    # Split transactions into pages (14 per page max)
+    total_pages = (len(transactions) + TRANSACTIONS_PER_PAGE - 1) // TRANSACTIONS_PER_PAGE
+    pages = [
+        (page_num + 1, transactions[page_num * TRANSACTIONS_PER_PAGE:(page_num + 1) * TRANSACTIONS_PER_PAGE])
+        for page_num in range(total_pages)
+    ]
+    if totals is None:
+        totals = FormTotals.from_transactions(transactions)
+    page_index = 0 if "Part I" in form_type else 1
+    
+    if not workers or workers <= 1 or total_pages < 2:
+        yield from iter_form_8949_rendered_pages(pages, form_type, taxpayer_name, taxpayer_ssn, tax_year, total_pages, totals, overlays_only, layouts)
+        return
+    
+    # Several runs per worker keep the pool busy when pages render unevenly
+    workers = min(workers, total_pages)
+    run_length = -(-total_pages // (workers * 4))
+    page_runs = [pages[start:start + run_length] for start in range(0, total_pages, run_length)]
+    
+    template_pdf = get_official_form_8949(tax_year)
+    with ProcessPoolExecutor(max_workers=workers, initializer=form8949_workers.init_worker, initargs=(template_pdf,)) as pool:
+        futures = [
+            pool.submit(form8949_workers.render_page_range, page_run, form_type, taxpayer_name, taxpayer_ssn, tax_year, total_pages, totals, page_index, overlays_only)
+            for page_run in page_runs
+        ]
+        for future in futures:
+            with pipeline_stage('render_pages'):
+                rendered = future.result()
+            count_event('pages_rendered', len(rendered))
+            yield from rendered
+
+def iter_form_8949_rendered_pages(pages, form_type, taxpayer_name, taxpayer_ssn, tax_year, total_pages, totals, overlays_only=False, layouts=None):
+    """Render (page_number, page_transactions) pairs one at a time, in this process
+    
+    Yields a (kind, pdf_bytes) pair per page as described in
+    render_form_8949_page_range. pages may be a generator such as
+    paginate_transactions; each page is rendered before the next is read.
+    Every page is drawn with layouts, built here for the part if not given.
+    """
+    import form8949_pdf
+    if layouts is None:
+        layouts = form8949_pdf.Form8949Layouts(form_type, taxpayer_name, taxpayer_ssn, tax_year)
     try:
-        # Read the official PDF
-        official_pdf_stream = io.BytesIO(official_form_pdf)
-        pdf_reader = PyPDF2.PdfReader(official_pdf_stream)
-        
-        # Determine which page to use (Part I or Part II)
-        template_page_num = 0 if "Part I" in form_type else 1
-        if template_page_num >= len(pdf_reader.pages):
-            template_page_num = 0  # Fallback to first page
-        
-        template_page = pdf_reader.pages[template_page_num]
-        
-        # Create overlay with transaction data
-        overlay_buffer = io.BytesIO()
-        c = canvas.Canvas(overlay_buffer, pagesize=letter)
-        width, height = letter
-        
-        # PRECISE coordinates measured from actual IRS Form 8949
-        # These coordinates are carefully measured to fit within the table cells
-        
-        # Taxpayer information fields
-        name_x, name_y = 95, height - 133
-        ssn_x, ssn_y = 415, height - 133
-        
-        # Checkbox positions (measured precisely)
-        if "Part I" in form_type:
-            checkbox_base_y = height - 208   # Short-term section
-            # Transaction table starts lower for Part I
-            table_start_y = height - 295
-        else:
-            checkbox_base_y = height - 393   # Long-term section  
-            # Transaction table starts lower for Part II
-            table_start_y = height - 480
-        
-        checkbox_x = 54
-        
-        # Column positions - precisely measured to center within each cell
-        # These measurements ensure text is centered within each blue box
-        col_a_x = 65      # Description - left aligned within cell
-        col_a_width = 115  # Max width for description text
-        
-        col_b_center = 208  # Date acquired - center of cell
-        col_c_center = 268  # Date sold - center of cell
-        
-        col_d_right = 340   # Proceeds - right edge of cell for alignment
-        col_e_right = 400   # Cost basis - right edge of cell
-        
-        col_f_center = 425  # Code - center of small cell
-        col_g_right = 465   # Adjustment - right edge
-        col_h_right = 555   # Gain/Loss - right edge of cell
-        
-        # Row spacing - exactly matches IRS form line spacing
-        row_height = 16.8  # Measured spacing between form lines
-        
-        # Set font for taxpayer info
-        c.setFont("Helvetica", 9)
-        
-        # Fill in taxpayer information
-        c.drawString(name_x, name_y, taxpayer_name[:40])
-        c.drawString(ssn_x, ssn_y, taxpayer_ssn)
-        
-        # Check appropriate checkbox
-        c.setFont("Helvetica", 11)
-        if "Box A" in form_type:
-            c.drawString(checkbox_x, checkbox_base_y, "✓")
-        elif "Box B" in form_type:
-            c.drawString(checkbox_x, checkbox_base_y - 17, "✓") 
-        elif "Box C" in form_type:
-            c.drawString(checkbox_x, checkbox_base_y - 34, "✓")
-        elif "Box D" in form_type:
-            c.drawString(checkbox_x, checkbox_base_y, "✓")
-        elif "Box E" in form_type:
-            c.drawString(checkbox_x, checkbox_base_y - 17, "✓")
-        elif "Box F" in form_type:
-            c.drawString(checkbox_x, checkbox_base_y - 34, "✓")
-        
-        # Set font for transaction data - smaller to fit cleanly in cells
-        c.setFont("Helvetica", 7)
-        
-        for i, transaction in enumerate(page_transactions[:14]):  # Max 14 transactions per page
-            y_pos = table_start_y - (i * row_height)
-            
-            # Format dates
-            date_acquired = transaction['date_acquired'].strftime('%m/%d/%Y') if transaction['date_acquired'] else 'VARIOUS'
-            date_sold = transaction['date_sold'].strftime('%m/%d/%Y')
-            
-            # Truncate description to fit within column width
-            description = transaction['description']
-            if len(description) > 28:
-                description = description[:25] + "..."
-            
-            # Column (a) - Description: Left-aligned within cell
-            c.drawString(col_a_x, y_pos, description)
-            
-            # Column (b) - Date acquired: Centered in cell
-            date_acq_width = c.stringWidth(date_acquired)
-            c.drawString(col_b_center - date_acq_width/2, y_pos, date_acquired)
-            
-            # Column (c) - Date sold: Centered in cell  
-            date_sold_width = c.stringWidth(date_sold)
-            c.drawString(col_c_center - date_sold_width/2, y_pos, date_sold)
-            
-            # Column (d) - Proceeds: Right-aligned within cell
-            proceeds_text = f"{transaction['proceeds']:,.2f}"
-            c.drawRightString(col_d_right, y_pos, proceeds_text)
-            
-            # Column (e) - Cost basis: Right-aligned within cell
-            basis_text = f"{transaction['cost_basis']:,.2f}"
-            c.drawRightString(col_e_right, y_pos, basis_text)
-            
-            # Column (f) - Code: Leave blank (standard for crypto)
-            
-            # Column (g) - Adjustment: Leave blank
-            
-            # Column (h) - Gain/Loss: Right-aligned, use parentheses for losses
-            gain_loss = transaction['gain_loss']
-            if gain_loss < 0:
-                gain_loss_text = f"({abs(gain_loss):,.2f})"
-            else:
-                gain_loss_text = f"{gain_loss:,.2f}"
-            c.drawRightString(col_h_right, y_pos, gain_loss_text)
-        
-        # Add totals on last page only
-        if page_number == total_pages and len(page_transactions) > 0:
-            # Position totals in the official totals row
-            totals_y = table_start_y - (14 * row_height) - 5
-            
-            # Calculate totals
-            total_proceeds = sum(t['proceeds'] for t in all_transactions)
-            total_basis = sum(t['cost_basis'] for t in all_transactions)
-            total_gain_loss = sum(t['gain_loss'] for t in all_transactions)
-            
-            # Use slightly bolder font for totals
-            c.setFont("Helvetica-Bold", 7)
-            
-            # Draw totals in same column positions
-            total_proceeds_text = f"{total_proceeds:,.2f}"
-            total_basis_text = f"{total_basis:,.2f}"
-            
-            c.drawRightString(col_d_right, totals_y, total_proceeds_text)
-            c.drawRightString(col_e_right, totals_y, total_basis_text)
-            
-            # Format total gain/loss
-            if total_gain_loss < 0:
-                total_gl_text = f"({abs(total_gain_loss):,.2f})"
+        template = load_form_8949_template(tax_year, 0 if "Part I" in form_type else 1)
+    except Exception as e:
+        print(f"Error creating form with official template: {e}")
+        template = None
+    for page in pages:
+        with pipeline_stage('render_pages'):
+            rendered = render_form_8949_page_range([page], form_type, taxpayer_name, taxpayer_ssn, tax_year, total_pages, totals, template, overlays_only, layouts)
+        count_event('pages_rendered', len(rendered))
+        yield from rendered
+
+def render_form_8949_page_range(pages, form_type, taxpayer_name, taxpayer_ssn, tax_year, total_pages, totals, template, overlays_only=False, layouts=None):
+    """Render (page_number, page_transactions) pairs to PDF bytes
+    
+    Returns a (kind, pdf_bytes) pair per page. kind is 'page' for a finished
+    one-page PDF. When overlays_only is set it is instead 'overlay' for
+    transaction data still to be drawn over the official template and the
+    page's static fields, or 'custom_overlay' for data to go over the custom
+    form's static layer (see add_form_8949_pages). Pages fall back to the
+    custom form when the template is unavailable or fails. The pages share
+    layouts, the part's Form8949Layouts, built here if not given.
+    """
+    import form8949_pdf
+    if layouts is None:
+        layouts = form8949_pdf.Form8949Layouts(form_type, taxpayer_name, taxpayer_ssn, tax_year)
+    rendered = []
+    
+    for page_number, page_transactions in pages:
+        if template is not None:
+            if overlays_only:
+                try:
+                    rendered.append(('overlay', form8949_pdf.draw_form_8949_overlay(page_transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, page_number, total_pages, totals, layouts=layouts)))
+                    continue
+                except Exception as e:
+                    print(f"Error in PDF overlay: {e}")
             else:
-                total_gl_text = f"{total_gain_loss:,.2f}"
-            c.drawRightString(col_h_right, totals_y, total_gl_text)
+                buffer = io.BytesIO()
+                if form8949_pdf.create_form_with_pdf_overlay(buffer, page_transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, page_number, total_pages, totals, template, layouts):
+                    rendered.append(('page', buffer.getvalue()))
+                    continue
         
-        c.save()
-        
-        # Merge overlay with template
-        overlay_buffer.seek(0)
-        overlay_reader = PyPDF2.PdfReader(overlay_buffer)
-        overlay_page = overlay_reader.pages[0]
-        
-        # Merge the pages
-        template_page.merge_page(overlay_page)
-        
-        # Write to output buffer
-        pdf_writer = PyPDF2.PdfWriter()
-        pdf_writer.add_page(template_page)
-        pdf_writer.write(buffer)
-        
-        return True
-        
-    except Exception as e:
-        print(f"Error in PDF overlay: {e}")
-        return False
-
-def create_form_8949_page_custom(buffer, page_transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, page_number, total_pages, all_transactions):
-    """Create a custom Form 8949 PDF page with precise table formatting"""
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    
-    # Page margins
-    left_margin = 50
-    right_margin = width - 50
-    top_margin = height - 50
-    
-    # Form header
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(left_margin, top_margin, "Form 8949")
-    c.setFont("Helvetica", 12)
-    c.drawString(left_margin + 100, top_margin, "Sales and Other Dispositions of Capital Assets")
-    c.drawRightString(right_margin, top_margin, f"{tax_year}")
-    
-    # Department line
-    c.setFont("Helvetica", 9)
-    c.drawString(left_margin + 100, top_margin - 15, "Department of the Treasury - Internal Revenue Service")
-    
-    # Taxpayer information section
-    info_y = top_margin - 50
-    c.setFont("Helvetica", 10)
-    c.drawString(left_margin, info_y, f"Name(s) shown on return:")
-    c.drawString(left_margin + 150, info_y, taxpayer_name)
-    c.drawString(left_margin + 350, info_y, f"Your social security number:")
-    c.drawString(left_margin + 520, info_y, taxpayer_ssn)
-    
-    # Part section
-    part_y = info_y - 40
-    c.setFont("Helvetica-Bold", 11)
-    if "Part I" in form_type:
-        c.drawString(left_margin, part_y, "Part I - Short-Term Capital Gains and Losses")
-        c.setFont("Helvetica", 9)
-        c.drawString(left_margin, part_y - 12, "Generally for assets held one year or less")
-    else:
-        c.drawString(left_margin, part_y, "Part II - Long-Term Capital Gains and Losses")
-        c.setFont("Helvetica", 9)
-        c.drawString(left_margin, part_y - 12, "Generally for assets held more than one year")
-    
-    # Checkbox section
-    checkbox_y = part_y - 40
-    c.setFont("Helvetica", 9)
-    
-    # Determine checkbox options based on Part
-    if "Part I" in form_type:
-        options = [
-            ("(A) Short-term transactions reported on Form(s) 1099-B showing basis was reported to the IRS", "A"),
-            ("(B) Short-term transactions reported on Form(s) 1099-B showing basis was NOT reported to the IRS", "B"),
-            ("(C) Short-term transactions not reported to you on Form 1099-B", "C")
-        ]
-    else:
-        options = [
-            ("(D) Long-term transactions reported on Form(s) 1099-B showing basis was reported to the IRS", "D"),
-            ("(E) Long-term transactions reported on Form(s) 1099-B showing basis was NOT reported to the IRS", "E"),
-            ("(F) Long-term transactions not reported to you on Form 1099-B", "F")
-        ]
-    
-    # Draw checkboxes
-    for i, (text, code) in enumerate(options):
-        y_pos = checkbox_y - (i * 15)
-        # Check the appropriate box
-        is_checked = f"Box {code}" in form_type
-        checkbox = "☑" if is_checked else "☐"
-        c.drawString(left_margin, y_pos, f"{checkbox} {text}")
-    
-    # Transaction table - precisely sized to match IRS form
-    table_y = checkbox_y - 80
-    
-    # Draw table headers with precise positioning
-    c.setFont("Helvetica-Bold", 8)
-    
-    # Column definitions with exact measurements from IRS form
-    columns = [
-        {"header": "(a) Description of property", "x": left_margin + 5, "width": 110, "align": "left"},
-        {"header": "(b) Date acquired", "x": left_margin + 120, "width": 50, "align": "center"},
-        {"header": "(c) Date sold", "x": left_margin + 175, "width": 50, "align": "center"},
-        {"header": "(d) Proceeds", "x": left_margin + 230, "width": 60, "align": "right"},
-        {"header": "(e) Cost basis", "x": left_margin + 295, "width": 60, "align": "right"},
-        {"header": "(f) Code", "x": left_margin + 360, "width": 30, "align": "center"},
-        {"header": "(g) Adjustment", "x": left_margin + 395, "width": 50, "align": "right"},
-        {"header": "(h) Gain/(loss)", "x": left_margin + 450, "width": 65, "align": "right"}
-    ]
+        # Fallback to custom form if official template fails
+        if overlays_only:
+            rendered.append(('custom_overlay', form8949_pdf.draw_form_8949_overlay(page_transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, page_number, total_pages, totals, official=False, layouts=layouts)))
+            continue
+        buffer = io.BytesIO()
+        form8949_pdf.create_form_8949_page_custom(buffer, page_transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, page_number, total_pages, totals, layouts)
+        rendered.append(('page', buffer.getvalue()))
     
-    # Draw column headers
-    for col in columns:
-        if col["align"] == "center":
-            text_x = col["x"] + col["width"] / 2
-            text_width = c.stringWidth(col["header"])
-            c.drawString(text_x - text_width/2, table_y, col["header"])
-        elif col["align"] == "right":
-            text_x = col["x"] + col["width"] - 5
-            c.drawRightString(text_x, table_y, col["header"])
+    return rendered
+
+def get_official_form_8949(tax_year):
+    """Fetch the official IRS Form 8949 for the specified tax year"""
+    return get_form_template_store().get(tax_year)
+
+@st.cache_resource
+def get_form_template_store():
+    """Return the process-wide Form 8949 template store"""
+    from form8949_templates import FormTemplateStore, default_cache_dir
+    return FormTemplateStore(
+        IRS_FORM_8949_URLS,
+        cache_dir=FORM_TEMPLATE_CACHE_DIR or default_cache_dir(),
+        seed_dir=FORM_TEMPLATE_SEED_DIR,
+        offline=FORM_TEMPLATE_OFFLINE
+    )
+
+class TemplateWarmup:
+    """Fetch, validate and parse the official templates of several tax years in the background
+    
+    Years are warmed concurrently on a thread pool; years sharing a template
+    (e.g. the current-year f8949.pdf) wait on the store's single fetch of
+    it. With parse set, both form pages are then parsed through
+    load_form_8949_template, so the first PDF request finds them ready;
+    without it, prepare() parses a single year's pages on request.
+    status() reports each year as 'pending', 'fetching', 'parsing', 'ready',
+    'unavailable' (no template, so the custom form is used) or 'failed'
+    (the template could not be parsed).
+    """
+    
+    def __init__(self, store, tax_years, workers=TEMPLATE_WARMUP_WORKERS, parse=True):
+        self.store = store
+        self.tax_years = sorted(set(tax_years), reverse=True)
+        self.workers = workers
+        self.parse = parse
+        self.seconds = None
+        self._status = dict.fromkeys(self.tax_years, 'pending')
+        self._errors = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._preparing = {}
+    
+    def start(self):
+        """Warm every year on a background thread and return self"""
+        threading.Thread(target=self._run, name='form8949-template-warmup', daemon=True).start()
+        return self
+    
+    def prepare(self, tax_year):
+        """Parse tax_year's template on a background thread once it is fetched, and return self
+        
+        For a warm-up started without parse: call it when a PDF becomes
+        likely, such as when PDF output is chosen, so the PDF libraries load
+        and the form is parsed before the PDF is asked for. Only the first
+        call for a year starts anything.
+        """
+        with self._lock:
+            if tax_year in self._preparing or (self.parse and tax_year in self._status):
+                return self
+            thread = self._preparing[tax_year] = threading.Thread(
+                target=self._prepare, args=(tax_year,), name='form8949-template-parse', daemon=True
+            )
+        thread.start()
+        return self
+    
+    def wait(self, timeout=None):
+        """Block until every year is warmed, and every prepare()d year parsed, or timeout passes; True once done"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._done.wait(timeout):
+            return False
+        with self._lock:
+            threads = list(self._preparing.values())
+        for thread in threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in threads)
+    
+    @property
+    def ready(self):
+        return self._done.is_set()
+    
+    def status(self, tax_year=None):
+        """Each year's state as {tax_year: state}, or one year's state"""
+        with self._lock:
+            if tax_year is not None:
+                return self._status.get(tax_year, 'pending')
+            return dict(self._status)
+    
+    def errors(self):
+        with self._lock:
+            return dict(self._errors)
+    
+    def _set(self, tax_year, state, error=None):
+        with self._lock:
+            self._status[tax_year] = state
+            if error is not None:
+                self._errors[tax_year] = error
+    
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='form8949-template') as pool:
+                list(pool.map(self._warm, self.tax_years))
+        finally:
+            self.seconds = time.perf_counter() - started
+            self._done.set()
+    
+    def _warm(self, tax_year):
+        self._set(tax_year, 'fetching')
+        try:
+            if self.store.get(tax_year) is None:
+                self._set(tax_year, 'unavailable')
+                return
+        except Exception as e:
+            self._set(tax_year, 'failed', str(e))
+            return
+        if self.parse:
+            self._parse(tax_year)
         else:
-            c.drawString(col["x"] + 3, table_y, col["header"])
-    
-    # Draw precise table borders
-    table_top = table_y + 12
-    table_bottom = table_y - (15 * 16)  # Space for 14 transactions + totals
+            self._set(tax_year, 'ready')
     
-    # Horizontal lines
-    c.line(left_margin, table_top, right_margin, table_top)
-    c.line(left_margin, table_y - 3, right_margin, table_y - 3)  # Under headers
-    c.line(left_margin, table_bottom, right_margin, table_bottom)
+    def _prepare(self, tax_year):
+        # Years without a template use the custom form, so there is nothing to parse
+        self._done.wait()
+        if self.status(tax_year) not in ('unavailable', 'failed'):
+            self._parse(tax_year)
     
-    # Vertical lines - precisely positioned
-    x_positions = [left_margin]
-    for col in columns:
-        x_positions.append(x_positions[-1] + col["width"])
-    
-    for x_pos in x_positions:
-        c.line(x_pos, table_top, x_pos, table_bottom)
-    
-    # Fill in transaction data with precise alignment
-    c.setFont("Helvetica", 7)
-    row_height = 14
+    def _parse(self, tax_year):
+        self._set(tax_year, 'parsing')
+        try:
+            for page_index in (0, 1):
+                load_form_8949_template(tax_year, page_index)
+        except Exception as e:
+            self._set(tax_year, 'failed', str(e))
+            return
+        self._set(tax_year, 'ready')
+
+@st.cache_resource
+def get_template_warmup():
+    """Start fetching every configured year's template, once per process
+    
+    Templates are only downloaded and checked here: parsing them would load
+    the PDF libraries on every cold start. A year's template is parsed in
+    the background once PDF output is chosen for it (TemplateWarmup.prepare).
+    """
+    return TemplateWarmup(get_form_template_store(), IRS_FORM_8949_URLS, parse=False).start()
+
+@st.cache_resource(max_entries=32)
+def load_form_8949_template(tax_year, page_index):
+    """Parse the official form page for a tax year once per process
     
-    for i, transaction in enumerate(page_transactions[:14]):
-        if i >= 14:  # Max 14 transactions per page
-            break
-            
-        y_pos = table_y - 18 - (i * row_height)
-        
-        # Format data to fit in cells
-        description = transaction['description'][:26]  # Ensure it fits
-        date_acquired = transaction['date_acquired'].strftime('%m/%d/%Y') if transaction['date_acquired'] else 'VARIOUS'
-        date_sold = transaction['date_sold'].strftime('%m/%d/%Y')
-        
-        # Draw data precisely aligned within each cell
-        # Column (a) - Description
-        c.drawString(columns[0]["x"] + 3, y_pos, description)
-        
-        # Column (b) - Date acquired (centered)
-        date_acq_width = c.stringWidth(date_acquired)
-        center_b = columns[1]["x"] + columns[1]["width"]/2
-        c.drawString(center_b - date_acq_width/2, y_pos, date_acquired)
-        
-        # Column (c) - Date sold (centered)
-        date_sold_width = c.stringWidth(date_sold)
-        center_c = columns[2]["x"] + columns[2]["width"]/2
-        c.drawString(center_c - date_sold_width/2, y_pos, date_sold)
-        
-        # Column (d) - Proceeds (right aligned)
-        c.drawRightString(columns[3]["x"] + columns[3]["width"] - 3, y_pos, f"{transaction['proceeds']:,.2f}")
-        
-        # Column (e) - Cost basis (right aligned)
-        c.drawRightString(columns[4]["x"] + columns[4]["width"] - 3, y_pos, f"{transaction['cost_basis']:,.2f}")
-        
-        # Columns (f) and (g) - Leave empty
-        
-        # Column (h) - Gain/Loss (right aligned with parentheses for losses)
-        gain_loss = transaction['gain_loss']
-        if gain_loss < 0:
-            gain_loss_text = f"({abs(gain_loss):,.2f})"
-        else:
-            gain_loss_text = f"{gain_loss:,.2f}"
-        c.drawRightString(columns[7]["x"] + columns[7]["width"] - 3, y_pos, gain_loss_text)
-        
-        # Draw light row separator
-        separator_y = y_pos - 6
-        c.setStrokeColor(colors.lightgrey)
-        c.line(left_margin + 1, separator_y, right_margin - 1, separator_y)
-        c.setStrokeColor(colors.black)
-    
-    # Add totals row (only on last page)
-    if page_number == total_pages:
-        totals_y = table_y - 18 - (14 * row_height)
-        
-        # Calculate totals
-        total_proceeds = sum(t['proceeds'] for t in all_transactions)
-        total_basis = sum(t['cost_basis'] for t in all_transactions)
-        total_gain_loss = sum(t['gain_loss'] for t in all_transactions)
-        
-        # Draw totals with bold font
-        c.setFont("Helvetica-Bold", 7)
-        c.drawString(columns[0]["x"] + 3, totals_y, "TOTALS")
-        c.drawRightString(columns[3]["x"] + columns[3]["width"] - 3, totals_y, f"{total_proceeds:,.2f}")
-        c.drawRightString(columns[4]["x"] + columns[4]["width"] - 3, totals_y, f"{total_basis:,.2f}")
-        
-        # Format total gain/loss
-        if total_gain_loss < 0:
-            total_gl_text = f"({abs(total_gain_loss):,.2f})"
-        else:
-            total_gl_text = f"{total_gain_loss:,.2f}"
-        c.drawRightString(columns[7]["x"] + columns[7]["width"] - 3, totals_y, total_gl_text)
-        
-        # Bold line above totals
-        c.setLineWidth(2)
-        c.line(left_margin, totals_y + 8, right_margin, totals_y + 8)
-        c.setLineWidth(1)
-    
-    # Page footer
-    c.setFont("Helvetica", 8)
-    footer_text = f"Form 8949 ({tax_year})"
-    if total_pages > 1:
-        footer_text += f" - Page {page_number} of {total_pages}"
-    c.drawString(left_margin, 25, footer_text)
-    c.drawRightString(right_margin, 25, f"Generated by Bitwave - {datetime.now().strftime('%m/%d/%Y')}")
-    
-    c.save()
-
-def create_zip_file(pdf_files):
-    """Create a ZIP file containing all PDFs"""
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for pdf_file in pdf_files:
-            zip_file.writestr(pdf_file['filename'], pdf_file['content'])
-    return zip_buffer.getvalue()
+    Raises if the template is unavailable, so a later call can try again.
+    """
+    with pipeline_stage('template_fetch'):
+        official_form_pdf = get_official_form_8949(tax_year)
+        if not official_form_pdf:
+            raise ValueError(f"Official Form 8949 template for {tax_year} is unavailable")
+        count_event('template_parses')
+        import form8949_pdf
+        return form8949_pdf.Form8949Template(official_form_pdf, page_index)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,426 @@
+"""Convert a directory of Bitwave actions exports to Form 8949 outputs without the web app
+
+Each client is described in a JSON config keyed by export file name:
+
+    {
+      "defaults": {"tax_year": 2024, "box": "B"},
+      "clients": {
+        "acme_actions.csv": {"name": "Jane Doe", "ssn": "123-45-6789"},
+        "smith_actions.csv": {"name": "John Smith", "ssn": "987-65-4321", "box": "C", "tax_year": 2023}
+      }
+    }
+
+"box" is the Form 8949 checkbox (A, B or C) used for both parts, as in the
+app's sidebar. "tax_year" may also be a list of years (e.g. for amended
+returns); every year is extracted in one pass over the export. Files are
+converted across a pool of worker processes and each client's outputs go
+to their own folder under the output directory. Exports may also be actions
+saved by the app as Parquet (.parquet), which skips CSV parsing; the parquet
+format writes those for each export, plus each year's extracted transactions.
+
+With --store, each client's actions are kept in a local store (see
+app.ActionStore) named after its "client_id" setting, or the export's file
+name without one. Cumulative exports then only ingest the rows added since
+the last run, and each year is extracted from the store.
+
+With --stream, CSV exports flow from rows to written files without the
+export or its sales ever being held whole: sells are spooled to disk in
+one pass, then each page is rendered and written as soon as its 14 rows
+are read back (see app.SellSpool). Use it for filings too large for memory.
+
+Each export's conversion is recorded as an app.PipelineRun: its stage
+timings, peak memory and counters are returned in the result's 'run' and,
+with --run-log, appended to that file as one JSON line per export.
+
+Usage:
+    python batch.py EXPORTS_DIR --config clients.json --output out/ [--workers 8] [--format csv pdf] [--pdf-layout combined|pages] [--store DIR] [--stream] [--run-log runs.jsonl]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+
+import pandas as pd
+import streamlit.logger
+
+import app
+
+
+def init_worker():
+    """Keep Streamlit's bare-mode warnings out of the batch output"""
+    warnings.filterwarnings('ignore')
+    streamlit.logger.set_log_level("error")
+
+
+def load_client_config(path):
+    """Read the JSON client config and return {file name: client settings}"""
+    with open(path) as f:
+        config = json.load(f)
+
+    defaults = config.get('defaults', {})
+    clients = {}
+    for file_name, settings in config.get('clients', {}).items():
+        client = {**defaults, **settings}
+        if 'tax_year' not in client:
+            raise ValueError(f"{file_name}: no tax_year set")
+        tax_years = client.pop('tax_year')
+        client['tax_years'] = [int(year) for year in (tax_years if isinstance(tax_years, list) else [tax_years])]
+        client['form_type'] = form_type_for_box(client.get('box', 'B'))
+        clients[file_name] = client
+    return clients
+
+
+def form_type_for_box(box):
+    """Map a checkbox letter to the app's Part I form type (Part II follows it)"""
+    for form_type in app.FORM_8949_TYPES:
+        if form_type.startswith("Part I ") and f"(Box {str(box).upper()})" in form_type:
+            return form_type
+    raise ValueError(f"Unknown Form 8949 box {box!r}; use A, B or C")
+
+
+def convert_export(path, client, output_dir, formats, pdf_layout, store_dir=None, stream=False):
+    """Convert one export for each of a client's tax years and return its timing record"""
+    if stream:
+        return stream_export(path, client, output_dir, formats, pdf_layout)
+
+    with app.PipelineRun(mode='batch', file=os.path.basename(path)) as run:
+        started = time.perf_counter()
+        input_bytes = os.path.getsize(path)
+
+        # Parquet exports are typed and compact, so they are read whole
+        with app.pipeline_stage('read_upload'):
+            actions = app.read_actions_parquet(path) if path.lower().endswith('.parquet') else None
+        columns = actions.columns if actions is not None else pd.read_csv(path, nrows=0).columns
+        missing_columns = [col for col in app.BITWAVE_REQUIRED_COLUMNS if col not in columns]
+        if missing_columns:
+            raise ValueError(f"Missing columns: {', '.join(missing_columns)}")
+
+        ingest = None
+        if store_dir and actions is not None:
+            raise ValueError("--store needs the Bitwave CSV export, not Parquet")
+        if store_dir:
+            transactions_by_year, issues_by_year, lot_index, ingest = extract_from_store(path, client, store_dir)
+        else:
+            parse_issues = []
+            with app.pipeline_stage('extract'):
+                if actions is not None:
+                    transactions_by_year, lot_index = app.extract_bitwave_transactions_by_year(actions, parse_issues)
+                elif input_bytes > app.CHUNKED_INGEST_THRESHOLD_BYTES:
+                    transactions_by_year, lot_index = app.extract_bitwave_transactions_by_year_chunked(path, issues=parse_issues, tax_years=client['tax_years'])
+                else:
+                    transactions_by_year, lot_index = app.extract_bitwave_transactions_by_year(pd.read_csv(path), parse_issues)
+            issues_by_year = app.partition_issues_by_year(parse_issues)
+        extracted = time.perf_counter()
+
+        client_dir = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0])
+        os.makedirs(client_dir, exist_ok=True)
+        written = []
+        sales = 0
+        unmatched_sales = 0
+        pages = 0
+
+        if 'parquet' in formats:
+            actions_path = os.path.join(client_dir, "bitwave_actions_normalized.parquet")
+            with app.pipeline_stage('parquet_export'):
+                app.write_actions_parquet(actions if actions is not None else path, actions_path)
+            written.append(actions_path)
+
+        for tax_year in client['tax_years']:
+            transactions = transactions_by_year.get(tax_year)
+            if transactions is None:
+                continue
+            sales += len(transactions)
+            unmatched_sales += int((~transactions.column('lot_matched')).sum())
+            written_year, pages_year = write_outputs(transactions, tax_year, client, client_dir, formats, pdf_layout)
+            written.extend(written_year)
+            pages += pages_year
+
+        finished = time.perf_counter()
+        result = {
+            'file': os.path.basename(path),
+            'sales': sales,
+            'pages': pages,
+            'input_mb': input_bytes / (1024 * 1024),
+            'extract_seconds': extracted - started,
+            'seconds': finished - started,
+            'parse_issues': sum(len(issues_by_year.get(year, [])) for year in client['tax_years']),
+            'unmatched_sales': unmatched_sales,
+            'duplicate_lots': len(lot_index.duplicate_lot_ids),
+            'new_rows': ingest['new_rows'] if ingest else None,
+            'missing_rows': ingest['missing_rows'] if ingest else 0,
+            'outputs': written,
+            'error': None
+        }
+    result['run'] = run.record()
+    return result
+
+
+def stream_export(path, client, output_dir, formats, pdf_layout):
+    """convert_export through the streaming pipeline, for exports too large to hold in memory
+
+    The export's sells are spooled to disk once (see app.SellSpool). Each
+    tax year's sales are then read back in chunks: one pass writes the CSV
+    and totals the parts, and each part's pages are rendered and written as
+    soon as they fill. Only the lot index and running totals stay in memory.
+    """
+    with app.PipelineRun(mode='batch', file=os.path.basename(path), stream=True) as run:
+        started = time.perf_counter()
+        input_bytes = os.path.getsize(path)
+        if not path.lower().endswith('.csv'):
+            raise ValueError("--stream needs the Bitwave CSV export")
+        missing_columns = [col for col in app.BITWAVE_REQUIRED_COLUMNS if col not in pd.read_csv(path, nrows=0).columns]
+        if missing_columns:
+            raise ValueError(f"Missing columns: {', '.join(missing_columns)}")
+
+        client_dir = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0])
+        os.makedirs(client_dir, exist_ok=True)
+        written = []
+        sales = 0
+        unmatched_sales = 0
+        pages = 0
+        parse_issues = []
+
+        with app.pipeline_stage('extract'):
+            spool = app.SellSpool(path, issues=parse_issues)
+        extracted = time.perf_counter()
+
+        with spool:
+            for tax_year in client['tax_years']:
+                if tax_year not in spool.tax_years:
+                    continue
+                written_year, totals, unmatched_year = write_streamed_csv(spool, tax_year, client_dir, formats)
+                written.extend(written_year)
+                sales += totals['all'].count
+                unmatched_sales += unmatched_year
+                if 'pdf' in formats:
+                    written_year, pages_year = write_streamed_pdfs(spool, tax_year, totals, client, client_dir, pdf_layout)
+                    written.extend(written_year)
+                    pages += pages_year
+            duplicate_lots = len(spool.lot_index.duplicate_lot_ids)
+
+        issues_by_year = app.partition_issues_by_year(parse_issues)
+        finished = time.perf_counter()
+        result = {
+            'file': os.path.basename(path),
+            'sales': sales,
+            'pages': pages,
+            'input_mb': input_bytes / (1024 * 1024),
+            'extract_seconds': extracted - started,
+            'seconds': finished - started,
+            'parse_issues': sum(len(issues_by_year.get(year, [])) for year in client['tax_years']),
+            'unmatched_sales': unmatched_sales,
+            'duplicate_lots': duplicate_lots,
+            'new_rows': None,
+            'missing_rows': 0,
+            'outputs': written,
+            'error': None
+        }
+    result['run'] = run.record()
+    return result
+
+
+def write_streamed_csv(spool, tax_year, client_dir, formats):
+    """One pass over a year's spooled sales: write the CSV if asked and total the parts
+
+    Returns (paths written, the year's summary as from app.summarize_transactions, unmatched sales).
+    """
+    summary = app.TransactionSummary()
+    unmatched_sales = 0
+    csv_path = os.path.join(client_dir, f"form_8949_{tax_year}_bitwave_transactions.csv")
+    csv_file = open(csv_path, 'w', newline='') if 'csv' in formats else nullcontext()
+    with app.pipeline_stage('tax_software_csv'), csv_file as f:
+        for index, transactions in enumerate(spool.transactions(tax_year)):
+            summary.add(transactions)
+            unmatched_sales += int((~transactions.column('lot_matched')).sum())
+            if f is not None:
+                app.write_tax_software_csv(transactions, f, header=index == 0)
+    return ([csv_path] if 'csv' in formats else []), summary.result(), unmatched_sales
+
+
+def write_streamed_pdfs(spool, tax_year, totals, client, client_dir, pdf_layout):
+    """Render a year's spooled sales to PDF page by page, returning (paths written, PDF pages)"""
+    if not client.get('name') or not client.get('ssn'):
+        raise ValueError("name and ssn are required for PDF output")
+
+    with app.pipeline_stage('pdf'):
+        if pdf_layout == 'combined':
+            pdf_path = os.path.join(client_dir, f"Form_8949_{tax_year}_{client['name'].replace(' ', '_')}.pdf")
+            with open(pdf_path, 'wb') as f:
+                pages = app.write_streamed_form_8949_document(f, spool, tax_year, totals, client['form_type'], client['name'], client['ssn'])
+            return [pdf_path], pages
+
+        written = []
+        for pdf_file in app.iter_streamed_form_8949_pdfs(spool, tax_year, totals, client['form_type'], client['name'], client['ssn']):
+            pdf_path = os.path.join(client_dir, pdf_file['filename'])
+            with open(pdf_path, 'wb') as f:
+                f.write(pdf_file['content'])
+            written.append(pdf_path)
+        return written, len(written)
+
+
+def extract_from_store(path, client, store_dir):
+    """Ingest an export into the client's store and extract its tax years from there
+
+    Returns ({tax_year: TransactionTable}, {tax_year: parse issues}, LotIndex, ingest summary).
+    """
+    store = app.ActionStore.for_client(store_dir, client.get('client_id') or os.path.splitext(os.path.basename(path))[0])
+    with app.pipeline_stage('store_ingest'):
+        ingest = store.ingest(path)
+
+    with app.pipeline_stage('extract'):
+        lot_index = store.lot_index()
+        stored_years = set(store.tax_years())
+        transactions_by_year = {}
+        issues_by_year = {}
+        for tax_year in client['tax_years']:
+            if tax_year not in stored_years:
+                continue
+            issues_by_year[tax_year] = []
+            transactions_by_year[tax_year] = store.extract_year(tax_year, issues_by_year[tax_year], lot_index)
+    return transactions_by_year, issues_by_year, lot_index, ingest
+
+
+def write_outputs(transactions, tax_year, client, client_dir, formats, pdf_layout):
+    """Write one tax year's CSV, Parquet and/or PDFs, returning (paths written, PDF pages)"""
+    written = []
+    pages = 0
+
+    if 'csv' in formats:
+        csv_path = os.path.join(client_dir, f"form_8949_{tax_year}_bitwave_transactions.csv")
+        with app.pipeline_stage('tax_software_csv'), open(csv_path, 'w', newline='') as f:
+            app.write_tax_software_csv(transactions, f)
+        written.append(csv_path)
+
+    if 'parquet' in formats:
+        parquet_path = os.path.join(client_dir, f"form_8949_{tax_year}_bitwave_transactions.parquet")
+        with app.pipeline_stage('parquet_export'):
+            transactions.to_parquet(parquet_path)
+        written.append(parquet_path)
+
+    if 'pdf' in formats:
+        if not client.get('name') or not client.get('ssn'):
+            raise ValueError("name and ssn are required for PDF output")
+        totals = app.summarize_transactions(transactions)
+        form_parts = app.split_form_8949_parts(transactions, totals, client['form_type'])
+
+        if pdf_layout == 'combined':
+            pdf_path = os.path.join(client_dir, f"Form_8949_{tax_year}_{client['name'].replace(' ', '_')}.pdf")
+            sections = [(part_txns, part_form_type, part_totals) for _, part_txns, part_form_type, part_totals in form_parts]
+            with app.pipeline_stage('pdf'), open(pdf_path, 'wb') as f:
+                pages = app.generate_form_8949_document(f, sections, client['name'], client['ssn'], tax_year)
+            written.append(pdf_path)
+        else:
+            with app.pipeline_stage('pdf'):
+                for term_type, part_txns, part_form_type, part_totals in form_parts:
+                    for pdf_file in app.iter_form_8949_pdfs(part_txns, part_form_type, client['name'], client['ssn'], tax_year, term_type, totals=part_totals):
+                        pdf_path = os.path.join(client_dir, pdf_file['filename'])
+                        with open(pdf_path, 'wb') as f:
+                            f.write(pdf_file['content'])
+                        written.append(pdf_path)
+                        pages += 1
+
+    return written, pages
+
+
+def print_summary(results, wall_seconds):
+    """Print per-file timings and throughput, then the batch totals"""
+    print()
+    print(f"{'file':<32} {'sales':>9} {'pages':>6} {'MB':>8} {'extract s':>10} {'total s':>8} {'MB/s':>7} {'sales/s':>9}  status")
+    for result in sorted(results, key=lambda r: r['file']):
+        if result['error']:
+            print(f"{result['file']:<32} {'':>9} {'':>6} {'':>8} {'':>10} {'':>8} {'':>7} {'':>9}  failed: {result['error']}")
+            continue
+        seconds = max(result['seconds'], 1e-9)
+        notes = [
+            f"{result[key]:,} {label}"
+            for key, label in (('parse_issues', "unreadable amounts"), ('unmatched_sales', "unmatched sales"), ('duplicate_lots', "repeated lots"),
+                               ('missing_rows', "stored rows not in export"))
+            if result[key]
+        ]
+        if result['new_rows'] is not None:
+            notes.append(f"{result['new_rows']:,} new rows")
+        status = ", ".join(["ok"] + notes)
+        print(f"{result['file']:<32} {result['sales']:>9,} {result['pages']:>6,} {result['input_mb']:>8.1f} "
+              f"{result['extract_seconds']:>10.2f} {result['seconds']:>8.2f} {result['input_mb'] / seconds:>7.1f} "
+              f"{result['sales'] / seconds:>9,.0f}  {status}")
+
+    succeeded = [r for r in results if not r['error']]
+    total_mb = sum(r['input_mb'] for r in succeeded)
+    total_sales = sum(r['sales'] for r in succeeded)
+    print()
+    print(f"{len(succeeded)}/{len(results)} files converted in {wall_seconds:.2f}s: "
+          f"{total_mb:.1f} MB at {total_mb / max(wall_seconds, 1e-9):.1f} MB/s, "
+          f"{total_sales:,} sales at {total_sales / max(wall_seconds, 1e-9):,.0f} sales/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('input_dir', help="Directory of Bitwave actions CSV (or app Parquet) exports")
+    parser.add_argument('--config', required=True, help="JSON client config (see module docstring)")
+    parser.add_argument('--output', required=True, help="Directory to write each client's outputs to")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes (default: CPU count)")
+    parser.add_argument('--format', nargs='+', choices=['csv', 'pdf', 'parquet'], default=['csv', 'pdf'])
+    parser.add_argument('--pdf-layout', choices=['combined', 'pages'], default='combined',
+                        help="One PDF per client, or one PDF per page")
+    parser.add_argument('--store', help="Directory of per-client action stores for incremental processing")
+    parser.add_argument('--stream', action='store_true',
+                        help="Stream each export from CSV rows to written pages, holding only the lot index and totals in memory")
+    parser.add_argument('--run-log', help="Append each export's run record (stage timings, memory, counters) to this file as a JSON line")
+    args = parser.parse_args()
+    if args.stream and (args.store or 'parquet' in args.format):
+        parser.error("--stream writes csv and pdf outputs from CSV exports, without --store")
+
+    init_worker()
+    clients = load_client_config(args.config)
+    exports = sorted(name for name in os.listdir(args.input_dir) if name.lower().endswith(('.csv', '.parquet')))
+
+    for name in exports:
+        if name not in clients:
+            print(f"Skipping {name}: not in {args.config}")
+    for name in sorted(set(clients) - set(exports)):
+        print(f"Missing {name}: listed in {args.config} but not in {args.input_dir}")
+    jobs = [(os.path.join(args.input_dir, name), clients[name]) for name in exports if name in clients]
+    if not jobs:
+        print("Nothing to convert")
+        return 1
+
+    # Fetch every year's template once up front, concurrently; workers then read the disk cache
+    if 'pdf' in args.format:
+        warmup = app.TemplateWarmup(app.get_form_template_store(), [year for _, client in jobs for year in client['tax_years']], parse=False)
+        warmup.start().wait()
+        for tax_year, state in sorted(warmup.status().items()):
+            if state != 'ready':
+                print(f"Official Form 8949 template for {tax_year} is unavailable; using the custom form")
+
+    os.makedirs(args.output, exist_ok=True)
+    results = []
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), initializer=init_worker) as pool:
+        futures = {
+            pool.submit(convert_export, path, client, args.output, args.format, args.pdf_layout, args.store, args.stream): path
+            for path, client in jobs
+        }
+        for future in as_completed(futures):
+            name = os.path.basename(futures[future])
+            try:
+                result = future.result()
+                print(f"Converted {name}: {result['sales']:,} sales in {result['seconds']:.2f}s")
+            except Exception as e:
+                result = {'file': name, 'error': str(e)}
+                print(f"Failed {name}: {e}")
+            results.append(result)
+            if args.run_log and result.get('run'):
+                with open(args.run_log, 'a') as f:
+                    f.write(json.dumps(result['run'], default=str) + '\n')
+
+    print_summary(results, time.perf_counter() - started)
+    return 1 if any(r['error'] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
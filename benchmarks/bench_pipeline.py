@@ -0,0 +1,232 @@
+"""Benchmark each stage of the conversion pipeline on synthetic Bitwave exports
+
+For each size, a synthetic export (see generate_actions.py) is written once
+to the data directory and every stage is timed on it: reading the CSV,
+extracting every tax year in memory and in chunks, parsing a money column
+per value (clean_currency_value) and per column, writing the tax software
+CSV, and rendering Form 8949 pages as one document and as a ZIP of page
+PDFs. Each stage records its throughput (rows/s or pages/s) and peak memory,
+measured as the growth in the process's resident set while it runs.
+
+Results can be saved as baselines and later runs compared against them.
+Baselines are only comparable on the machine that recorded them; a stage
+regresses when its throughput drops or its peak memory grows by more than
+the tolerance.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--rows 1000 10000 100000] [--pdf-pages 20]
+        [--repeat 3] [--save benchmarks/baselines.json] [--compare benchmarks/baselines.json] [--tolerance 0.25]
+"""
+import argparse
+import ctypes
+import gc
+import io
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+import app
+import form8949_archive
+from pipeline_metrics import resident_mb
+from bench_template_overlay import make_stand_in_template
+from generate_actions import write_actions_csv
+
+TAX_YEAR = 2023
+FORM_TYPE = "Part I - Short-term (Box B) - Basis NOT reported"
+
+# Each stage runs this many times and keeps its best time, to damp noise
+REPEAT = 3
+
+# Growth in resident memory below this is reported as 0, being allocator noise
+MEMORY_FLOOR_MB = 1.0
+
+
+def release_free_memory():
+    """Return freed heap memory to the OS (glibc only) so resident growth reflects the next stage"""
+    gc.collect()
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class PeakMemory:
+    """Sample resident memory in the background and report the peak growth over the start"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak_mb = None
+
+    def __enter__(self):
+        release_free_memory()
+        self._start = resident_mb()
+        self._peak = self._start
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            current = resident_mb()
+            if current is not None and current > self._peak:
+                self._peak = current
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+        current = resident_mb()
+        if self._start is None:
+            return
+        self._peak = max(self._peak, current)
+        growth = self._peak - self._start
+        self.peak_mb = round(growth, 1) if growth >= MEMORY_FLOOR_MB else 0.0
+
+
+def measure(stage, count, unit, fn, repeat=REPEAT):
+    """Run fn repeat times, returning the stage's result record (best time, highest peak) and fn's return value"""
+    seconds = None
+    peak_mb = None
+    for _ in range(max(1, repeat)):
+        value = None
+        with PeakMemory() as memory:
+            start = time.perf_counter()
+            value = fn()
+            elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+        if memory.peak_mb is not None:
+            peak_mb = max(peak_mb or 0.0, memory.peak_mb)
+    record = {
+        'seconds': round(seconds, 4),
+        f'{unit}_per_sec': round(count / max(seconds, 1e-9), 1),
+        'peak_mb': peak_mb
+    }
+    print(f"  {stage:<22} {count:>10,} {unit:<5} {seconds:>9.3f}s {record[f'{unit}_per_sec']:>14,.0f} {unit}/s"
+          f"   peak {peak_mb if peak_mb is not None else '?':>7} MB")
+    return record, value
+
+
+def run_size(rows, data_dir, pdf_pages, repeat=REPEAT):
+    path = os.path.join(data_dir, f"actions_{rows}.csv")
+    if not os.path.exists(path):
+        write_actions_csv(path, rows)
+    print(f"{rows:,} rows ({os.path.getsize(path) / (1024 * 1024):,.1f} MB)")
+    results = {}
+
+    results['read_csv'], df = measure('read_csv', rows, 'rows', lambda: pd.read_csv(path), repeat)
+    results['extract'], (by_year, _) = measure('extract', rows, 'rows', lambda: app.extract_bitwave_transactions_by_year(df, []), repeat)
+    results['extract_chunked'], _ = measure(
+        'extract_chunked', rows, 'rows', lambda: app.extract_bitwave_transactions_by_year_chunked(path, chunksize=min(rows, app.BITWAVE_CHUNK_ROWS), issues=[]), repeat
+    )
+
+    proceeds = df[' proceeds ']
+    results['clean_currency_value'], _ = measure('clean_currency_value', rows, 'rows', lambda: proceeds.map(app.clean_currency_value), repeat)
+    results['parse_currency_column'], _ = measure('parse_currency_column', rows, 'rows', lambda: app.parse_currency_column(proceeds), repeat)
+    del df
+
+    transactions = by_year.get(TAX_YEAR, app.TransactionTable.from_records([]))
+    results['tax_software_csv'], _ = measure(
+        'tax_software_csv', len(transactions), 'rows', lambda: app.generate_tax_software_csv(transactions, TAX_YEAR), repeat
+    )
+
+    pages = transactions[:pdf_pages * app.TRANSACTIONS_PER_PAGE]
+    page_count = -(-len(pages) // app.TRANSACTIONS_PER_PAGE)
+    if page_count:
+        results['pdf_document'], _ = measure(
+            'pdf_document', page_count, 'pages',
+            lambda: app.generate_form_8949_document(io.BytesIO(), [(pages, FORM_TYPE, None)], "Jane Doe", "123-45-6789", TAX_YEAR), repeat
+        )
+
+        def zip_pages():
+            with form8949_archive.create_zip_file(app.iter_form_8949_pdfs(pages, FORM_TYPE, "Jane Doe", "123-45-6789", TAX_YEAR)) as zip_file:
+                return zip_file.seek(0, io.SEEK_END)
+        results['pdf_pages_zip'], _ = measure('pdf_pages_zip', page_count, 'pages', zip_pages, repeat)
+
+    return results
+
+
+def compare(results, baselines, tolerance):
+    """Print each stage against its baseline and return the regressions found"""
+    regressions = []
+    print()
+    print(f"{'rows':>10} {'stage':<22} {'throughput':>12} {'baseline':>12} {'ratio':>7} {'peak MB':>9} {'baseline':>9}")
+    for rows, stages in results.items():
+        for stage, record in stages.items():
+            baseline = baselines.get(rows, {}).get(stage)
+            if baseline is None:
+                continue
+            unit = 'pages_per_sec' if 'pages_per_sec' in record else 'rows_per_sec'
+            ratio = record[unit] / max(baseline[unit], 1e-9)
+            flags = []
+            if ratio < 1 - tolerance:
+                flags.append("slower")
+            if record['peak_mb'] is not None and baseline['peak_mb'] is not None and \
+                    record['peak_mb'] > baseline['peak_mb'] * (1 + tolerance) + MEMORY_FLOOR_MB * 4:
+                flags.append("more memory")
+            if flags:
+                regressions.append((rows, stage, flags))
+            print(f"{rows:>10} {stage:<22} {record[unit]:>12,.0f} {baseline[unit]:>12,.0f} {ratio:>7.2f} "
+                  f"{record['peak_mb'] if record['peak_mb'] is not None else '?':>9} "
+                  f"{baseline['peak_mb'] if baseline['peak_mb'] is not None else '?':>9}  {', '.join(flags)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--pdf-pages', type=int, default=20, help="Pages rendered per size for the PDF stages")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'form8949_bench'),
+                        help="Where generated exports are kept between runs")
+    parser.add_argument('--template', help="Path to an IRS f8949 PDF (default: generated stand-in)")
+    parser.add_argument('--save', help="Write the results to this baseline file")
+    parser.add_argument('--compare', help="Compare the results with this baseline file")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="Runs per stage; the best time is kept")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    logging.disable(logging.WARNING)
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    if args.template:
+        with open(args.template, 'rb') as f:
+            template_pdf = f.read()
+    else:
+        template_pdf = make_stand_in_template()
+    app.get_official_form_8949 = lambda tax_year: template_pdf
+
+    results = {str(rows): run_size(rows, args.data_dir, args.pdf_pages, args.repeat) for rows in args.rows}
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'machine': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+                'results': results
+            }, f, indent=2)
+            f.write('\n')
+        print(f"\nSaved baselines to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baselines = json.load(f)['results']
+        regressions = compare(results, baselines, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) regressed beyond {args.tolerance:.0%}")
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
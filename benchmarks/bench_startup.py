@@ -0,0 +1,198 @@
+"""Benchmark the app's cold start: import cost per dependency and time to first render
+
+Each run starts a fresh interpreter, so nothing is cached in the process.
+Import costs come from python -X importtime: the cumulative time of each
+module app imports directly, and separately of the PDF,
+template download and archive modules the app only imports on first use.
+Time to first render runs the app's main() once through Streamlit's
+AppTest, from a fresh process, up to the finished first page (the upload
+step, before any file is chosen).
+
+The template warm-up runs in the background as in production, against
+stand-in templates in a seed directory so it never waits on the network.
+Once it finishes, the benchmark lists any PDF module it loaded: there
+should be none, since they are only needed for the first PDF.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5] [--top 15]
+        [--save benchmarks/startup_baselines.json] [--compare benchmarks/startup_baselines.json] [--tolerance 0.25]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Imported by the app on first use rather than at startup
+LAZY_MODULES = ['form8949_pdf', 'form8949_templates', 'form8949_archive']
+
+# Modules only a PDF needs, which the startup warm-up must not load
+PDF_MODULES = ['form8949_pdf', 'PyPDF2', 'reportlab']
+
+REPEAT = 5
+
+FIRST_RENDER_SCRIPT = """
+import time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=120).run()
+finished = time.perf_counter()
+if at.exception:
+    raise SystemExit(f"app raised: {{at.exception[0].message}}")
+import sys, threading
+for thread in threading.enumerate():
+    if thread.name == 'form8949-template-warmup':
+        thread.join(60)
+loaded = [name for name in {pdf_modules!r} if name in sys.modules]
+print(imported - started, finished - imported, finished - started, ','.join(loaded) or '-')
+"""
+
+
+def child_env(template_dir=None):
+    """The environment of a benchmark process: offline, or served templates from template_dir"""
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONWARNINGS='ignore')
+    env.pop('FORM8949_STORE_DIR', None)
+    if template_dir is None:
+        env['FORM8949_OFFLINE'] = '1'
+    else:
+        env.update(FORM8949_OFFLINE='0', FORM8949_TEMPLATE_DIR=template_dir, FORM8949_TEMPLATE_CACHE=template_dir)
+    return env
+
+
+def write_stand_in_templates(template_dir):
+    """Seed template_dir with a placeholder PDF under every template name the app fetches"""
+    sys.path.insert(0, ROOT)
+    from app import IRS_FORM_8949_URLS
+    for url in set(IRS_FORM_8949_URLS.values()):
+        with open(os.path.join(template_dir, url.rsplit('/', 1)[-1]), 'wb') as f:
+            f.write(b'%PDF-1.4\n%%EOF\n')
+
+
+def import_costs(statement):
+    """{module: (cumulative seconds, {direct import: cumulative seconds})} for each module statement loads, in a fresh process"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True
+    )
+    costs = {}
+    children = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nesting is shown by two spaces of indentation per level; a module is
+        # listed after everything it imports
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        if depth == 1:
+            children[name.strip()] = int(cumulative) / 1e6
+        elif depth == 0:
+            costs[name.strip()] = (int(cumulative) / 1e6, children)
+            children = {}
+    return costs
+
+
+def first_render(template_dir):
+    """Time main() in a fresh process with the warm-up served from template_dir
+    
+    Returns (streamlit testing import, first script run, total) seconds and
+    the PDF modules loaded once the warm-up finished.
+    """
+    result = subprocess.run(
+        [sys.executable, '-c', FIRST_RENDER_SCRIPT.format(app=os.path.join(ROOT, 'app.py'), pdf_modules=PDF_MODULES)],
+        cwd=ROOT, env=child_env(template_dir), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "first render failed")
+    *seconds, loaded = result.stdout.split()[-4:]
+    return [float(value) for value in seconds], [] if loaded == '-' else loaded.split(',')
+
+
+def median_costs(runs):
+    names = set().union(*runs)
+    return {name: statistics.median(run.get(name, 0.0) for run in runs) for name in names}
+
+
+def run(repeat, top):
+    eager = [import_costs("import app")['app'] for _ in range(repeat)]
+    app_seconds = statistics.median(seconds for seconds, _ in eager)
+    dependencies = median_costs([children for _, children in eager])
+    lazy_runs = [import_costs("import app; " + "; ".join(f"import {module}" for module in LAZY_MODULES)) for _ in range(repeat)]
+    lazy = median_costs([{name: costs[name][0] for name in LAZY_MODULES if name in costs} for costs in lazy_runs])
+
+    print(f"import app: {app_seconds:.3f}s (median of {repeat})")
+    print(f"  {'module':<32} {'seconds':>8}")
+    for name, seconds in sorted(dependencies.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {name:<32} {seconds:>8.3f}")
+    print("Loaded on first use:")
+    for name in LAZY_MODULES:
+        print(f"  {name:<32} {lazy.get(name, 0.0):>8.3f}")
+
+    with tempfile.TemporaryDirectory() as template_dir:
+        write_stand_in_templates(template_dir)
+        renders = [first_render(template_dir) for _ in range(repeat)]
+    harness, script, total = (statistics.median(values) for values in zip(*(seconds for seconds, _ in renders)))
+    warmup_modules = sorted(set().union(*(loaded for _, loaded in renders)))
+    print(f"Time to first render: {total:.3f}s ({harness:.3f}s loading the test harness, {script:.3f}s running main())")
+    print(f"PDF modules loaded by the startup warm-up: {', '.join(warmup_modules) or 'none'}")
+
+    return {
+        'import_app': round(app_seconds, 4),
+        'first_render': round(script, 4),
+        'imports': {name: round(seconds, 4) for name, seconds in dependencies.items()},
+        'lazy_imports': {name: round(lazy.get(name, 0.0), 4) for name in LAZY_MODULES},
+        'warmup_pdf_modules': warmup_modules
+    }
+
+
+def compare(results, baselines, tolerance):
+    """Print the headline timings against their baselines and return the regressions found"""
+    regressions = []
+    print()
+    for key in ('import_app', 'first_render'):
+        ratio = results[key] / max(baselines[key], 1e-9)
+        slower = ratio > 1 + tolerance
+        if slower:
+            regressions.append(key)
+        print(f"{key:<14} {results[key]:>8.3f}s  baseline {baselines[key]:>8.3f}s  {ratio:>5.2f}x  {'slower' if slower else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="Fresh processes per measurement; the median is kept")
+    parser.add_argument('--top', type=int, default=15, help="Dependencies to list, costliest first")
+    parser.add_argument('--save', help="Write the results to this baseline file")
+    parser.add_argument('--compare', help="Compare the results with this baseline file")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = run(max(1, args.repeat), args.top)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'machine': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+                'results': results
+            }, f, indent=2)
+            f.write('\n')
+        print(f"\nSaved baselines to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baselines = json.load(f)['results']
+        regressions = compare(results, baselines, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} timing(s) regressed beyond {args.tolerance:.0%}")
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Benchmark the per-page cost of drawing Form 8949 pages over the IRS template
+
+The template is parsed once per (tax year, part) and reused, so the first
+page pays for parsing and every later page only for its own overlay. The
+per-page cost should therefore fall as the page count grows. Rendering with
+the template re-parsed for every page is timed alongside for comparison.
+
+Usage:
+    python benchmarks/bench_template_overlay.py [--pages 1 10 50 200] [--template f8949.pdf]
+
+Without --template a stand-in two-page form is generated, so the benchmark
+runs offline.
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+import app
+
+FORM_TYPE = "Part I - Short-term (Box B) - Basis NOT reported"
+TAX_YEAR = 2023
+
+
+def make_stand_in_template():
+    """Draw a dense two-page PDF shaped like Form 8949 (ruled table, Part I/Part II)"""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    for part in ("Part I", "Part II"):
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(50, 740, f"Form 8949 stand-in - {part}")
+        c.setFont("Helvetica", 6)
+        for i in range(45):
+            y = 80 + i * 14
+            c.line(50, y, 560, y)
+            # Roughly the operator count of the real form's instructions and field borders
+            for x in range(52, 560, 24):
+                c.rect(x, y + 1, 22, 11)
+                c.drawString(x + 1, y + 3, "Ipsum")
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def make_transactions(count):
+    """Build a table of simple transactions for rendering"""
+    sold = pd.Timestamp('2023-06-30')
+    return app.TransactionTable.from_records([{
+        'asset': 'BTC',
+        'description': 'BTC cryptocurrency',
+        'date_acquired': sold - pd.Timedelta(days=30 + i % 300),
+        'date_sold': sold,
+        'proceeds': 1000.0 + i,
+        'cost_basis': 900.0 + i / 2,
+        'gain_loss': 100.0 + i / 2,
+        'is_short_term': True,
+        'is_long_term': False,
+    } for i in range(count)])
+
+
+def reparsed_render_page(template_pdf, page_transactions, page_number, total_pages, totals):
+    """Render one page with a freshly parsed template, as every page used to"""
+    template = app.Form8949Template(template_pdf, 0)
+    buffer = io.BytesIO()
+    app.create_form_with_pdf_overlay(buffer, page_transactions, FORM_TYPE, "Jane Doe", "123-45-6789", TAX_YEAR, page_number, total_pages, totals, template)
+    return buffer.getvalue()
+
+
+def run(page_counts, template_pdf):
+    seed_dir = tempfile.mkdtemp()
+    with open(os.path.join(seed_dir, app.IRS_FORM_8949_URLS[TAX_YEAR].rsplit('/', 1)[-1]), 'wb') as f:
+        f.write(template_pdf)
+    store = app.FormTemplateStore(app.IRS_FORM_8949_URLS, seed_dir=seed_dir, offline=True)
+    app.get_official_form_8949 = store.get
+
+    print(f"{'pages':>7} {'parsed once ms/page':>20} {'re-parse ms/page':>18}")
+    for pages in page_counts:
+        transactions = make_transactions(pages * 14)
+        app.load_form_8949_template.clear()
+
+        start = time.perf_counter()
+        app.generate_form_8949_pdf(transactions, FORM_TYPE, "Jane Doe", "123-45-6789", TAX_YEAR)
+        reused = (time.perf_counter() - start) / pages
+
+        totals = app.FormTotals.from_transactions(transactions)
+        start = time.perf_counter()
+        for page_num in range(pages):
+            page_transactions = transactions[page_num * 14:(page_num + 1) * 14]
+            reparsed_render_page(template_pdf, page_transactions, page_num + 1, pages, totals)
+        legacy = (time.perf_counter() - start) / pages
+
+        print(f"{pages:>7} {reused * 1000:>20.2f} {legacy * 1000:>18.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 50, 200])
+    parser.add_argument('--template', help="Path to an IRS f8949 PDF (default: generated stand-in)")
+    args = parser.parse_args()
+
+    if args.template:
+        with open(args.template, 'rb') as f:
+            template_pdf = f.read()
+    else:
+        template_pdf = make_stand_in_template()
+
+    warnings.filterwarnings('ignore')
+    logging.disable(logging.WARNING)
+    run(args.pages, template_pdf)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Write synthetic Bitwave actions CSVs for benchmarking
+
+Rows are in time order across the chosen years. Acquisitions (buys and some
+income) open lots, and sells relieve a random earlier lot by its lotId, so
+holding periods mix short and long term. Money columns use the padded names
+and formatting of a real export: thousands separators, some "$" prefixes,
+parenthesized negatives and " -   " for zero. A small share of rows exercise
+the awkward cases: repeated lot IDs, sells with no lotId, zero-value sells,
+non-tax actions and unreadable amounts. Filler columns give the file a real
+export's width, with proceeds and costBasisRelieved in columns R and W.
+
+Usage:
+    python benchmarks/generate_actions.py --rows 1000000 --output actions.csv [--seed 0] [--years 2019 2024]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    'id', 'txnId', 'eventId', 'lineId', 'action', 'status', 'txnType', 'asset',
+    'assetId', 'assetUnitAdj', 'assetBalance', 'timestamp', 'wallet', 'walletId',
+    'lotId', 'lotAcquisitionTimestamp', ' costBasisAcquired ', ' proceeds ',
+    ' carryingValue ', ' impairmentExpense ', 'costBasisCurrency', ' shortTermGainLoss ',
+    ' costBasisRelieved ', ' longTermGainLoss ', ' undatedGainLoss ', 'metadata'
+]
+
+ASSETS = np.array(['BTC', 'ETH', 'SOL', 'ADA', 'USDC', 'MATIC', 'AVAX', 'DOT', 'LINK', 'ATOM'])
+WALLETS = np.array(['Coinbase Prime', 'Fireblocks Vault 1', 'Fireblocks Vault 2', 'Kraken', 'Ledger Treasury'])
+
+# Share of rows of each kind; the rest are sells
+ACQUISITION_SHARE = 0.42
+INCOME_SHARE = 0.04
+OTHER_SHARE = 0.03
+
+# Share of the awkward cases
+REPEATED_LOT_SHARE = 0.002
+MISSING_LOT_SHARE = 0.005
+ZERO_SELL_SHARE = 0.01
+UNREADABLE_AMOUNT_SHARE = 0.0002
+
+CHUNK_ROWS = 250_000
+
+
+def format_money(amounts, rng, unreadable_share=0.0):
+    """Format amounts the way Bitwave exports them"""
+    text = np.array([f"{value:,.2f}" for value in np.abs(amounts).tolist()], dtype=object)
+    dollar = rng.random(len(amounts)) < 0.3
+    text = np.where(dollar, "$" + text, text)
+    text = np.where(amounts < 0, "(" + text + ")", text)
+    text = np.where(np.abs(amounts) < 0.005, " -   ", " " + text + " ")
+    if unreadable_share:
+        text = np.where(rng.random(len(amounts)) < unreadable_share, " n/a ", text)
+    return text
+
+
+def format_timestamps(seconds):
+    return np.char.replace(np.datetime_as_string(seconds.astype('datetime64[s]'), unit='s'), 'T', ' ')
+
+
+class ActionGenerator:
+    """Generate consecutive chunks of one synthetic export, carrying lot state between them"""
+
+    def __init__(self, rows, seed=0, first_year=2019, last_year=2024):
+        self.rows = rows
+        self.rng = np.random.default_rng(seed)
+        start = np.datetime64(f'{first_year}-01-01', 's').astype(np.int64)
+        end = np.datetime64(f'{last_year + 1}-01-01', 's').astype(np.int64)
+        self._step = (end - start) / max(rows, 1)
+        self._start = start
+        self._row = 0
+        # Acquisition time and asset of every lot opened so far, by lot number
+        self._lot_times = np.zeros(0, dtype=np.int64)
+        self._lot_assets = np.zeros(0, dtype=np.int64)
+
+    def __iter__(self):
+        while self._row < self.rows:
+            yield self._chunk(min(CHUNK_ROWS, self.rows - self._row))
+
+    def _chunk(self, count):
+        rng = self.rng
+        positions = np.arange(self._row, self._row + count)
+        times = (self._start + positions * self._step + rng.random(count) * self._step).astype(np.int64)
+
+        kind = rng.random(count)
+        is_acquisition = kind < ACQUISITION_SHARE + INCOME_SHARE
+        is_other = (kind >= ACQUISITION_SHARE + INCOME_SHARE) & (kind < ACQUISITION_SHARE + INCOME_SHARE + OTHER_SHARE)
+        is_sell = ~is_acquisition & ~is_other
+        action = np.where(is_acquisition, np.where(kind < ACQUISITION_SHARE, 'buy', 'income'), 'sell').astype(object)
+        action[is_other] = rng.choice(['transfer', 'fee'], int(is_other.sum()))
+
+        # New lots are numbered in order; a few reuse an earlier lot's ID
+        first_lot = len(self._lot_times)
+        lot_numbers = first_lot + np.cumsum(is_acquisition) - 1
+        assets = rng.integers(0, len(ASSETS), count)
+        self._lot_times = np.concatenate([self._lot_times, times[is_acquisition]])
+        self._lot_assets = np.concatenate([self._lot_assets, assets[is_acquisition]])
+        lot_ids = np.full(count, '', dtype=object)
+        acquisition_lots = lot_numbers[is_acquisition]
+        repeated = (rng.random(len(acquisition_lots)) < REPEATED_LOT_SHARE) & (acquisition_lots > 0)
+        acquisition_lots[repeated] = (rng.random(int(repeated.sum())) * acquisition_lots[repeated]).astype(np.int64)
+        lot_ids[is_acquisition] = [f"lot-{number:09d}" for number in acquisition_lots.tolist()]
+
+        # Each sell relieves a random lot opened before it, in that lot's asset
+        opened = lot_numbers[is_sell] + 1
+        has_lot = opened > 0
+        sold_lots = (rng.random(int(is_sell.sum())) * np.maximum(opened, 1)).astype(np.int64)
+        sell_lot_ids = np.array([f"lot-{number:09d}" for number in sold_lots.tolist()], dtype=object)
+        sell_lot_ids[~has_lot | (rng.random(len(sold_lots)) < MISSING_LOT_SHARE)] = ''
+        lot_ids[is_sell] = sell_lot_ids
+        assets[is_sell] = np.where(has_lot, self._lot_assets[np.minimum(sold_lots, len(self._lot_assets) - 1)], assets[is_sell])
+        acquired_at = np.where(has_lot, self._lot_times[np.minimum(sold_lots, len(self._lot_times) - 1)], times[is_sell])
+
+        # Money: cost basis on acquisitions; proceeds, basis relieved and gain on sells
+        cost_acquired = np.where(is_acquisition, np.round(rng.lognormal(6, 1.5, count), 2), 0.0)
+        proceeds = np.zeros(count)
+        relieved = np.zeros(count)
+        sell_count = int(is_sell.sum())
+        relieved[is_sell] = np.round(rng.lognormal(6, 1.5, sell_count), 2)
+        proceeds[is_sell] = np.round(relieved[is_sell] * rng.lognormal(0.05, 0.4, sell_count), 2)
+        zero = is_sell & (rng.random(count) < ZERO_SELL_SHARE)
+        proceeds[zero] = 0.0
+        relieved[zero] = 0.0
+        gain = proceeds - relieved
+        long_term = np.zeros(count, dtype=bool)
+        long_term[is_sell] = times[is_sell] - acquired_at > 365 * 86400
+        short_term_gain = np.where(is_sell & ~long_term, gain, 0.0)
+        long_term_gain = np.where(is_sell & long_term, gain, 0.0)
+
+        zeros = np.zeros(count)
+        ids = positions + 1
+        wallets = rng.integers(0, len(WALLETS), count)
+        lot_acquired = np.full(count, '', dtype=object)
+        lot_acquired[is_sell] = np.where(has_lot, format_timestamps(acquired_at), '')
+        self._row += count
+
+        return pd.DataFrame({
+            'id': ids,
+            'txnId': [f"tx-{value:010x}" for value in (ids * 2654435761 % (1 << 40)).tolist()],
+            'eventId': ids // 3,
+            'lineId': ids % 4,
+            'action': action,
+            'status': 'complete',
+            'txnType': np.where(is_sell, 'trade', np.where(action == 'income', 'staking', 'trade')),
+            'asset': ASSETS[assets],
+            'assetId': assets + 1000,
+            'assetUnitAdj': np.round(rng.random(count) * 10, 8),
+            'assetBalance': np.round(rng.random(count) * 1000, 8),
+            'timestamp': format_timestamps(times),
+            'wallet': WALLETS[wallets],
+            'walletId': wallets + 1,
+            'lotId': lot_ids,
+            'lotAcquisitionTimestamp': lot_acquired,
+            ' costBasisAcquired ': format_money(cost_acquired, rng),
+            ' proceeds ': format_money(proceeds, rng, UNREADABLE_AMOUNT_SHARE),
+            ' carryingValue ': format_money(zeros, rng),
+            ' impairmentExpense ': format_money(zeros, rng),
+            'costBasisCurrency': 'USD',
+            ' shortTermGainLoss ': format_money(short_term_gain, rng),
+            ' costBasisRelieved ': format_money(relieved, rng, UNREADABLE_AMOUNT_SHARE),
+            ' longTermGainLoss ': format_money(long_term_gain, rng),
+            ' undatedGainLoss ': format_money(zeros, rng),
+            'metadata': ''
+        }, columns=COLUMNS)
+
+
+def write_actions_csv(path, rows, seed=0, first_year=2019, last_year=2024):
+    """Write a synthetic export of the given number of rows to path, a chunk at a time"""
+    with open(path, 'w', newline='') as f:
+        f.write(','.join(COLUMNS) + '\n')
+        for chunk in ActionGenerator(rows, seed, first_year, last_year):
+            chunk.replace({'': None}).to_csv(f, header=False, index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--years', type=int, nargs=2, default=[2019, 2024], metavar=('FIRST', 'LAST'))
+    args = parser.parse_args()
+
+    write_actions_csv(args.output, args.rows, args.seed, *args.years)
+    print(f"Wrote {args.rows:,} actions to {args.output} ({os.path.getsize(args.output) / (1024 * 1024):,.1f} MB)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""ZIP archives of Form 8949 page PDFs, loaded by the app on first use"""
+import tempfile
+import zipfile
+
+from pipeline_metrics import pipeline_stage
+
+# ZIP archives of page PDFs move from memory to a temporary file past this size
+ZIP_SPOOL_MAX_BYTES = 32 * 1024 * 1024
+
+
+def create_zip_file(pdf_files, max_memory=ZIP_SPOOL_MAX_BYTES):
+    """Create a ZIP file containing all PDFs
+    
+    pdf_files may be any iterable of {'filename', 'content'} dicts, such as
+    iter_form_8949_pdfs, so each page is added as it is rendered and dropped.
+    The archive is built in a temporary file that stays in memory up to
+    max_memory bytes and moves to disk beyond that. Returns the file,
+    rewound to the start; close it when done.
+    """
+    zip_buffer = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    try:
+        write_zip_file(pdf_files, zip_buffer)
+    except BaseException:
+        zip_buffer.close()
+        raise
+    zip_buffer.seek(0)
+    return zip_buffer
+
+
+def write_zip_file(files, output):
+    """Write {'filename', 'content'} dicts to a ZIP archive in the output file object
+    
+    PDFs are stored as they are: their page content is already Flate
+    compressed, so deflating them again costs CPU for little gain.
+    """
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for file in files:
+            compress_type = zipfile.ZIP_STORED if file['filename'].lower().endswith('.pdf') else zipfile.ZIP_DEFLATED
+            with pipeline_stage('zip'):
+                zip_file.writestr(file['filename'], file['content'], compress_type=compress_type)
@@ -0,0 +1,632 @@
+"""Form 8949 page drawing and PDF assembly (reportlab and PyPDF2)
+
+Loaded by the app on first use, so sessions that only view the summary or
+download the CSV never import the PDF libraries.
+"""
+import array
+import collections
+import io
+import threading
+from datetime import datetime
+
+import PyPDF2
+from PyPDF2.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, IndirectObject, NameObject, NullObject, StreamObject
+)
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from pipeline_metrics import pipeline_stage
+
+
+class Form8949Template:
+    """One page of the official IRS form, parsed once and reused for every output page
+    
+    The page is turned into a Form XObject that each output page draws
+    beneath its transaction overlay, so the IRS PDF is never re-parsed or
+    re-merged per page and a multi-page document stores it only once.
+    Fillable-field widgets are left out; the overlay replaces them. Any
+    other PDF page, such as a Form8949Layout's static layer, can be reused
+    the same way under its own xobject_name.
+    """
+    
+    XOBJECT_NAME = "/IRSForm8949"
+    
+    def __init__(self, template_pdf, page_index, xobject_name=XOBJECT_NAME):
+        self.xobject_name = xobject_name
+        reader = PyPDF2.PdfReader(io.BytesIO(template_pdf))
+        if page_index >= len(reader.pages):
+            page_index = 0  # Fallback to first page
+        page = reader.pages[page_index]
+        
+        contents = page.get('/Contents')
+        contents = contents.get_object() if contents is not None else None
+        if isinstance(contents, ArrayObject):
+            data = b"\n".join(part.get_object().get_data() for part in contents)
+        else:
+            data = contents.get_data() if contents is not None else b""
+        
+        xobject = DecodedStreamObject()
+        xobject.set_data(data)
+        # flate_encode keeps only /Filter, so the form dictionary goes on afterwards
+        self.xobject = xobject.flate_encode()
+        self.xobject.update({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/BBox'): page.mediabox,
+            NameObject('/Resources'): page.raw_get('/Resources') if '/Resources' in page else DictionaryObject()
+        })
+        # Documents on other threads may be copying the template's resources out of its reader
+        self.lock = threading.Lock()
+
+
+class Form8949Document:
+    """A multi-page Form 8949 PDF written to its output one page at a time
+    
+    Each page is added as rendered PDF bytes: a finished page, or an overlay
+    drawn over Form8949Template layers (the official form, a layout's static
+    layer), each written only once however many pages use it. A page's
+    objects are written as soon as it is added and then dropped, so only
+    each object's offset (8 bytes) is kept; finish() writes the page tree, the
+    cross-reference table and the trailer.
+    """
+    
+    HEADER = b"%PDF-1.3\n%\xe2\xe3\xcf\xd3\n"
+    
+    # Object numbers of the document catalog and the page tree, written last
+    CATALOG = 1
+    PAGES = 2
+    
+    def __init__(self, output):
+        self._output = output
+        self._position = 0
+        # Byte offset of each object by number; 0 is the free-list head
+        self._offsets = array.array('q', [0] * (self.PAGES + 1))
+        self._kids = array.array('q')
+        # Form8949Template -> object numbers of its XObject and of the stream drawing it
+        self._layers = {}
+        self.page_count = 0
+        self._write(self.HEADER)
+    
+    def add_page(self, content, layers=()):
+        """Write a one-page PDF, drawn over the given Form8949Template layers, first lowest"""
+        page = PyPDF2.PdfReader(io.BytesIO(content)).pages[0]
+        with pipeline_stage('merge_overlays'):
+            refs = [self._layer_refs(layer) for layer in layers]
+            page = self._layered_page(page, layers, refs)
+        with pipeline_stage('write_pdf'):
+            self._kids.append(self._write_objects(page))
+        self.page_count += 1
+    
+    def finish(self):
+        """Write the page tree, cross-reference table and trailer after the last page"""
+        with pipeline_stage('write_pdf'):
+            kids = b" ".join(b"%d 0 R" % number for number in self._kids)
+            self._write_object(self.PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, self.page_count))
+            self._write_object(self.CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % self.PAGES)
+            
+            xref = self._position
+            size = len(self._offsets)
+            self._write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+            for offset in self._offsets[1:]:
+                self._write(b"%010d 00000 n \n" % offset)
+            self._write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, self.CATALOG, xref))
+    
+    def _reference(self, number):
+        return IndirectObject(number, 0, self)
+    
+    def _layer_refs(self, layer):
+        # The layer and the stream that draws it are written the first time a page uses it
+        refs = self._layers.get(layer)
+        if refs is None:
+            draw = DecodedStreamObject()
+            draw.set_data(f"q {layer.xobject_name} Do Q\n".encode())
+            with layer.lock:
+                xobject_number = self._write_objects(layer.xobject)
+            refs = self._layers[layer] = (xobject_number, self._write_objects(draw))
+        return refs
+    
+    def _layered_page(self, page, layers, refs):
+        # A copy of the page under this document's page tree, drawing the layers before its own content
+        layered = DictionaryObject({
+            key: value for key, value in page.items()
+            if key not in ('/Parent', '/Resources', '/Contents')
+        })
+        layered[NameObject('/Parent')] = self._reference(self.PAGES)
+        
+        resources = DictionaryObject(page.get('/Resources', DictionaryObject()).get_object())
+        xobjects = DictionaryObject(resources.get('/XObject', DictionaryObject()).get_object())
+        for layer, (xobject_number, _) in zip(layers, refs):
+            xobjects[NameObject(layer.xobject_name)] = self._reference(xobject_number)
+        if xobjects:
+            resources[NameObject('/XObject')] = xobjects
+        layered[NameObject('/Resources')] = resources
+        
+        contents = ArrayObject([self._reference(draw_number) for _, draw_number in refs])
+        overlay_contents = page.get('/Contents')
+        if isinstance(overlay_contents, ArrayObject):
+            contents.extend(overlay_contents)
+        elif overlay_contents is not None:
+            contents.append(overlay_contents)
+        layered[NameObject('/Contents')] = contents
+        return layered
+    
+    def _write_objects(self, root):
+        """Write root and every object it refers to that is not yet in the document; returns root's number"""
+        root_number = self._reserve()
+        # Object numbers given to the source PDF's objects, by (number, generation)
+        numbers = {}
+        pending = collections.deque([(root_number, root)])
+        while pending:
+            number, obj = pending.popleft()
+            buffer = io.BytesIO()
+            self._serialize(obj, buffer, numbers, pending)
+            self._write_object(number, buffer.getvalue())
+        return root_number
+    
+    def _serialize(self, obj, stream, numbers, pending):
+        if isinstance(obj, IndirectObject):
+            if obj.pdf is self:
+                number = obj.idnum
+            else:
+                number = numbers.get((obj.idnum, obj.generation))
+                if number is None:
+                    number = numbers[obj.idnum, obj.generation] = self._reserve()
+                    target = obj.get_object()
+                    pending.append((number, NullObject() if target is None else target))
+            stream.write(b"%d 0 R" % number)
+        elif isinstance(obj, DictionaryObject):
+            is_stream = isinstance(obj, StreamObject)
+            stream.write(b"<<")
+            for key, value in obj.items():
+                if is_stream and key == '/Length':
+                    continue
+                stream.write(b"\n")
+                key.write_to_stream(stream, None)
+                stream.write(b" ")
+                self._serialize(value, stream, numbers, pending)
+            if is_stream:
+                stream.write(b"\n/Length %d" % len(obj._data))
+            stream.write(b"\n>>")
+            if is_stream:
+                stream.write(b"\nstream\n")
+                stream.write(obj._data)
+                stream.write(b"\nendstream")
+        elif isinstance(obj, ArrayObject):
+            stream.write(b"[")
+            for i, value in enumerate(obj):
+                if i:
+                    stream.write(b" ")
+                self._serialize(value, stream, numbers, pending)
+            stream.write(b"]")
+        else:
+            obj.write_to_stream(stream, None)
+    
+    def _reserve(self):
+        self._offsets.append(0)
+        return len(self._offsets) - 1
+    
+    def _write_object(self, number, data):
+        self._offsets[number] = self._position
+        self._write(b"%d 0 obj\n%s\nendobj\n" % (number, data))
+    
+    def _write(self, data):
+        self._output.write(data)
+        self._position += len(data)
+
+
+# Date columns (b) and (c) are written in this format, or as VARIOUS
+DATE_FORMAT = '%m/%d/%Y'
+
+# Every character a formatted amount such as "(1,234.56)" or a date can contain
+AMOUNT_CHARACTERS = "0123456789,.()-/"
+
+class TextMetrics:
+    """Text widths in one font and size, with dates and amounts measured from a per-character table"""
+    
+    def __init__(self, font_name, font_size):
+        self.font_name = font_name
+        self.font_size = font_size
+        self._widths = {char: stringWidth(char, font_name, 1000) for char in AMOUNT_CHARACTERS}
+        # In the standard fonts every digit is equally wide, so every date is too
+        self.date_width = self.width(datetime(2000, 1, 1).strftime(DATE_FORMAT))
+        self.various_width = stringWidth('VARIOUS', font_name, font_size)
+    
+    def width(self, text):
+        """Width of text in points, looked up for dates and amounts and measured otherwise"""
+        try:
+            return sum(map(self._widths.__getitem__, text)) * self.font_size / 1000
+        except KeyError:
+            return stringWidth(text, self.font_name, self.font_size)
+
+
+class Form8949Layout:
+    """One Form 8949 part's page layout for one taxpayer, built once and reused for every page
+    
+    Everything that is the same on each page (the taxpayer's name and SSN,
+    the checked box and, on the custom form, its headers and table rules) is
+    drawn once, as static_layer: a Form8949Template placed beneath every
+    page, and stored only once in a multi-page document. Column
+    positions, row baselines and the centred position of a date are worked
+    out here as well, so drawing a page only places its rows and totals.
+    Subclasses give the geometry (lay_out) and the static drawing.
+    """
+    
+    STATIC_XOBJECT_NAME = "/Form8949Static"
+    
+    # Max 14 transactions per page
+    ROWS = 14
+    
+    def __init__(self, form_type, taxpayer_name, taxpayer_ssn, tax_year):
+        self.form_type = form_type
+        self.taxpayer_name = taxpayer_name
+        self.taxpayer_ssn = taxpayer_ssn
+        self.tax_year = tax_year
+        self.row_metrics = TextMetrics("Helvetica", 7)
+        self.totals_metrics = TextMetrics("Helvetica-Bold", 7)
+        self.lay_out()
+        
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=letter, invariant=1)
+        self.draw_static(c)
+        c.save()
+        self.static_layer = Form8949Template(buffer.getvalue(), 0, self.STATIC_XOBJECT_NAME)
+    
+    def _set_columns(self, description_x, acquired_center, sold_center, proceeds_right, basis_right, gain_loss_right):
+        self.description_x = description_x
+        self.acquired_center = acquired_center
+        self.sold_center = sold_center
+        self.acquired_x = acquired_center - self.row_metrics.date_width / 2
+        self.sold_x = sold_center - self.row_metrics.date_width / 2
+        self.proceeds_right = proceeds_right
+        self.basis_right = basis_right
+        self.gain_loss_right = gain_loss_right
+    
+    def lay_out(self):
+        raise NotImplementedError
+    
+    def draw_static(self, c):
+        raise NotImplementedError
+    
+    def draw_page(self, page_transactions, page_number, total_pages, totals):
+        """Draw one page's rows and totals as a one-page PDF, to go over static_layer"""
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=letter, invariant=1)
+        page_transactions = page_transactions[:self.ROWS]
+        self.draw_rows(c, page_transactions)
+        self.draw_totals(c, page_transactions, page_number, total_pages, totals)
+        c.save()
+        return buffer.getvalue()
+    
+    def describe(self, description):
+        return description
+    
+    def draw_rows(self, c, page_transactions):
+        """Write every row's cells through one text object"""
+        metrics = self.row_metrics
+        text = c.beginText()
+        text.setFont(metrics.font_name, metrics.font_size)
+        for y, transaction in zip(self.row_ys, page_transactions):
+            text.setTextOrigin(self.description_x, y)
+            text.textOut(self.describe(transaction['description']))
+            
+            # Columns (b) and (c) - Dates: centered in their cells
+            if transaction['date_acquired']:
+                date_acquired = transaction['date_acquired'].strftime(DATE_FORMAT)
+                x = self.acquired_x if len(date_acquired) == 10 else self.acquired_center - metrics.width(date_acquired) / 2
+            else:
+                date_acquired = 'VARIOUS'
+                x = self.acquired_center - metrics.various_width / 2
+            text.setTextOrigin(x, y)
+            text.textOut(date_acquired)
+            date_sold = transaction['date_sold'].strftime(DATE_FORMAT)
+            text.setTextOrigin(self.sold_x if len(date_sold) == 10 else self.sold_center - metrics.width(date_sold) / 2, y)
+            text.textOut(date_sold)
+            
+            # Columns (d), (e) and (h) - Amounts: right-aligned; (f) and (g) are left blank
+            self._amount(text, metrics, self.proceeds_right, y, f"{transaction['proceeds']:,.2f}")
+            self._amount(text, metrics, self.basis_right, y, f"{transaction['cost_basis']:,.2f}")
+            self._amount(text, metrics, self.gain_loss_right, y, format_gain_loss(transaction['gain_loss']))
+        c.drawText(text)
+    
+    def draw_totals_row(self, c, y, row_totals, label=None):
+        metrics = self.totals_metrics
+        text = c.beginText()
+        text.setFont(metrics.font_name, metrics.font_size)
+        if label:
+            text.setTextOrigin(self.description_x, y)
+            text.textOut(label)
+        self._amount(text, metrics, self.proceeds_right, y, f"{row_totals['proceeds']:,.2f}")
+        self._amount(text, metrics, self.basis_right, y, f"{row_totals['cost_basis']:,.2f}")
+        self._amount(text, metrics, self.gain_loss_right, y, format_gain_loss(row_totals['gain_loss']))
+        c.drawText(text)
+    
+    @staticmethod
+    def _amount(text, metrics, right, y, value):
+        text.setTextOrigin(right - metrics.width(value), y)
+        text.textOut(value)
+
+
+class OfficialFormLayout(Form8949Layout):
+    """Rows and static fields positioned over the official IRS form"""
+    
+    def lay_out(self):
+        _, height = letter
+        
+        # PRECISE coordinates measured from actual IRS Form 8949
+        # These coordinates are carefully measured to fit within the table cells
+        if "Part I" in self.form_type:
+            self.checkbox_base_y = height - 208   # Short-term section
+            # Transaction table starts lower for Part I
+            table_start_y = height - 295
+        else:
+            self.checkbox_base_y = height - 393   # Long-term section
+            # Transaction table starts lower for Part II
+            table_start_y = height - 480
+        
+        # Row spacing - exactly matches IRS form line spacing
+        row_height = 16.8  # Measured spacing between form lines
+        self.row_ys = [table_start_y - i * row_height for i in range(self.ROWS)]
+        # Position totals in the official totals row
+        self.totals_y = table_start_y - self.ROWS * row_height - 5
+        
+        # Column positions - precisely measured to center within each cell:
+        # description left aligned, dates centered, amounts right aligned
+        self._set_columns(65, 208, 268, 340, 400, 555)
+    
+    def draw_static(self, c):
+        _, height = letter
+        
+        # Fill in taxpayer information
+        c.setFont("Helvetica", 9)
+        c.drawString(95, height - 133, self.taxpayer_name[:40])
+        c.drawString(415, height - 133, self.taxpayer_ssn)
+        
+        # Check appropriate checkbox
+        checkbox_x = 54
+        c.setFont("Helvetica", 11)
+        for boxes, offset in ((("Box A", "Box D"), 0), (("Box B", "Box E"), 17), (("Box C", "Box F"), 34)):
+            if any(box in self.form_type for box in boxes):
+                c.drawString(checkbox_x, self.checkbox_base_y - offset, "✓")
+                break
+    
+    def describe(self, description):
+        # Truncate description to fit within column width
+        if len(description) > 28:
+            description = description[:25] + "..."
+        return description
+    
+    def draw_totals(self, c, page_transactions, page_number, total_pages, totals):
+        # Line 2 totals only this page's transactions, so every page gets its subtotals
+        if len(page_transactions) > 0:
+            self.draw_totals_row(c, self.totals_y, totals.page(page_number))
+
+
+class CustomFormLayout(Form8949Layout):
+    """A self-drawn Form 8949 page, used when the official form is unavailable"""
+    
+    def lay_out(self):
+        width, height = letter
+        
+        # Page margins
+        self.left_margin = 50
+        self.right_margin = width - 50
+        self.top_margin = height - 50
+        
+        # Transaction table - precisely sized to match IRS form
+        self.table_y = self.top_margin - 50 - 40 - 40 - 80
+        
+        # Column definitions with exact measurements from IRS form
+        left_margin = self.left_margin
+        self.columns = [
+            {"header": "(a) Description of property", "x": left_margin + 5, "width": 110, "align": "left"},
+            {"header": "(b) Date acquired", "x": left_margin + 120, "width": 50, "align": "center"},
+            {"header": "(c) Date sold", "x": left_margin + 175, "width": 50, "align": "center"},
+            {"header": "(d) Proceeds", "x": left_margin + 230, "width": 60, "align": "right"},
+            {"header": "(e) Cost basis", "x": left_margin + 295, "width": 60, "align": "right"},
+            {"header": "(f) Code", "x": left_margin + 360, "width": 30, "align": "center"},
+            {"header": "(g) Adjustment", "x": left_margin + 395, "width": 50, "align": "right"},
+            {"header": "(h) Gain/(loss)", "x": left_margin + 450, "width": 65, "align": "right"}
+        ]
+        
+        row_height = 14
+        self.row_ys = [self.table_y - 18 - i * row_height for i in range(self.ROWS)]
+        self.totals_y = self.table_y - 18 - self.ROWS * row_height
+        
+        columns = self.columns
+        self._set_columns(
+            columns[0]["x"] + 3,
+            columns[1]["x"] + columns[1]["width"] / 2,
+            columns[2]["x"] + columns[2]["width"] / 2,
+            columns[3]["x"] + columns[3]["width"] - 3,
+            columns[4]["x"] + columns[4]["width"] - 3,
+            columns[7]["x"] + columns[7]["width"] - 3
+        )
+    
+    def draw_static(self, c):
+        left_margin, right_margin, top_margin = self.left_margin, self.right_margin, self.top_margin
+        
+        # Form header
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(left_margin, top_margin, "Form 8949")
+        c.setFont("Helvetica", 12)
+        c.drawString(left_margin + 100, top_margin, "Sales and Other Dispositions of Capital Assets")
+        c.drawRightString(right_margin, top_margin, f"{self.tax_year}")
+        
+        # Department line
+        c.setFont("Helvetica", 9)
+        c.drawString(left_margin + 100, top_margin - 15, "Department of the Treasury - Internal Revenue Service")
+        
+        # Taxpayer information section
+        info_y = top_margin - 50
+        c.setFont("Helvetica", 10)
+        c.drawString(left_margin, info_y, "Name(s) shown on return:")
+        c.drawString(left_margin + 150, info_y, self.taxpayer_name)
+        c.drawString(left_margin + 350, info_y, "Your social security number:")
+        c.drawString(left_margin + 520, info_y, self.taxpayer_ssn)
+        
+        # Part section
+        part_y = info_y - 40
+        c.setFont("Helvetica-Bold", 11)
+        if "Part I" in self.form_type:
+            c.drawString(left_margin, part_y, "Part I - Short-Term Capital Gains and Losses")
+            c.setFont("Helvetica", 9)
+            c.drawString(left_margin, part_y - 12, "Generally for assets held one year or less")
+            options = [
+                ("(A) Short-term transactions reported on Form(s) 1099-B showing basis was reported to the IRS", "A"),
+                ("(B) Short-term transactions reported on Form(s) 1099-B showing basis was NOT reported to the IRS", "B"),
+                ("(C) Short-term transactions not reported to you on Form 1099-B", "C")
+            ]
+        else:
+            c.drawString(left_margin, part_y, "Part II - Long-Term Capital Gains and Losses")
+            c.setFont("Helvetica", 9)
+            c.drawString(left_margin, part_y - 12, "Generally for assets held more than one year")
+            options = [
+                ("(D) Long-term transactions reported on Form(s) 1099-B showing basis was reported to the IRS", "D"),
+                ("(E) Long-term transactions reported on Form(s) 1099-B showing basis was NOT reported to the IRS", "E"),
+                ("(F) Long-term transactions not reported to you on Form 1099-B", "F")
+            ]
+        
+        # Checkbox section, with the appropriate box checked
+        checkbox_y = part_y - 40
+        c.setFont("Helvetica", 9)
+        for i, (text, code) in enumerate(options):
+            checkbox = "☑" if f"Box {code}" in self.form_type else "☐"
+            c.drawString(left_margin, checkbox_y - (i * 15), f"{checkbox} {text}")
+        
+        # Column headers
+        table_y = self.table_y
+        c.setFont("Helvetica-Bold", 8)
+        for col in self.columns:
+            if col["align"] == "center":
+                c.drawCentredString(col["x"] + col["width"] / 2, table_y, col["header"])
+            elif col["align"] == "right":
+                c.drawRightString(col["x"] + col["width"] - 5, table_y, col["header"])
+            else:
+                c.drawString(col["x"] + 3, table_y, col["header"])
+        
+        # Table borders
+        table_top = table_y + 12
+        table_bottom = table_y - (15 * 16)  # Space for 14 transactions + totals
+        c.line(left_margin, table_top, right_margin, table_top)
+        c.line(left_margin, table_y - 3, right_margin, table_y - 3)  # Under headers
+        c.line(left_margin, table_bottom, right_margin, table_bottom)
+        
+        x_pos = left_margin
+        c.line(x_pos, table_top, x_pos, table_bottom)
+        for col in self.columns:
+            x_pos += col["width"]
+            c.line(x_pos, table_top, x_pos, table_bottom)
+        
+        # Bold line above totals
+        c.setLineWidth(2)
+        c.line(left_margin, self.totals_y + 8, right_margin, self.totals_y + 8)
+    
+    def describe(self, description):
+        return description[:26]  # Ensure it fits
+    
+    def draw_rows(self, c, page_transactions):
+        super().draw_rows(c, page_transactions)
+        
+        # Light separator under each row
+        c.setStrokeColor(colors.lightgrey)
+        c.lines([(self.left_margin + 1, y - 6, self.right_margin - 1, y - 6) for y in self.row_ys[:len(page_transactions)]])
+        c.setStrokeColor(colors.black)
+    
+    def draw_totals(self, c, page_transactions, page_number, total_pages, totals):
+        # Page totals row, plus totals for every page on the last page
+        totals_rows = [("PAGE TOTALS" if total_pages > 1 else "TOTALS", totals.page(page_number))]
+        if page_number == total_pages and total_pages > 1:
+            totals_rows.append(("TOTALS (ALL PAGES)", totals.totals()))
+        for i, (label, row_totals) in enumerate(totals_rows):
+            self.draw_totals_row(c, self.totals_y - (i * 12), row_totals, label)
+        
+        # Page footer
+        c.setFont("Helvetica", 8)
+        footer_text = f"Form 8949 ({self.tax_year})"
+        if total_pages > 1:
+            footer_text += f" - Page {page_number} of {total_pages}"
+        c.drawString(self.left_margin, 25, footer_text)
+        c.drawRightString(self.right_margin, 25, f"Generated by Bitwave - {datetime.now().strftime('%m/%d/%Y')}")
+
+
+class Form8949Layouts:
+    """The official and custom layouts of one form part for one taxpayer, each built on first use
+    
+    Made once per document (or per run of pages in a worker) and passed to
+    every page, so a layout, which holds the taxpayer's name and SSN, is
+    kept no longer than the document it draws.
+    """
+    
+    def __init__(self, form_type, taxpayer_name, taxpayer_ssn, tax_year):
+        self.form_type = form_type
+        self.taxpayer_name = taxpayer_name
+        self.taxpayer_ssn = taxpayer_ssn
+        self.tax_year = tax_year
+        self._layouts = {}
+    
+    def get(self, official=True):
+        layout = self._layouts.get(official)
+        if layout is None:
+            layout_class = OfficialFormLayout if official else CustomFormLayout
+            layout = self._layouts[official] = layout_class(self.form_type, self.taxpayer_name, self.taxpayer_ssn, self.tax_year)
+        return layout
+
+
+def get_form_8949_layout(form_type, taxpayer_name, taxpayer_ssn, tax_year, official=True, layouts=None):
+    """The layout for one form part, box and taxpayer, from layouts if given or else built for this call"""
+    if layouts is None:
+        layouts = Form8949Layouts(form_type, taxpayer_name, taxpayer_ssn, tax_year)
+    return layouts.get(official)
+
+
+def format_gain_loss(gain_loss):
+    """Format column (h), with parentheses for losses"""
+    if gain_loss < 0:
+        return f"({abs(gain_loss):,.2f})"
+    return f"{gain_loss:,.2f}"
+
+
+def create_form_with_pdf_overlay(buffer, page_transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, page_number, total_pages, totals, template, layouts=None):
+    """Overlay transaction data onto official IRS Form 8949 PDF with precise positioning"""
+    
+    try:
+        layout = get_form_8949_layout(form_type, taxpayer_name, taxpayer_ssn, tax_year, layouts=layouts)
+        overlay_pdf = layout.draw_page(page_transactions, page_number, total_pages, totals)
+        
+        # Write the overlay over the template and static fields to the output buffer
+        document = Form8949Document(buffer)
+        document.add_page(overlay_pdf, [template, layout.static_layer])
+        document.finish()
+        
+        return True
+        
+    except Exception as e:
+        print(f"Error in PDF overlay: {e}")
+        return False
+
+
+def draw_form_8949_overlay(page_transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, page_number, total_pages, totals, official=True, layouts=None):
+    """Draw one page's rows and totals, returning the overlay PDF
+    
+    The overlay goes over the official template (official) and the layout's
+    static layer, as given by form_8949_layers.
+    """
+    layout = get_form_8949_layout(form_type, taxpayer_name, taxpayer_ssn, tax_year, official, layouts)
+    return layout.draw_page(page_transactions, page_number, total_pages, totals)
+
+
+def form_8949_layers(form_type, taxpayer_name, taxpayer_ssn, tax_year, template=None, layouts=None):
+    """The layers an overlay from draw_form_8949_overlay is drawn over: the template, if any, then the static fields"""
+    layout = get_form_8949_layout(form_type, taxpayer_name, taxpayer_ssn, tax_year, template is not None, layouts)
+    return [template, layout.static_layer] if template is not None else [layout.static_layer]
+
+
+def create_form_8949_page_custom(buffer, page_transactions, form_type, taxpayer_name, taxpayer_ssn, tax_year, page_number, total_pages, totals, layouts=None):
+    """Create a custom Form 8949 PDF page with precise table formatting"""
+    layout = get_form_8949_layout(form_type, taxpayer_name, taxpayer_ssn, tax_year, False, layouts)
+    document = Form8949Document(buffer)
+    document.add_page(layout.draw_page(page_transactions, page_number, total_pages, totals), [layout.static_layer])
+    document.finish()
@@ -0,0 +1,212 @@
+"""Official IRS Form 8949 templates: disk cache, seed directory and download
+
+Loaded by the app on first use, so sessions that never build a PDF don't
+pay for importing requests.
+"""
+import hashlib
+import os
+import stat
+import threading
+import time
+
+import requests
+
+from pipeline_metrics import count_event
+
+# After a failed download, wait this long before trying the network again
+TEMPLATE_RETRY_SECONDS = 300
+
+# The IRS replaces current-revision forms (e.g. f8949.pdf) in place, so copies of
+# them older than this are fetched again; prior-year files (f8949--2023.pdf) never change
+TEMPLATE_CURRENT_MAX_AGE_SECONDS = 30 * 24 * 3600
+
+
+def default_cache_dir():
+    """The per-user template cache directory: $XDG_CACHE_HOME/form8949_templates, or under ~/.cache"""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'form8949_templates')
+
+
+class FormTemplateStore:
+    """Fetch-once store for the official IRS Form 8949 templates
+    
+    Templates are looked up in the in-process copy, then the seed directory
+    (pre-downloaded PDFs named like the IRS files, e.g. f8949--2023.pdf), then
+    the disk cache, and only then downloaded. Downloads are written to the disk
+    cache with a .sha256 checksum that is verified on every later read. The
+    cache directory is created readable by this user only, and one that
+    other users could write to is not used. Copies of current-revision forms
+    (names without a "--<year>" revision) older than max_age seconds are
+    fetched again, falling back to the old copy while that fails. With
+    offline set, the network is never used.
+    """
+    
+    def __init__(self, urls, cache_dir=None, seed_dir=None, offline=False, timeout=15, max_age=TEMPLATE_CURRENT_MAX_AGE_SECONDS):
+        self.cache_dir = cache_dir
+        self.seed_dir = seed_dir
+        self.urls = dict(urls)
+        self.offline = offline
+        self.timeout = timeout
+        self.max_age = max_age
+        # Template name -> (content, time.monotonic() after which it is fetched again, or None)
+        self._templates = {}
+        self._failed_at = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+    
+    def get(self, tax_year):
+        """Return the template PDF bytes for tax_year, or None if unavailable"""
+        # Default to latest if year not found, and fall back to it if the year's form fails
+        default_url = self.urls[max(self.urls)]
+        url = self.urls.get(tax_year, default_url)
+        
+        content = self._get_url(url)
+        if content is None and url != default_url:
+            content = self._get_url(default_url)
+        return content
+    
+    def _get_url(self, url):
+        name = url.rsplit('/', 1)[-1]
+        content = self._fresh(name)
+        if content is not None:
+            count_event('template_memory_hits')
+            return content
+        
+        # One lock per template, so concurrent pages share a single fetch
+        with self._lock:
+            name_lock = self._locks.setdefault(name, threading.Lock())
+        with name_lock:
+            content = self._fresh(name)
+            if content is not None:
+                return content
+            
+            max_age = self._max_age(name)
+            content, age = self._read_seed(name), None
+            if content is None:
+                content, age = self._read_cache(name)
+            stale = None
+            if content is not None and age is not None and max_age is not None and age > max_age:
+                stale, content = content, None
+            
+            if content is not None:
+                count_event('template_disk_hits')
+            else:
+                stale = stale or self._templates.get(name, (None, None))[0]
+                if self._may_download(name):
+                    count_event('template_downloads')
+                    content, age = self._download(url, name), 0
+            
+            if content is None and stale is not None:
+                # An out-of-date current form beats none; try again after the retry delay
+                count_event('template_stale_hits')
+                self._templates[name] = (stale, time.monotonic() + TEMPLATE_RETRY_SECONDS)
+                return stale
+            if content is not None:
+                expires_at = None if age is None or max_age is None else time.monotonic() + max_age - age
+                self._templates[name] = (content, expires_at)
+            return content
+    
+    def _fresh(self, name):
+        # The in-process copy, unless it is due to be fetched again
+        content, expires_at = self._templates.get(name, (None, None))
+        if expires_at is not None and time.monotonic() > expires_at:
+            return None
+        return content
+    
+    def _max_age(self, name):
+        return None if '--' in name else self.max_age
+    
+    def _read_seed(self, name):
+        # Seeded templates are the deployment's own and never expire
+        if not self.seed_dir:
+            return None
+        return _read_verified_pdf(os.path.join(self.seed_dir, name), require_checksum=False)
+    
+    def _read_cache(self, name):
+        """A verified cached copy of the template and its age in seconds, or (None, None)"""
+        if not self.cache_dir or not self._cache_dir_is_private():
+            return None, None
+        path = os.path.join(self.cache_dir, name)
+        content = _read_verified_pdf(path, require_checksum=True)
+        if content is None:
+            return None, None
+        try:
+            return content, max(0.0, time.time() - os.path.getmtime(path))
+        except OSError:
+            return None, None
+    
+    def _cache_dir_is_private(self):
+        """Whether no other user can write to the cache directory, so its files can be trusted"""
+        try:
+            info = os.stat(self.cache_dir)
+        except FileNotFoundError:
+            return True
+        except OSError:
+            return False
+        
+        if (hasattr(os, 'getuid') and info.st_uid != os.getuid()) or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            print(f"Not using template cache {self.cache_dir}: other users can write to it")
+            return False
+        return True
+    
+    def _may_download(self, name):
+        # Don't make every page of a filing wait out the timeout after a failure
+        if self.offline:
+            return False
+        failed_at = self._failed_at.get(name)
+        return failed_at is None or time.monotonic() - failed_at > TEMPLATE_RETRY_SECONDS
+    
+    def _download(self, url, name):
+        try:
+            response = requests.get(url, timeout=self.timeout)
+            if response.status_code == 200 and response.content.startswith(b'%PDF'):
+                self._write_cache(name, response.content)
+                self._failed_at.pop(name, None)
+                return response.content
+            print(f"Error fetching official form: {url} returned status {response.status_code}")
+        except Exception as e:
+            print(f"Error fetching official form: {e}")
+        
+        self._failed_at[name] = time.monotonic()
+        return None
+    
+    def _write_cache(self, name, content):
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            if not self._cache_dir_is_private():
+                return
+            path = os.path.join(self.cache_dir, name)
+            # Write both files atomically so concurrent processes never see a partial template
+            for target, data in ((path + '.sha256', hashlib.sha256(content).hexdigest().encode()), (path, content)):
+                temp_path = f"{target}.{os.getpid()}.tmp"
+                with open(temp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, target)
+        except OSError as e:
+            print(f"Error caching official form: {e}")
+
+
+def _read_verified_pdf(path, require_checksum):
+    """Read a template PDF from disk if it exists and passes its checksum"""
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+    except OSError:
+        return None
+    
+    try:
+        with open(path + '.sha256') as f:
+            expected = f.read().split()[0].lower()
+    except (OSError, IndexError):
+        expected = None
+    
+    if expected is None and require_checksum:
+        return None
+    if expected is not None and hashlib.sha256(content).hexdigest() != expected:
+        print(f"Ignoring official form with bad checksum: {path}")
+        return None
+    if not content.startswith(b'%PDF'):
+        return None
+    return content
@@ -0,0 +1,33 @@
+"""Process-pool entry points for rendering Form 8949 pages in parallel
+
+Workers receive the official template bytes once, when the pool starts, and
+then only the page runs they render. Each worker parses the template at most
+once per form part, and builds the taxpayer's page layout once per run.
+"""
+
+_template_pdf = None
+_templates = {}
+
+
+def init_worker(template_pdf):
+    """Pool initializer: keep the template PDF bytes for this worker"""
+    global _template_pdf
+    _template_pdf = template_pdf
+    _templates.clear()
+
+
+def render_page_range(pages, form_type, taxpayer_name, taxpayer_ssn, tax_year, total_pages, totals, page_index, overlays_only=False):
+    """Render a run of (page_number, page_transactions) pairs in this worker"""
+    import app
+    import form8949_pdf
+
+    template = None
+    if _template_pdf:
+        try:
+            if page_index not in _templates:
+                _templates[page_index] = form8949_pdf.Form8949Template(_template_pdf, page_index)
+            template = _templates[page_index]
+        except Exception as e:
+            print(f"Error creating form with official template: {e}")
+
+    return app.render_form_8949_page_range(pages, form_type, taxpayer_name, taxpayer_ssn, tax_year, total_pages, totals, template, overlays_only)
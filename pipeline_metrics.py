@@ -0,0 +1,170 @@
+"""Timing spans, peak memory and counters for one conversion run
+
+Shared by the app, its lazily loaded PDF, template and archive modules and
+the batch converter, so every stage records into the same current run.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Each conversion's PipelineRun record is appended to this JSON lines file when set
+PIPELINE_RUN_LOG = os.environ.get('FORM8949_RUN_LOG')
+MEMORY_SAMPLE_SECONDS = 0.01
+
+
+class PipelineRun:
+    """Timing spans, peak memory and counters for one conversion
+    
+    Entering a run makes it the current one; pipeline_stage() spans and
+    count_event() counters then record into it, and do nothing outside a
+    run. A stage that runs more than once (e.g. per page) is aggregated:
+    its seconds include any stages nested in it and self_seconds exclude
+    them. Peak memory is the growth of the process's resident set over a
+    stage's start, sampled in the background while the run is open.
+    """
+    
+    def __init__(self, **context):
+        self.run_id = uuid.uuid4().hex
+        self.context = context
+        self.started_at = None
+        self.seconds = None
+        self.error = None
+        self.stages = {}
+        self.counters = Counter()
+        self._open = []
+        self._lock = threading.Lock()
+    
+    def __enter__(self):
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self._start = time.perf_counter()
+        self._start_rss = self._peak_rss = resident_mb()
+        self._token = _current_run.set(self)
+        self._done = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._done.set()
+        self._sampler.join()
+        _current_run.reset(self._token)
+        self.seconds = time.perf_counter() - self._start
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        return False
+    
+    def _sample(self):
+        while not self._done.wait(MEMORY_SAMPLE_SECONDS):
+            self._observe_memory()
+    
+    def _observe_memory(self):
+        current = resident_mb()
+        if current is None:
+            return
+        with self._lock:
+            self._peak_rss = max(self._peak_rss, current)
+            for span in self._open:
+                span['peak_rss'] = max(span['peak_rss'], current)
+    
+    @contextmanager
+    def stage(self, name):
+        rss = resident_mb()
+        span = {'rss': rss, 'peak_rss': rss, 'child_seconds': 0.0}
+        with self._lock:
+            self._open.append(span)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._observe_memory()
+            with self._lock:
+                # By identity: nested spans can hold equal values
+                self._open = [open_span for open_span in self._open if open_span is not span]
+                # The innermost span still open is this one's parent
+                if self._open:
+                    self._open[-1]['child_seconds'] += elapsed
+                stats = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'self_seconds': 0.0, 'peak_mb': None})
+                stats['calls'] += 1
+                stats['seconds'] += elapsed
+                stats['self_seconds'] += elapsed - span['child_seconds']
+                if rss is not None:
+                    stats['peak_mb'] = max(stats['peak_mb'] or 0.0, span['peak_rss'] - rss)
+    
+    def count(self, name, n=1):
+        self.counters[name] += n
+    
+    def record(self):
+        """The run as a JSON-ready dict: context, per-stage timings and memory, counters"""
+        peak_mb = None
+        if self._start_rss is not None:
+            peak_mb = round(self._peak_rss - self._start_rss, 1)
+        return {
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'seconds': round(self.seconds, 4) if self.seconds is not None else None,
+            'peak_mb': peak_mb,
+            'context': self.context,
+            'stages': [
+                {
+                    'stage': name,
+                    'calls': stats['calls'],
+                    'seconds': round(stats['seconds'], 4),
+                    'self_seconds': round(stats['self_seconds'], 4),
+                    'peak_mb': round(stats['peak_mb'], 1) if stats['peak_mb'] is not None else None
+                }
+                for name, stats in self.stages.items()
+            ],
+            'counters': dict(self.counters),
+            'error': self.error
+        }
+
+
+_current_run = contextvars.ContextVar('form8949_pipeline_run', default=None)
+
+
+@contextmanager
+def pipeline_stage(name):
+    """Time a stage of the current PipelineRun, if there is one"""
+    run = _current_run.get()
+    if run is None:
+        yield
+        return
+    with run.stage(name):
+        yield
+
+
+def count_event(name, n=1):
+    """Add to a counter of the current PipelineRun, if there is one"""
+    run = _current_run.get()
+    if run is not None:
+        run.count(name, n)
+
+
+def log_pipeline_run(run):
+    """Emit a finished run's record as one JSON line, to the run log file if configured"""
+    line = json.dumps(run.record(), default=str)
+    logging.getLogger('form8949.runs').info(line)
+    if PIPELINE_RUN_LOG:
+        try:
+            with open(PIPELINE_RUN_LOG, 'a') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            print(f"Error writing run log: {e}")
+    return line
+
+
+def resident_mb():
+    """Resident memory of this process in MB, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
@@ -0,0 +1,70 @@
+"""Bitwave money parsing: app.parse_currency_column and app.clean_currency_value
+
+Run from the repository root with: python -m pytest tests
+"""
+import pandas as pd
+import pytest
+
+import app
+
+# (cell, amount, whether the cell is flagged as unreadable)
+CELLS = [
+    (' 1,234.56 ', 1234.56, False),
+    (' $1,234.56 ', 1234.56, False),
+    (' $ 12 ', 12.0, False),
+    ('(1,234.56)', -1234.56, False),
+    (' $(12.00) ', -12.0, False),
+    (' (0.50) ', -0.5, False),
+    ('-7.25', -7.25, False),
+    (' -   ', 0.0, False),
+    ('-', 0.0, False),
+    ('', 0.0, False),
+    ('   ', 0.0, False),
+    (None, 0.0, False),
+    (' n/a ', 0.0, True),
+    ('(5', 0.0, True),
+    ('1_000', 0.0, True),
+    ('nan', 0.0, True),
+    ('inf', 0.0, True),
+    ('12.3.4', 0.0, True)
+]
+
+
+@pytest.fixture(params=['cell_by_cell', 'vectorized'])
+def parse_path(request, monkeypatch):
+    """Run a test with short columns parsed cell by cell and then with Arrow kernels"""
+    monkeypatch.setattr(app, 'CURRENCY_COLUMN_MIN_VECTOR_ROWS', 10 ** 9 if request.param == 'cell_by_cell' else 0)
+    return request.param
+
+
+def test_parse_currency_column(parse_path):
+    values = pd.Series([cell for cell, _, _ in CELLS], index=range(10, 10 + len(CELLS)), dtype=object)
+    amounts, failed = app.parse_currency_column(values)
+
+    assert amounts.tolist() == [amount for _, amount, _ in CELLS]
+    assert failed.tolist() == [flagged for _, _, flagged in CELLS]
+    assert amounts.dtype == float and failed.dtype == bool
+    assert amounts.index.equals(values.index) and failed.index.equals(values.index)
+
+
+def test_parse_currency_column_of_numbers(parse_path):
+    amounts, failed = app.parse_currency_column(pd.Series([1.5, None, -2.0]))
+
+    assert amounts.tolist() == [1.5, 0.0, -2.0]
+    assert not failed.any()
+
+
+def test_unreadable_cells_are_reported(parse_path):
+    df = pd.DataFrame({' proceeds ': [' 10.00 ', ' n/a ', ' -   ', 'twelve']})
+    issues = []
+
+    assert app.bitwave_money_column(df, ' proceeds ', issues).tolist() == [10.0, 0.0, 0.0, 0.0]
+    assert issues == [
+        {'row': 1, 'column': 'proceeds', 'value': ' n/a '},
+        {'row': 3, 'column': 'proceeds', 'value': 'twelve'}
+    ]
+
+
+@pytest.mark.parametrize('cell, amount, flagged', CELLS)
+def test_clean_currency_value_zeroes_unreadable_cells(cell, amount, flagged):
+    assert app.clean_currency_value(cell) == amount
@@ -0,0 +1,197 @@
+"""Bitwave extraction: lot matching and the in-memory, chunked and store paths agree
+
+Run from the repository root with: python -m pytest tests
+"""
+import io
+import operator
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+import app
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+from generate_actions import ActionGenerator
+
+BITWAVE_HEADER = ['action', 'asset', 'timestamp', 'lotId', ' proceeds ', ' costBasisRelieved ', ' shortTermGainLoss ', ' longTermGainLoss ']
+
+# A buy stamped in UTC and its sale stamped with no zone, then a sale at
+# 23:30 New York time, which is already the next day (and year) in UTC
+MIXED_ZONE_ROWS = [
+    ['buy', 'BTC', '2023-01-05T00:00:00Z', 'L1', ' -   ', ' -   ', ' -   ', ' -   '],
+    ['sell', 'BTC', '12/31/2023', 'L1', ' 100.00 ', ' 40.00 ', ' 60.00 ', ' -   '],
+    ['buy', 'ETH', '2022-06-01T09:00:00Z', 'L2', ' -   ', ' -   ', ' -   ', ' -   '],
+    ['sell', 'ETH', '2023-12-31T23:30:00-05:00', 'L2', ' 300.00 ', ' 100.00 ', ' 200.00 ', ' -   ']
+]
+
+
+def bitwave_csv(rows):
+    """A Bitwave actions export with these rows, as CSV text"""
+    return pd.DataFrame(rows, columns=BITWAVE_HEADER).to_csv(index=False)
+
+
+def reference_bitwave_transactions(df, target_year):
+    """The original row-by-row extraction, with the changes made on purpose since
+    
+    Income opens lots like buys do, and every timestamp is read as naive UTC.
+    """
+    lot_map = {}
+    for _, row in df[df['action'].isin(app.BITWAVE_ACQUISITION_ACTIONS)].iterrows():
+        buy_date = pd.to_datetime(row['timestamp'], errors='coerce', utc=True)
+        if pd.notna(row['lotId']) and pd.notna(buy_date):
+            lot_map[row['lotId']] = buy_date.tz_convert(None)
+    
+    transactions = []
+    for _, row in df[df['action'] == 'sell'].iterrows():
+        try:
+            sell_date = pd.to_datetime(row['timestamp'], utc=True).tz_convert(None)
+            if sell_date.year != target_year:
+                continue
+            buy_date = lot_map.get(row['lotId'])
+            
+            proceeds = app.clean_currency_value(row.get(' proceeds ', 0))
+            cost_basis = app.clean_currency_value(row.get(' costBasisRelieved ', 0))
+            if proceeds <= 0 and cost_basis <= 0:
+                continue
+            short_term_gl = app.clean_currency_value(row.get(' shortTermGainLoss ', 0))
+            long_term_gl = app.clean_currency_value(row.get(' longTermGainLoss ', 0))
+            
+            is_short_term = abs(short_term_gl) > 0.01
+            is_long_term = abs(long_term_gl) > 0.01
+            if buy_date is not None:
+                is_short_term = (sell_date - buy_date).days <= 365
+                is_long_term = not is_short_term
+            
+            transactions.append({
+                'asset': row['asset'],
+                'description': f"{row['asset']} cryptocurrency",
+                'date_acquired': buy_date if buy_date is not None else sell_date,
+                'date_sold': sell_date,
+                'proceeds': proceeds,
+                'cost_basis': cost_basis,
+                'gain_loss': proceeds - cost_basis,
+                'reported_gain_loss': short_term_gl + long_term_gl,
+                'short_term_gain_loss': short_term_gl,
+                'long_term_gain_loss': long_term_gl,
+                'is_short_term': is_short_term,
+                'is_long_term': is_long_term,
+                'lot_id': row['lotId']
+            })
+        except Exception:
+            continue
+    
+    return transactions
+
+
+def generated_export(rows=1200, seed=7):
+    """A small synthetic export, as CSV text, with every awkward case present
+    
+    On top of the generator's own mix, some acquisitions are stamped in UTC
+    and some sells in New York time (the same instants), two lots are
+    acquired twice and a few amounts are unreadable.
+    """
+    df = next(iter(ActionGenerator(rows, seed=seed)))
+    acquisitions = df.index[df['action'].isin(app.BITWAVE_ACQUISITION_ACTIONS)]
+    sells = df.index[(df['action'] == 'sell') & (df['lotId'] != '')]
+    
+    utc = acquisitions[::7]
+    df.loc[utc, 'timestamp'] = [pd.Timestamp(value).strftime('%Y-%m-%dT%H:%M:%SZ') for value in df.loc[utc, 'timestamp']]
+    new_york = sells[::11]
+    df.loc[new_york, 'timestamp'] = [
+        pd.Timestamp(value, tz='UTC').tz_convert('America/New_York').isoformat()
+        for value in df.loc[new_york, 'timestamp']
+    ]
+    
+    df.loc[acquisitions[[-1, -2]], 'lotId'] = df.loc[acquisitions[[10, 20]], 'lotId'].to_numpy()
+    df.loc[sells[5::97], ' proceeds '] = ' n/a '
+    df.loc[sells[8::89], ' costBasisRelieved '] = ' n/a '
+    return df.replace({'': None}).to_csv(index=False)
+
+
+def comparable(sales):
+    """Sale dicts with a missing lot ID as None, so NaN compares equal"""
+    return [
+        {**sale, 'lot_id': None if pd.isna(sale['lot_id']) else sale['lot_id']}
+        for sale in sales
+    ]
+
+
+def records(transactions):
+    """(asset, date acquired, date sold, proceeds) of each sale, for comparing paths"""
+    return [
+        (row['asset'], row['date_acquired'], row['date_sold'], row['proceeds'])
+        for row in transactions
+    ]
+
+
+def test_mixed_zone_stamps_compare_in_naive_utc():
+    # Only zone-aware acquisitions and only naive sells
+    transactions = app.extract_bitwave_transactions(pd.read_csv(io.StringIO(bitwave_csv(MIXED_ZONE_ROWS[:2]))), 2023)
+
+    assert records(transactions) == [('BTC', pd.Timestamp('2023-01-05'), pd.Timestamp('2023-12-31'), 100.0)]
+    assert transactions.column('date_sold').tz is None
+
+
+@pytest.mark.parametrize('path', ['in_memory', 'by_year', 'chunked', 'spool', 'store'])
+def test_mixed_zone_stamps_on_every_path(path, tmp_path):
+    csv_text = bitwave_csv(MIXED_ZONE_ROWS)
+    if path == 'in_memory':
+        by_year = {year: app.extract_bitwave_transactions(pd.read_csv(io.StringIO(csv_text)), year) for year in (2023, 2024)}
+    elif path == 'by_year':
+        by_year, _ = app.extract_bitwave_transactions_by_year(pd.read_csv(io.StringIO(csv_text)))
+    elif path == 'chunked':
+        by_year, _ = app.extract_bitwave_transactions_by_year_chunked(io.StringIO(csv_text), chunksize=1)
+    elif path == 'spool':
+        with app.SellSpool(io.StringIO(csv_text), chunksize=1) as spool:
+            by_year = {year: app.TransactionTable.concat(list(spool.transactions(year))) for year in (2023, 2024)}
+    else:
+        store = app.ActionStore(str(tmp_path / 'client.sqlite'))
+        store.ingest(io.StringIO(csv_text), chunksize=1)
+        by_year = {year: store.extract_year(year) for year in (2023, 2024)}
+
+    assert records(by_year[2023]) == [('BTC', pd.Timestamp('2023-01-05'), pd.Timestamp('2023-12-31'), 100.0)]
+    assert records(by_year[2024]) == [('ETH', pd.Timestamp('2022-06-01 09:00'), pd.Timestamp('2024-01-01 04:30'), 300.0)]
+
+
+def test_vectorized_extraction_matches_reference_loop():
+    df = pd.read_csv(io.StringIO(generated_export()))
+    assert (df['action'] == 'income').any()
+    assert df['lotId'].isna().any() and df.loc[df['action'] == 'sell', 'lotId'].isna().any()
+    assert df.loc[df['action'].isin(app.BITWAVE_ACQUISITION_ACTIONS), 'lotId'].duplicated().any()
+    assert (df[' proceeds '] == ' n/a ').any()
+    
+    by_year, lot_index = app.extract_bitwave_transactions_by_year(df)
+    assert len(lot_index.duplicate_lot_ids) >= 2
+    
+    for year in range(2019, 2025):
+        expected = comparable(reference_bitwave_transactions(df, year))
+        assert expected
+        
+        for transactions in (app.extract_bitwave_transactions(df, year), by_year[year]):
+            assert comparable({key: row[key] for key in expected[0]} for row in transactions) == expected
+
+
+def test_chunked_extraction_matches_in_memory():
+    csv_text = generated_export()
+    in_memory_issues, chunked_issues = [], []
+    expected, expected_lot_index = app.extract_bitwave_transactions_by_year(pd.read_csv(io.StringIO(csv_text)), in_memory_issues)
+    chunked, lot_index = app.extract_bitwave_transactions_by_year_chunked(io.StringIO(csv_text), chunksize=100, issues=chunked_issues)
+
+    assert sorted(chunked) == sorted(expected)
+    for year, transactions in expected.items():
+        assert comparable(map(dict, chunked[year])) == comparable(map(dict, transactions))
+    # Issues come column by column, which for chunks is chunk by chunk
+    by_cell = operator.itemgetter('row', 'column')
+    assert sorted(chunked_issues, key=by_cell) == sorted(in_memory_issues, key=by_cell)
+    assert set(lot_index.duplicate_lot_ids) == set(expected_lot_index.duplicate_lot_ids)
+
+    only_2022, _ = app.extract_bitwave_transactions_by_year_chunked(io.StringIO(csv_text), chunksize=100, tax_years=[2022, 2030])
+    assert list(only_2022) == [2022]
+    assert comparable(map(dict, only_2022[2022])) == comparable(map(dict, expected[2022]))
+
+    year_2022 = app.extract_bitwave_transactions_chunked(io.StringIO(csv_text), 2022, chunksize=100)
+    assert comparable(map(dict, year_2022)) == comparable(map(dict, expected[2022]))
+    spooled = app.load_spooled_transactions(io.BytesIO(csv_text.encode()), 2022)
+    assert comparable(map(dict, spooled['transactions'])) == comparable(map(dict, expected[2022]))
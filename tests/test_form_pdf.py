@@ -0,0 +1,91 @@
+"""Form 8949 PDFs: serial and parallel rendering agree, and documents keep their pages in order
+
+Run from the repository root with: python -m pytest tests
+"""
+import io
+import os
+import sys
+
+import pandas as pd
+import PyPDF2
+import pytest
+
+import app
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+from bench_template_overlay import make_stand_in_template
+
+SHORT_TERM = "Part I - Short-term (Box B) - Basis NOT reported"
+LONG_TERM = "Part II - Long-term (Box E) - Basis NOT reported"
+TAX_YEAR = 2023
+
+# Enough pages that, were the document to drop a page's reader, a later
+# one could be allocated at its id() and pick up its objects
+PAGES = 70
+
+
+@pytest.fixture
+def stand_in_template(monkeypatch):
+    """Serve a stand-in official form for every tax year"""
+    monkeypatch.setattr(app, 'get_official_form_8949', lambda tax_year: make_stand_in_template())
+    app.load_form_8949_template.clear()
+    yield
+    app.load_form_8949_template.clear()
+
+
+def make_transactions(count, short_term=True):
+    """count sales, each described by its position, e.g. "SALE00042" """
+    sold = pd.Timestamp('2023-06-30')
+    held = pd.Timedelta(days=30 if short_term else 400)
+    return app.TransactionTable.from_records([{
+        'asset': 'BTC',
+        'description': f"SALE{i:05d}",
+        'date_acquired': sold - held - pd.Timedelta(days=i % 7),
+        'date_sold': sold,
+        'proceeds': 1000.0 + i,
+        'cost_basis': 900.0 + i / 2,
+        'gain_loss': 100.0 + i / 2,
+        'is_short_term': short_term,
+        'is_long_term': not short_term
+    } for i in range(count)])
+
+
+def sections():
+    per_part = PAGES // 2 * app.TRANSACTIONS_PER_PAGE
+    return [
+        (make_transactions(per_part), SHORT_TERM, None),
+        (make_transactions(per_part - 3, short_term=False), LONG_TERM, None)
+    ]
+
+
+def document_bytes(workers):
+    output = io.BytesIO()
+    assert app.generate_form_8949_document(output, sections(), "Jane Doe", "123-45-6789", TAX_YEAR, workers=workers) == PAGES
+    return output.getvalue()
+
+
+def test_parallel_document_matches_serial(stand_in_template):
+    assert document_bytes(workers=2) == document_bytes(workers=1)
+
+
+def test_parallel_pages_match_serial(stand_in_template):
+    transactions = make_transactions(PAGES * app.TRANSACTIONS_PER_PAGE)
+    serial = app.generate_form_8949_pdf(transactions, SHORT_TERM, "Jane Doe", "123-45-6789", TAX_YEAR, workers=1)
+    parallel = app.generate_form_8949_pdf(transactions, SHORT_TERM, "Jane Doe", "123-45-6789", TAX_YEAR, workers=2)
+
+    assert len(serial) == PAGES
+    assert [page['filename'] for page in parallel] == [page['filename'] for page in serial]
+    assert [page['content'] for page in parallel] == [page['content'] for page in serial]
+
+
+def test_document_has_every_page_in_order(stand_in_template):
+    reader = PyPDF2.PdfReader(io.BytesIO(document_bytes(workers=None)))
+    assert len(reader.pages) == PAGES
+
+    per_part = PAGES // 2
+    for number, page in enumerate(reader.pages):
+        first_sale = number % per_part * app.TRANSACTIONS_PER_PAGE
+        text = page.extract_text()
+        assert f"SALE{first_sale:05d}" in text
+        assert f"SALE{first_sale + app.TRANSACTIONS_PER_PAGE:05d}" not in text
+        assert "Form 8949 stand-in" in text
@@ -0,0 +1,195 @@
+"""Template warm-up and app.FormTemplateStore against a local stand-in for the IRS site
+
+Run from the repository root with: python -m pytest tests
+"""
+import hashlib
+import http.server
+import os
+import threading
+import time
+
+import pytest
+
+import app
+import form8949_templates
+
+TEMPLATE_PDF = b"%PDF-1.4\n% stand-in Form 8949\n%%EOF\n"
+
+# Longer than the stores' download timeout, so the slow template always times out
+SLOW_SECONDS = 2
+TIMEOUT = 0.5
+
+
+class StandInIRSHandler(http.server.BaseHTTPRequestHandler):
+    """Serves /f8949.pdf, and /slow.pdf too late; anything else is a 404"""
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path == '/slow.pdf':
+            time.sleep(SLOW_SECONDS)
+        if self.path not in ('/f8949.pdf', '/slow.pdf'):
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(TEMPLATE_PDF)))
+        self.end_headers()
+        self.wfile.write(TEMPLATE_PDF)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def irs_site():
+    """Base URL of a stand-in IRS site on localhost; its requests are listed in .requests"""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StandInIRSHandler)
+    server.daemon_threads = True
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def site_url(server, path):
+    host, port = server.server_address
+    return f"http://{host}:{port}{path}"
+
+
+def test_warmup_reports_each_year(irs_site, tmp_path):
+    # The latest year is the fallback for the others, so it is the slow one:
+    # the missing year falls back to it and ends unavailable as well
+    urls = {
+        2023: site_url(irs_site, '/f8949.pdf'),
+        2024: site_url(irs_site, '/missing.pdf'),
+        2025: site_url(irs_site, '/slow.pdf')
+    }
+    store = app.FormTemplateStore(urls=urls, cache_dir=str(tmp_path), timeout=TIMEOUT)
+    warmup = app.TemplateWarmup(store, urls, parse=False).start()
+
+    assert warmup.wait(timeout=30)
+    assert warmup.status() == {2023: 'ready', 2024: 'unavailable', 2025: 'unavailable'}
+    assert store.get(2023) == TEMPLATE_PDF
+    assert os.path.exists(tmp_path / 'f8949.pdf.sha256')
+
+
+def test_cached_template_with_bad_checksum_is_fetched_again(irs_site, tmp_path):
+    urls = {2023: site_url(irs_site, '/f8949.pdf')}
+    (tmp_path / 'f8949.pdf').write_bytes(TEMPLATE_PDF)
+    (tmp_path / 'f8949.pdf.sha256').write_text(hashlib.sha256(b"another file").hexdigest())
+
+    assert app.FormTemplateStore(urls=urls, cache_dir=str(tmp_path), offline=True).get(2023) is None
+
+    assert app.FormTemplateStore(urls=urls, cache_dir=str(tmp_path), timeout=TIMEOUT).get(2023) == TEMPLATE_PDF
+    assert irs_site.requests == ['/f8949.pdf']
+    assert (tmp_path / 'f8949.pdf.sha256').read_text() == hashlib.sha256(TEMPLATE_PDF).hexdigest()
+
+
+def test_offline_store_never_downloads(irs_site, tmp_path):
+    urls = {2023: site_url(irs_site, '/f8949.pdf')}
+    seed_dir = tmp_path / 'seed'
+    seed_dir.mkdir()
+
+    store = app.FormTemplateStore(urls=urls, cache_dir=str(tmp_path / 'cache'), seed_dir=str(seed_dir), offline=True)
+    warmup = app.TemplateWarmup(store, urls, parse=False).start()
+    assert warmup.wait(timeout=30)
+    assert warmup.status(2023) == 'unavailable'
+
+    # A seeded template is served without a checksum
+    (seed_dir / 'f8949.pdf').write_bytes(TEMPLATE_PDF)
+    assert app.FormTemplateStore(urls=urls, seed_dir=str(seed_dir), offline=True).get(2023) == TEMPLATE_PDF
+    assert irs_site.requests == []
+
+
+def write_cached(cache_dir, name, content, age_days=0):
+    """Put a checksummed template in the cache, last written age_days ago"""
+    path = cache_dir / name
+    path.write_bytes(content)
+    (cache_dir / f"{name}.sha256").write_text(hashlib.sha256(content).hexdigest())
+    written = time.time() - age_days * 24 * 3600
+    os.utime(path, (written, written))
+
+
+def test_default_cache_dir_is_private_to_the_user(irs_site, tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache-home'))
+    cache_dir = form8949_templates.default_cache_dir()
+    assert cache_dir == str(tmp_path / 'cache-home' / 'form8949_templates')
+
+    urls = {2023: site_url(irs_site, '/f8949.pdf')}
+    assert app.FormTemplateStore(urls=urls, cache_dir=cache_dir, timeout=TIMEOUT).get(2023) == TEMPLATE_PDF
+    assert os.stat(cache_dir).st_mode & 0o777 == 0o700
+    assert os.path.exists(os.path.join(cache_dir, 'f8949.pdf'))
+
+
+def test_cache_dir_other_users_can_write_is_not_used(irs_site, tmp_path):
+    urls = {2023: site_url(irs_site, '/f8949.pdf')}
+    write_cached(tmp_path, 'f8949.pdf', TEMPLATE_PDF)
+    tmp_path.chmod(0o777)
+
+    assert app.FormTemplateStore(urls=urls, cache_dir=str(tmp_path), offline=True).get(2023) is None
+
+    (tmp_path / 'f8949.pdf').unlink()
+    assert app.FormTemplateStore(urls=urls, cache_dir=str(tmp_path), timeout=TIMEOUT).get(2023) == TEMPLATE_PDF
+    assert not (tmp_path / 'f8949.pdf').exists()
+
+
+def test_old_current_form_is_fetched_again(irs_site, tmp_path):
+    old_pdf = b"%PDF-1.4\n% last year's revision\n%%EOF\n"
+    write_cached(tmp_path, 'f8949.pdf', old_pdf, age_days=31)
+    write_cached(tmp_path, 'f8949--2023.pdf', old_pdf, age_days=400)
+    urls = {2023: site_url(irs_site, '/f8949--2023.pdf'), 2025: site_url(irs_site, '/f8949.pdf')}
+
+    # Prior-year forms never change, so an old copy is still used
+    store = app.FormTemplateStore(urls=urls, cache_dir=str(tmp_path), timeout=TIMEOUT)
+    assert store.get(2023) == old_pdf
+    assert irs_site.requests == []
+
+    assert store.get(2025) == TEMPLATE_PDF
+    assert irs_site.requests == ['/f8949.pdf']
+    assert (tmp_path / 'f8949.pdf').read_bytes() == TEMPLATE_PDF
+
+
+def test_old_current_form_is_used_while_it_cannot_be_fetched(irs_site, tmp_path):
+    old_pdf = b"%PDF-1.4\n% last year's revision\n%%EOF\n"
+    write_cached(tmp_path, 'f8949.pdf', old_pdf, age_days=31)
+
+    offline = {2025: site_url(irs_site, '/f8949.pdf')}
+    assert app.FormTemplateStore(urls=offline, cache_dir=str(tmp_path), offline=True).get(2025) == old_pdf
+
+    unreachable = {2025: site_url(irs_site, '/moved/f8949.pdf')}
+    assert app.FormTemplateStore(urls=unreachable, cache_dir=str(tmp_path), timeout=TIMEOUT).get(2025) == old_pdf
+    assert irs_site.requests == ['/moved/f8949.pdf']
+
+
+def test_current_form_in_memory_expires(irs_site, tmp_path):
+    urls = {2025: site_url(irs_site, '/f8949.pdf')}
+    store = app.FormTemplateStore(urls=urls, cache_dir=str(tmp_path), timeout=TIMEOUT, max_age=0)
+
+    assert store.get(2025) == TEMPLATE_PDF
+    assert store.get(2025) == TEMPLATE_PDF
+    assert irs_site.requests == ['/f8949.pdf', '/f8949.pdf']
+
+
+def test_prepare_parses_a_year_in_the_background(irs_site, tmp_path, monkeypatch):
+    parsed = []
+
+    def load_form_8949_template(tax_year, page_index):
+        parsed.append((tax_year, page_index, threading.current_thread().name))
+        if tax_year == 2024:
+            raise ValueError("not a Form 8949")
+
+    monkeypatch.setattr(app, 'load_form_8949_template', load_form_8949_template)
+    urls = {2023: site_url(irs_site, '/f8949.pdf'), 2024: site_url(irs_site, '/f8949.pdf'), 2025: site_url(irs_site, '/slow.pdf')}
+    store = app.FormTemplateStore(urls=urls, cache_dir=str(tmp_path), timeout=TIMEOUT)
+    warmup = app.TemplateWarmup(store, urls, parse=False).start()
+
+    # Asked for before the downloads finish, parsed after them, once per year
+    assert warmup.prepare(2023).prepare(2023).prepare(2024).prepare(2025) is warmup
+    assert warmup.wait(timeout=30)
+
+    assert warmup.status() == {2023: 'ready', 2024: 'failed', 2025: 'unavailable'}
+    # 2024 stops at its first page; the slow year never downloaded, so is not parsed
+    assert sorted(parsed) == [(2023, 0, 'form8949-template-parse'), (2023, 1, 'form8949-template-parse'), (2024, 0, 'form8949-template-parse')]
+    assert warmup.errors() == {2024: "not a Form 8949"}
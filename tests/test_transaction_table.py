@@ -0,0 +1,106 @@
+"""app.TransactionTable: slices, term filters, rows like the old sale dicts, and Parquet
+
+Run from the repository root with: python -m pytest tests
+"""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+from test_extraction import generated_export, reference_bitwave_transactions
+
+# Has short- and long-term sales, and sales with no lot ID
+TAX_YEAR = 2020
+
+
+@pytest.fixture(scope='module')
+def export():
+    return pd.read_csv(io.StringIO(generated_export()))
+
+
+@pytest.fixture(scope='module')
+def transactions(export):
+    return app.extract_bitwave_transactions(export, TAX_YEAR)
+
+
+def buffer(values):
+    """The numpy array holding a column's values (for asset and description, their codes)"""
+    if isinstance(values, pd.Categorical):
+        return values.codes
+    if isinstance(values, np.ndarray):
+        return values
+    return values.asi8
+
+
+def test_slice_shares_the_parents_memory(transactions):
+    part = transactions[10:60]
+    assert len(part) == 50
+    assert [dict(row) for row in part] == [dict(row) for row in list(transactions)[10:60]]
+
+    # lot_id is an Arrow array, whose slices are zero-copy too
+    for name in app.TransactionTable.COLUMNS:
+        if name != 'lot_id':
+            assert np.shares_memory(buffer(transactions.column(name)), buffer(part.column(name))), name
+    assert part.column('lot_id').tolist() == transactions.column('lot_id')[10:60].tolist()
+
+
+def test_terms_split_every_sale_once(transactions):
+    short_term, long_term = transactions.short_term(), transactions.long_term()
+    assert len(short_term) and len(long_term)
+    assert len(short_term) + len(long_term) == len(transactions)
+
+    assert short_term.column('is_short_term').all() and not short_term.column('is_long_term').any()
+    assert long_term.column('is_long_term').all() and not long_term.column('is_short_term').any()
+
+    # Each keeps the sales' order
+    is_short_term = transactions.column('is_short_term')
+    assert [dict(row) for row in short_term] == [dict(row) for row, short in zip(transactions, is_short_term) if short]
+    assert [dict(row) for row in long_term] == [dict(row) for row, short in zip(transactions, is_short_term) if not short]
+
+
+def test_rows_are_keyed_and_typed_like_sale_dicts(export, transactions):
+    expected = reference_bitwave_transactions(export, TAX_YEAR)
+    assert len(transactions) == len(expected)
+    assert any(pd.isna(sale['lot_id']) for sale in expected)
+
+    for rows in (list(transactions), [transactions[i] for i in range(len(transactions))]):
+        for row, sale in zip(rows, expected):
+            assert list(row) == [*sale, 'lot_matched']
+            assert {key: type(row[key]) for key in sale} == {key: type(value) for key, value in sale.items()}
+            assert type(row['lot_matched']) is bool
+    assert dict(transactions[-1]) == dict(list(transactions)[-1])
+
+    with pytest.raises(KeyError):
+        transactions[0]['price']
+
+
+def test_parquet_round_trip_is_exact(transactions):
+    buffer = io.BytesIO()
+    transactions.to_parquet(buffer)
+    buffer.seek(0)
+    read = app.TransactionTable.read_parquet(buffer)
+
+    assert len(read) == len(transactions)
+    for name in app.TransactionTable.COLUMNS:
+        written, values = transactions.column(name), read.column(name)
+        assert type(values) is type(written), name
+        assert values.dtype == written.dtype, name
+        if isinstance(written, pd.Categorical):
+            assert values.categories.tolist() == written.categories.tolist()
+            assert np.array_equal(values.codes, written.codes)
+        elif isinstance(written, np.ndarray):
+            assert values.tobytes() == written.tobytes(), name
+        else:
+            assert pd.Series(values).equals(pd.Series(written)), name
+    assert [dict(row) for row in read] == [dict(row) for row in transactions]
+
+
+def test_read_parquet_refuses_other_files(export):
+    buffer = io.BytesIO()
+    app.write_actions_parquet(io.StringIO(export.to_csv(index=False)), buffer)
+    buffer.seek(0)
+
+    with pytest.raises(ValueError, match="extracted Form 8949 transactions"):
+        app.TransactionTable.read_parquet(buffer)
@@ -0,0 +1,87 @@
+"""The upload cache: app.UploadCache eviction and the sizes extractions are cached at
+
+Run from the repository root with: python -m pytest tests
+"""
+import pandas as pd
+
+import app
+
+
+def make_transactions(count):
+    sold = pd.Timestamp('2023-06-30')
+    return app.TransactionTable.from_records([{
+        'asset': ('BTC', 'ETH', 'SOL')[i % 3],
+        'description': f"SALE{i:05d}",
+        'date_acquired': sold - pd.Timedelta(days=i % 700),
+        'date_sold': sold,
+        'proceeds': 1000.0 + i,
+        'cost_basis': 900.0 + i / 2,
+        'gain_loss': 100.0 + i / 2,
+        'is_short_term': i % 700 <= 365,
+        'is_long_term': i % 700 > 365
+    } for i in range(count)])
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = app.UploadCache(max_bytes=100)
+    cache.put('a', 'A', 40)
+    cache.put('b', 'B', 40)
+    assert cache.get('a') == 'A'
+
+    # 'b' is now the least recently used, so it makes room for 'c'
+    cache.put('c', 'C', 40)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == ('A', 'C')
+    assert cache.total_bytes == 80
+
+    # Replacing an entry counts only its new size
+    cache.put('a', 'A2', 10)
+    assert cache.total_bytes == 50
+    cache.put('d', 'D', 50)
+    assert (cache.get('a'), cache.get('c'), cache.get('d')) == ('A2', 'C', 'D')
+
+    # Evicting can take several entries, oldest first
+    cache.put('e', 'E', 90)
+    assert [cache.get(key) for key in 'acde'] == [None, None, None, 'E']
+    assert cache.total_bytes == 90
+
+
+def test_entry_larger_than_the_budget_is_not_cached():
+    cache = app.UploadCache(max_bytes=100)
+    cache.put('a', 'A', 60)
+    cache.put('a', 'huge', 101)
+
+    assert cache.get('a') is None
+    assert cache.total_bytes == 0
+
+
+def test_extraction_size_covers_what_the_viewer_adds():
+    extracted = app.year_extraction(make_transactions(2000), [], [])
+    size = app.year_extraction_nbytes(extracted)
+    assert size > extracted['transactions'].nbytes + int(extracted['asset_summary'].memory_usage(deep=True).sum())
+
+    browser = extracted['browser']
+    for column in app.TransactionBrowser.SORT_COLUMNS:
+        browser.select(sort_by=column, descending=True)
+    assert sum(order.nbytes for order in browser._orders.values()) == browser.nbytes
+
+
+def test_viewed_extractions_stay_within_the_budget():
+    extractions = [app.year_extraction(make_transactions(1000), [], []) for _ in range(4)]
+    sizes = [app.year_extraction_nbytes(extracted) for extracted in extractions]
+    cache = app.UploadCache(max_bytes=sum(sizes[:2]))
+
+    for year, extracted in enumerate(extractions):
+        cache.put(year, extracted, sizes[year])
+        extracted['browser'].select(sort_by='proceeds')
+        extracted['browser'].select(sort_by='asset')
+
+    assert [year for year in range(len(extractions)) if cache.get(year) is not None] == [2, 3]
+    cached = extractions[2:]
+    held = sum(
+        extracted['transactions'].nbytes
+        + int(extracted['asset_summary'].memory_usage(deep=True).sum())
+        + sum(order.nbytes for order in extracted['browser']._orders.values())
+        for extracted in cached
+    )
+    assert held <= cache.total_bytes <= cache.max_bytes